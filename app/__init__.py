@@ -1,36 +1,105 @@
 # __init__.py
+from typing import Optional
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
+from .config import Config, configure_engine, engine_options
+from .serialization import FastJSONProvider
+
 # Initialize the SQLAlchemy database instance
 db = SQLAlchemy()
 
 
-def create_app() -> Flask:
+def create_app(config: Optional[dict] = None) -> Flask:
     """
     Creates and configures the Flask application with a database connection
     and registered blueprints.
 
+    Configuration is read from `config.Config`, then from `FLASK_`-prefixed environment
+    variables, then from the `config` argument.
+
     Configurations:
         - SQLALCHEMY_DATABASE_URI: Database URI for SQLAlchemy.
         - SQLALCHEMY_TRACK_MODIFICATIONS: Disable to avoid overhead.
+        - SCHEMA_AUTO_UPGRADE: Apply pending migrations at startup, see `migrations.init_schema`.
+        - DB_POOL_*: Connection pool of file-based SQLite and server databases.
+        - SQLITE_*: Pragmas applied to every SQLite connection (WAL journaling by default).
+        - JSON_ENCODER, JSON_STREAM_MIN_ROWS: JSON encoding of responses, see `serialization.py`.
+        - BULK_INSERT_CHUNK_SIZE: Rows per executemany batch for bulk inserts.
+        - RESPONSE_CACHE*: Response cache of the read endpoints, see `cache.init_cache`.
+        - CATEGORY_REGISTRY_CHECK_INTERVAL: See `registry.init_category_registry`.
+        - BUDGET_REGISTRY_CHECK_INTERVAL: See `budgets.init_budget_registry`.
+        - WRITE_BEHIND*: Background group-committed transaction writes, see `writebehind.init_write_behind`.
+        - ANALYTICS_*: Read-only replica serving the analytics endpoints, see `replica.init_replica`.
+        - WORKER_ID, SERVER_WARMUP_URLS: Set and used by the pre-fork server, see `server.PreforkServer`.
+        - TEMPLATE_BYTECODE_CACHE*: On-disk cache of compiled templates, see `templating.init_templating`.
+        - COMPRESS_MIN_SIZE, COMPRESS_LEVEL: Gzip compression of responses, see `compression.py`.
+        - METRICS, PROFILE_*: Request metrics and the slow request profiler, see `metrics.init_metrics`.
+
+    Args:
+        config (Optional[dict]): Configuration values overriding the defaults. They are applied
+            before the database is initialized, so they may change the database URI.
 
     Returns:
         Flask: The configured Flask application instance.
     """
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///budget_tracker.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.from_object(Config)
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    # orjson-backed JSON encoding of responses, with a standard library fallback
+    app.json = FastJSONProvider(app)
 
     db.init_app(app)
+    # Pragmas must be registered before the engine opens its first connection
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+
+    # Response cache of the read endpoints, invalidated by committed writes
+    from .cache import init_cache
+    init_cache(app)
+
+    # Requests act on behalf of the user named by their X-User-Id header, which a trusted proxy must set
+    from .tenancy import init_tenancy
+    init_tenancy(app)
 
     # Import and register blueprints
     from .routes import main
     app.register_blueprint(main)
 
-    # Create database tables if they do not exist
+    # Request metrics, registered before compression so that sizes are measured compressed
+    from .metrics import init_metrics
+    init_metrics(app)
+
+    # Template bytecode and fragment caches, then response compression
+    from .templating import init_templating
+    init_templating(app)
+    from .compression import init_compression
+    init_compression(app)
+
+    # Register CLI commands such as `flask import-csv`
+    from .commands import register_commands
+    register_commands(app)
+
     with app.app_context():
-        db.create_all()
+        # Apply pending migrations; a database already at the current schema version costs one query
+        from .migrations import init_schema
+        if not init_schema(app):
+            return app  # Outdated schema: only the CLI is usable, e.g. to run `flask db upgrade`
+        # In-memory category maps used for validation and name lookups
+        from .registry import init_category_registry
+        init_category_registry(app)
+        # In-memory budget limits checked by the alert engine on every transaction write
+        from .budgets import init_budget_registry
+        init_budget_registry(app)
+        # Replay writes left in the write-behind spool, then start the writer if enabled
+        from .writebehind import init_write_behind
+        init_write_behind(app)
+        # Read-only replica of the analytics endpoints, taking their long reads off the primary
+        from .replica import init_replica
+        init_replica(app)
 
     return app
@@ -0,0 +1,332 @@
+# budgets.py
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import and_, case, delete, event, func, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from .models import Budget, BudgetAlert, Category, RegistryVersion, SpendingRollup
+from .money import from_minor_units, to_minor_units
+from .registry import DEFAULT_CHECK_INTERVAL
+from . import db
+
+# Name of the version row counting committed budget writes
+BUDGETS_VERSION = 'budgets'
+
+# Rollup keys looked up per query when a write touches many budgeted periods at once
+EVALUATE_CHUNK_SIZE = 100
+
+# Keys of the objects returned by `list_alerts`
+ALERT_COLUMNS = ('id', 'budget_id', 'category_id', 'category', 'period', 'period_start', 'total', 'limit',
+                 'created_at')
+
+
+def _budgets_version():
+    return select(RegistryVersion.version).where(RegistryVersion.name == BUDGETS_VERSION)
+
+
+class BudgetRegistry:
+    """
+    Process-local copy of the budgets table, so that transaction writes to unbudgeted categories
+    cost no query at all.
+
+    It is kept current like the category registry: budget writes committed by this process mark it
+    stale, and writes by other processes are noticed through the 'budgets' version row, checked at
+    most every `check_interval` seconds.
+
+    Args:
+        check_interval (float): Seconds between checks of the version row; 0 checks on every lookup.
+
+    Attributes:
+        version (Optional[int]): The version of the budgets currently loaded.
+        limits (dict): (budget ID, limit in minor units, user ID) keyed by (category_id, period).
+    """
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = None
+        self.limits = {}
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def load(self, connection: Connection) -> None:
+        """Reload every budget, together with the version it corresponds to."""
+        version = connection.execute(_budgets_version()).scalar()
+        rows = connection.execute(
+            select(Budget.id, Budget.category_id, Budget.period, Budget.limit, Budget.user_id)
+        ).all()
+        limits = {(category_id, period): (budget_id, to_minor_units(limit), user_id)
+                  for budget_id, category_id, period, limit, user_id in rows}
+        with self._lock:
+            self.limits, self.version = limits, version
+            self._checked = time.monotonic()
+
+    def refresh(self, connection: Connection) -> Dict[tuple, Tuple[int, int, int]]:
+        """
+        Reload the registry if the version row has changed since it was loaded.
+
+        Args:
+            connection (Connection): The connection to read the version row and budgets with; queries
+                must not go through the session while it is flushing.
+
+        Returns:
+            Dict[tuple, Tuple[int, int, int]]: The current `limits`.
+        """
+        if time.monotonic() - self._checked >= self.check_interval:
+            if connection.execute(_budgets_version()).scalar() != self.version:
+                self.load(connection)
+            else:
+                self._checked = time.monotonic()
+        return self.limits
+
+    def invalidate(self) -> None:
+        """Make the next lookup check the version row."""
+        self._checked = float('-inf')
+
+
+def init_budget_registry(app: Flask) -> None:
+    """
+    Create the budget registry of an application and load it; requires an app context.
+
+    Configurations:
+        - BUDGET_REGISTRY_CHECK_INTERVAL: Seconds between checks for writes by other processes.
+
+    Args:
+        app (Flask): The application.
+    """
+    if db.session.get(RegistryVersion, BUDGETS_VERSION) is None:
+        db.session.add(RegistryVersion(name=BUDGETS_VERSION, version=0))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Created by another process meanwhile
+    registry = BudgetRegistry(app.config.get('BUDGET_REGISTRY_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+    registry.load(db.session.connection())
+    db.session.commit()
+    app.extensions['budget_registry'] = registry
+
+
+def get_budget_registry() -> Optional[BudgetRegistry]:
+    """Return the budget registry of the current application, or None outside of an application."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('budget_registry')
+
+
+def _insert_alerts(connection: Connection, alerts: List[dict]) -> None:
+    """Insert alerts, skipping budgets that already raised one in the same period."""
+    from .rollups import dialect_insert
+
+    table = BudgetAlert.__table__
+    insert = dialect_insert(connection, table)
+    if insert is not None:
+        connection.execute(insert.on_conflict_do_nothing(index_elements=[table.c.budget_id, table.c.period_start]),
+                           alerts)
+        return
+    for alert in alerts:
+        exists = connection.execute(
+            select(table.c.id).where(table.c.budget_id == alert['budget_id'],
+                                     table.c.period_start == alert['period_start'])
+        ).first()
+        if exists is None:
+            connection.execute(table.insert(), alert)
+
+
+def evaluate_budgets(connection: Connection, deltas: dict) -> int:
+    """
+    Raise an alert for every budget that rollup changes just pushed over its limit.
+
+    Called by `rollups.apply_deltas` after the changes are written, in the same database
+    transaction. Only the periods whose total grew and that have a budget are looked at: their new
+    total is read from the rollup table by primary key, and the total before the write is that
+    minus the change. The cost is therefore bounded by the number of periods a write touches (four
+    per transaction), whatever the size of the ledger, and writes to unbudgeted categories run no
+    query at all.
+
+    Args:
+        connection (Connection): The connection of the database transaction that made the writes.
+        deltas (dict): The changes that were applied, from `rollups.new_deltas`.
+
+    Returns:
+        int: The number of budgets found to have crossed their limit.
+    """
+    registry = get_budget_registry()
+    if registry is None:
+        return 0
+    limits = registry.refresh(connection)
+    if not limits:
+        return 0
+    grown = {key: total for key, (total, count) in deltas.items()
+             if total > 0 and (key[2], key[0]) in limits}
+    if not grown:
+        return 0
+
+    alerts = []
+    keys = list(grown)
+    for first in range(0, len(keys), EVALUATE_CHUNK_SIZE):
+        rows = connection.execute(
+            select(SpendingRollup.period, SpendingRollup.period_start, SpendingRollup.category_id,
+                   SpendingRollup.total)
+            # OR-ed key lookups rather than a row value IN, which SQLite answers with a full scan
+            .where(or_(*(and_(SpendingRollup.period == period, SpendingRollup.period_start == start,
+                              SpendingRollup.category_id == category_id)
+                         for period, start, category_id in keys[first:first + EVALUATE_CHUNK_SIZE])))
+        )
+        for period, start, category_id, total in rows:
+            budget_id, limit, user_id = limits[(category_id, period)]
+            total = to_minor_units(total)
+            if total - grown[(period, start, category_id)] <= limit < total:
+                alerts.append({'budget_id': budget_id, 'period_start': start, 'total': from_minor_units(total),
+                               'limit': from_minor_units(limit), 'user_id': user_id})
+                logging.warning('Budget %d of category %d exceeded for the %s of %s: %s over a limit of %s',
+                                budget_id, category_id, period, start, from_minor_units(total),
+                                from_minor_units(limit))
+    if alerts:
+        _insert_alerts(connection, alerts)
+    return len(alerts)
+
+
+def evaluate_budget(budget: Budget, day: date) -> bool:
+    """
+    Raise an alert if a new or changed budget is already exceeded in the period containing `day`.
+
+    Args:
+        budget (Budget): The budget, flushed.
+        day (date): A day in the period to check, usually today.
+
+    Returns:
+        bool: True if the budget is exceeded.
+    """
+    from .rollups import period_start
+
+    start = period_start(day, budget.period)
+    total = db.session.execute(
+        select(SpendingRollup.total).where(SpendingRollup.period == budget.period,
+                                           SpendingRollup.period_start == start,
+                                           SpendingRollup.category_id == budget.category_id)
+    ).scalar()
+    if total is None or total <= budget.limit:
+        return False
+    _insert_alerts(db.session.connection(), [{'budget_id': budget.id, 'period_start': start, 'total': total,
+                                              'limit': budget.limit, 'user_id': budget.user_id}])
+    return True
+
+
+def budget_status(day: date, period: Optional[str] = None) -> List[dict]:
+    """
+    Compare the spending of every budgeted category with its limit, in the periods containing `day`.
+
+    One query joins each budget with the rollup row of its current period, so the cost grows
+    with the number of budgets, not with the number of transactions.
+
+    Args:
+        day (date): A day in the periods to report, usually today.
+        period (Optional[str]): Only report budgets of this period.
+
+    Returns:
+        List[dict]: One entry per budget, ordered by category name and period.
+    """
+    from .rollups import PERIODS, period_start
+    from .summaries import next_period_start
+
+    starts = {name: period_start(day, name) for name in PERIODS}
+    current_start = case(starts, value=Budget.period)
+    statement = (
+        select(Budget.id, Budget.category_id, Category.name, Budget.period, Budget.limit,
+               func.coalesce(SpendingRollup.total, 0), func.coalesce(SpendingRollup.count, 0))
+        .join(Category, Budget.category_id == Category.id)
+        .outerjoin(SpendingRollup, and_(SpendingRollup.category_id == Budget.category_id,
+                                        SpendingRollup.period == Budget.period,
+                                        SpendingRollup.period_start == current_start))
+        .order_by(Category.name, Budget.period)
+    )
+    if period:
+        statement = statement.where(Budget.period == period)
+
+    status = []
+    for budget_id, category_id, name, budget_period, limit, spent, count in db.session.execute(statement):
+        start = starts[budget_period]
+        status.append({
+            'budget_id': budget_id,
+            'category_id': category_id,
+            'category': name,
+            'period': budget_period,
+            'period_start': start,
+            'period_end': next_period_start(start, budget_period) - timedelta(days=1),
+            'limit': limit,
+            'spent': spent,
+            'count': count,
+            'remaining': limit - spent,
+            'used': float(spent / limit),
+            'exceeded': spent > limit
+        })
+    return status
+
+
+def list_alerts(after: int = 0, limit: Optional[int] = None) -> list:
+    """
+    List budget alerts in the order they were raised.
+
+    Args:
+        after (int): Only list alerts with a greater ID, e.g. the last one seen when polling.
+        limit (Optional[int]): The most alerts to list.
+
+    Returns:
+        list: Result rows with the values of ALERT_COLUMNS.
+    """
+    statement = (
+        select(BudgetAlert.id, BudgetAlert.budget_id, Budget.category_id, Category.name, Budget.period,
+               BudgetAlert.period_start, BudgetAlert.total, BudgetAlert.limit, BudgetAlert.created_at)
+        .join(Budget, BudgetAlert.budget_id == Budget.id)
+        .join(Category, Budget.category_id == Category.id)
+        .where(BudgetAlert.id > after)
+        .order_by(BudgetAlert.id)
+        .limit(limit)
+    )
+    return db.session.execute(statement).all()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_budget_writes(session, flush_context, instances) -> None:
+    """
+    Delete the budgets and alerts of deleted categories, and bump the budgets version in the
+    database transaction of the first budget write.
+    """
+    deleted_categories = [obj.id for obj in session.deleted if isinstance(obj, Category)]
+    if deleted_categories:
+        budget_ids = select(Budget.id).where(Budget.category_id.in_(deleted_categories)).scalar_subquery()
+        session.execute(delete(BudgetAlert).where(BudgetAlert.budget_id.in_(budget_ids)))
+        deleted = session.execute(delete(Budget).where(Budget.category_id.in_(deleted_categories)))
+        changed = deleted.rowcount > 0
+    else:
+        changed = False
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Budget) and (obj not in session.dirty or session.is_modified(obj)):
+            changed = True
+            if obj in session.deleted:
+                session.execute(delete(BudgetAlert).where(BudgetAlert.budget_id == obj.id))
+    if changed and not session.info.get('budgets_changed'):
+        session.execute(
+            update(RegistryVersion).where(RegistryVersion.name == BUDGETS_VERSION)
+            .values(version=RegistryVersion.version + 1)
+        )
+        session.info['budgets_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_budget_registry(session) -> None:
+    if session.info.pop('budgets_changed', False):
+        registry = get_budget_registry()
+        if registry is not None:
+            registry.invalidate()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_budget_changes(session, previous_transaction) -> None:
+    session.info.pop('budgets_changed', None)
@@ -0,0 +1,449 @@
+# cache.py
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, has_app_context, make_response, request
+from sqlalchemy import event
+
+from .models import Category
+from .registry import get_category_registry
+from .tenancy import current_user_id
+from . import db
+
+# Defaults of the in-process backend, overridable through the RESPONSE_CACHE_* settings
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 300
+
+# Slots of the tag versions shared by forked worker processes
+DEFAULT_TAG_SLOTS = 4096
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def user_tag(table: str, user_id: Optional[int]) -> str:
+    """Return the tag of one user's rows of a table; outside of a user scope, the tag of the whole table."""
+    return table if user_id is None else '%s@%d' % (table, user_id)
+
+
+class ForkSharedTags:
+    """
+    Tag versions held in shared memory, so that the processes forked after it was created, e.g.
+    the workers of `server.PreforkServer`, see each other's invalidations while each keeps its
+    own cache entries.
+
+    Tags are hashed into a fixed number of slots. Tags sharing a slot are invalidated together,
+    which only costs a few extra misses.
+
+    Args:
+        slots (int): The number of slots.
+    """
+
+    def __init__(self, slots: int = DEFAULT_TAG_SLOTS):
+        self._versions = multiprocessing.RawArray('q', slots)
+        self._modified = multiprocessing.RawArray('d', slots)
+        self._lock = multiprocessing.Lock()
+        self._created = time.time()
+
+    def _slots(self, tags: Iterable[str]) -> List[int]:
+        return [zlib.crc32(tag.encode()) % len(self._versions) for tag in tags]
+
+    def tag_versions(self, tags: Iterable[str]) -> List[Tuple[int, float]]:
+        slots = self._slots(tags)
+        with self._lock:
+            return [(self._versions[slot], self._modified[slot] or self._created) for slot in slots]
+
+    def bump(self, tags: Iterable[str], now: float) -> None:
+        slots = set(self._slots(tags))
+        with self._lock:
+            for slot in slots:
+                self._versions[slot] += 1
+                self._modified[slot] = now
+
+
+class LRUCache:
+    """
+    In-process cache backend bounded by entry count and total body size, with a TTL per entry.
+
+    Tag versions are kept apart from the entries, so evicting entries never resets a version.
+
+    Args:
+        max_entries (int): The maximum number of cached responses.
+        max_bytes (int): The maximum total size of the cached bodies.
+        ttl (float): Seconds after which an entry expires.
+        tags (Optional[ForkSharedTags]): Tag versions shared with other processes; by default they
+            are kept in this process.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL, tags: Optional[ForkSharedTags] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._shared_tags = tags
+        self._created = time.time()
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, _, entry = item
+            if expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, entry)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def tag_versions(self, tags: Iterable[str]) -> List[Tuple[int, float]]:
+        if self._shared_tags is not None:
+            return self._shared_tags.tag_versions(tags)
+        with self._lock:
+            return [self._tags.setdefault(tag, (0, self._created)) for tag in tags]
+
+    def bump(self, tags: Iterable[str], now: float) -> None:
+        if self._shared_tags is not None:
+            self._shared_tags.bump(tags, now)
+            return
+        with self._lock:
+            for tag in tags:
+                version, _ = self._tags.get(tag, (0, now))
+                self._tags[tag] = (version + 1, now)
+
+    def stats(self) -> dict:
+        return {
+            'backend': 'lru',
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class LocalStore:
+    """
+    Thread-safe in-memory stand-in for a shared key-value store client such as `redis.Redis`.
+
+    It implements the subset of the Redis client API used by `SharedCache`: `get`, `mget`,
+    `set` (with `ex` and `nx`), `incr` and `delete`.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name: str):
+        item = self._data.get(name)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return item
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._live(name)
+            return item[0] if item else None
+
+    def mget(self, names: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [item[0] if item else None for item in map(self._live, names)]
+
+    def set(self, name: str, value, ex: Optional[float] = None, nx: bool = False) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            if nx and self._live(name):
+                return False
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+            return True
+
+    def incr(self, name: str) -> int:
+        with self._lock:
+            item = self._live(name)
+            value = int(item[0]) + 1 if item else 1
+            self._data[name] = (str(value).encode(), item[1] if item else None)
+            return value
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+
+class SharedCache:
+    """
+    Cache backend storing entries and tag versions in a key-value store shared by several processes.
+
+    Entry expiry and eviction are left to the store; set it up with a TTL-aware eviction policy.
+
+    Args:
+        client: A Redis-compatible client, e.g. `redis.Redis`, or a `LocalStore`.
+        prefix (str): Prefix of every key written to the store.
+        ttl (float): Seconds after which an entry expires.
+    """
+
+    def __init__(self, client, prefix: str = 'budget-tracker:', ttl: float = DEFAULT_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(self.prefix + 'response:' + key)
+        if raw is None:
+            return None
+        header, body = raw.split(b'\n', 1)
+        entry = json.loads(header)
+        entry['body'] = body
+        return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        header = json.dumps({name: value for name, value in entry.items() if name != 'body'})
+        self.client.set(self.prefix + 'response:' + key, header.encode() + b'\n' + entry['body'],
+                        ex=int(self.ttl) or 1)
+
+    def tag_versions(self, tags: Iterable[str]) -> List[Tuple[int, float]]:
+        tags = list(tags)
+        values = self.client.mget([self.prefix + 'tag:%s:version' % tag for tag in tags] +
+                                  [self.prefix + 'tag:%s:modified' % tag for tag in tags])
+        versions = []
+        for tag, version, modified in zip(tags, values, values[len(tags):]):
+            if modified is None:
+                modified = repr(time.time())
+                # Another process may have set it meanwhile; both values are equally valid
+                self.client.set(self.prefix + 'tag:%s:modified' % tag, modified, nx=True)
+            versions.append((int(version or 0), float(modified)))
+        return versions
+
+    def bump(self, tags: Iterable[str], now: float) -> None:
+        for tag in tags:
+            self.client.incr(self.prefix + 'tag:%s:version' % tag)
+            self.client.set(self.prefix + 'tag:%s:modified' % tag, repr(now))
+
+    def stats(self) -> dict:
+        return {'backend': 'shared'}
+
+
+class ResponseCache:
+    """
+    Cache of rendered responses, keyed by endpoint, arguments and the versions of the tables they read.
+
+    Every committed write bumps the version of the tables it touched (see the session hooks below),
+    which changes the key of every response that depends on them, so no stale entry is ever served.
+    Responses carry an ETag and a Last-Modified header, and conditional requests get a 304.
+
+    Responses are cached per user. Writes made on behalf of a user only bump that user's tags, so
+    they leave other users' responses cached; writes made outside of any user scope bump the
+    tags of every user.
+
+    Args:
+        backend: An `LRUCache` or a `SharedCache`.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def respond(self, view: Callable, tags: Tuple[str, ...], args: tuple, kwargs: dict) -> Response:
+        """
+        Serve a request to a cached view from the cache, calling the view on a miss.
+
+        Only 200 responses that are not streamed are stored.
+
+        Args:
+            view (Callable): The view function.
+            tags (Tuple[str, ...]): The tables the view reads.
+            args (tuple): The positional arguments of the view.
+            kwargs (dict): The URL arguments of the view.
+
+        Returns:
+            Response: The response, or a 304 if the client's copy is current.
+        """
+        user_id = current_user_id()
+        if user_id is not None:
+            tags = tags + tuple(user_tag(tag, user_id) for tag in tags)
+        # Versions are read before the view runs, so a write committed meanwhile cannot be hidden
+        versions = self.backend.tag_versions(tags)
+        key = '%s:%s' % (request.endpoint, _digest(repr((
+            user_id, sorted(request.args.items(multi=True)), sorted(kwargs.items()), versions)).encode()))
+
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('misses')
+            if Category.__tablename__ in tags:
+                # The registry notices category writes of other processes only every `check_interval`
+                # seconds: the response stored under the new versions must not be built from older categories
+                get_category_registry().refresh(force=True)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            entry = {'body': body, 'content_type': response.content_type, 'etag': _digest(body)}
+            self.backend.set(key, entry)
+        else:
+            self._count('hits')
+            response = current_app.response_class(entry['body'], content_type=entry['content_type'])
+
+        response.set_etag(entry['etag'])
+        if versions:  # Views reading no table have no modification time
+            response.last_modified = max(modified for _, modified in versions)
+        response.cache_control.no_cache = True  # Clients may keep the response but must revalidate it
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self._count('not_modified')
+        return response
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """
+        Make every cached response that depends on one of `tags` unreachable.
+
+        Args:
+            tags (Iterable[str]): The names of the tables that were written.
+        """
+        self.backend.bump(tags, time.time())
+        self._count('invalidations')
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: Hits, misses, 304 responses and invalidations, plus the counters of the backend.
+        """
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'invalidations': self.invalidations
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def init_cache(app: Flask) -> None:
+    """
+    Create the response cache configured by the RESPONSE_CACHE_* settings.
+
+    Configurations:
+        - RESPONSE_CACHE: 'lru' (default), 'shared', or None to disable caching.
+        - RESPONSE_CACHE_MAX_ENTRIES: Maximum number of responses kept by the 'lru' backend.
+        - RESPONSE_CACHE_MAX_BYTES: Maximum total body size kept by the 'lru' backend.
+        - RESPONSE_CACHE_TTL: Seconds after which a cached response expires.
+        - RESPONSE_CACHE_TAGS: `ForkSharedTags` of the 'lru' backend, set by the pre-fork server so
+          that writes made by one worker invalidate the responses cached by the others.
+        - RESPONSE_CACHE_CLIENT: Redis-compatible client of the 'shared' backend; defaults to a `LocalStore`.
+
+    Args:
+        app (Flask): The application.
+    """
+    kind = app.config.get('RESPONSE_CACHE', 'lru')
+    ttl = app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+    if kind == 'lru':
+        backend = LRUCache(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                           app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES), ttl,
+                           app.config.get('RESPONSE_CACHE_TAGS'))
+    elif kind == 'shared':
+        backend = SharedCache(app.config.get('RESPONSE_CACHE_CLIENT') or LocalStore(), ttl=ttl)
+    elif not kind:
+        return
+    else:
+        raise ValueError('Unknown RESPONSE_CACHE backend: %s' % kind)
+    app.extensions['response_cache'] = ResponseCache(backend)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the response cache of the current application, or None if caching is disabled."""
+    return current_app.extensions.get('response_cache')
+
+
+def cached(*tags: str) -> Callable:
+    """
+    Decorate a GET view so that its responses are cached until one of `tags` is written.
+
+    Args:
+        *tags (str): The names of the tables the view reads.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+            return cache.respond(view, tags, args, kwargs)
+        return wrapper
+    return decorator
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flushed_tables(session, flush_context) -> None:
+    """Remember the tables written by a flush of ORM objects."""
+    tables = session.info.setdefault('cache_tags', set())
+    user_id = current_user_id()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        tables.add(user_tag(obj.__table__.name, user_id))
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _record_statement_tables(orm_execute_state) -> None:
+    """Remember the tables written by bulk insert, update and delete statements."""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info.setdefault('cache_tags', set()).add(
+            user_tag(orm_execute_state.statement.table.name, current_user_id()))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_written_tables(session) -> None:
+    """Invalidate the cached responses that depend on the tables written by the committed transaction."""
+    tables = session.info.pop('cache_tags', None)
+    if tables and has_app_context():
+        cache = get_response_cache()
+        if cache is not None:
+            cache.invalidate(tables)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_written_tables(session, previous_transaction) -> None:
+    session.info.pop('cache_tags', None)
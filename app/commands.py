@@ -0,0 +1,99 @@
+# commands.py
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+
+from .ingest import DEFAULT_CHUNK_SIZE, import_csv
+from .migrations import MIGRATIONS, SCHEMA_VERSION, schema_version, upgrade
+from .rollups import check_rollups, rebuild_rollups
+from .tenancy import DEFAULT_USER_ID, user_exists, user_scope
+from . import db
+
+
+@click.command('import-csv')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--create-categories', is_flag=True, help='Create categories for unknown names.')
+@click.option('--batch-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows inserted per batch.')
+@click.option('--user', 'user_id', type=int, default=DEFAULT_USER_ID, show_default=True,
+              help='ID of the user the transactions belong to.')
+@with_appcontext
+def import_csv_command(path: str, create_categories: bool, batch_size: int, user_id: int) -> None:
+    """Import transactions from the CSV file at PATH."""
+    if not user_exists(user_id):
+        raise click.ClickException('User %d not found' % user_id)
+    with open(path, newline='', encoding='utf-8-sig') as csv_file, user_scope(user_id):
+        try:
+            report = import_csv(csv_file, create_categories=create_categories, batch_size=batch_size)
+        except ValueError as error:
+            raise click.ClickException(str(error))
+
+    for error in report['errors']:
+        click.echo('line %d: %s' % (error['line'], error['error']), err=True)
+    click.echo('Imported %d rows, rejected %d, created %d categories in %.2fs (%d rows/s)' % (
+        report['imported'], report['rejected'], report['categories_created'],
+        report['elapsed_seconds'], report['rows_per_second']))
+
+
+@click.group('rollups')
+def rollups_group() -> None:
+    """Maintain the spending rollups behind /summary."""
+
+
+@rollups_group.command('rebuild')
+@with_appcontext
+def rebuild_rollups_command() -> None:
+    """Recompute all spending rollups from the transactions table."""
+    rows = rebuild_rollups()
+    click.echo('Rebuilt %d rollup rows' % rows)
+
+
+@rollups_group.command('check')
+@with_appcontext
+def check_rollups_command() -> None:
+    """Compare the spending rollups with a full recomputation."""
+    mismatches = check_rollups()
+    for mismatch in mismatches:
+        click.echo('%(period)s %(period_start)s category %(category_id)s: ' % mismatch +
+                   'stored %(total)s/%(count)s' % mismatch['stored'] +
+                   ', expected %(total)s/%(count)s' % mismatch['expected'], err=True)
+    if mismatches:
+        raise click.ClickException('%d rollup rows are inconsistent; run `flask rollups rebuild`' % len(mismatches))
+    click.echo('Rollups are consistent')
+
+
+@click.group('db')
+def db_group() -> None:
+    """Manage the database schema."""
+
+
+@db_group.command('upgrade')
+@with_appcontext
+def upgrade_command() -> None:
+    """Apply the pending schema migrations."""
+    applied = upgrade(db.engine)
+    for migration in applied:
+        click.echo('Applied migration %d: %s' % (migration.version, migration.description))
+    click.echo('Schema is at version %d' % schema_version(db.engine))
+
+
+@db_group.command('version')
+@with_appcontext
+def version_command() -> None:
+    """Show the schema version of the database and the pending migrations."""
+    version = schema_version(db.engine)
+    click.echo('Schema is at version %d of %d' % (version, SCHEMA_VERSION))
+    for migration in MIGRATIONS:
+        if migration.version > version:
+            click.echo('Pending migration %d: %s' % (migration.version, migration.description))
+
+
+def register_commands(app: Flask) -> None:
+    """
+    Register the application's CLI commands.
+
+    Args:
+        app (Flask): The application to register the commands on.
+    """
+    app.cli.add_command(import_csv_command)
+    app.cli.add_command(rollups_group)
+    app.cli.add_command(db_group)
@@ -0,0 +1,82 @@
+# compression.py
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import Flask, Response, request
+
+# Number of compressed bodies of ETagged responses kept for reuse
+MAX_COMPRESSED_BODIES = 256
+
+
+class Compressor:
+    """
+    Gzip compression of HTML and JSON responses above a size threshold.
+
+    Bodies of responses carrying an ETag (the cached read endpoints) are compressed once and reused
+    while the ETag stays the same. The ETag is then made weak, as the compressed body is a different
+    byte sequence of the same resource; conditional requests still match it.
+
+    Args:
+        min_size (int): The smallest body, in bytes, that gets compressed.
+        level (int): The gzip compression level, 1 (fastest) to 9 (smallest).
+        mimetypes (tuple): The mimetypes to compress.
+    """
+
+    def __init__(self, min_size: int, level: int, mimetypes: tuple):
+        self.min_size = min_size
+        self.level = level
+        self.mimetypes = mimetypes
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compress(self, body: bytes, etag) -> bytes:
+        if etag is None:
+            return gzip.compress(body, self.level, mtime=0)
+        with self._lock:
+            compressed = self._bodies.get(etag)
+            if compressed is not None:
+                self._bodies.move_to_end(etag)
+                return compressed
+        compressed = gzip.compress(body, self.level, mtime=0)
+        with self._lock:
+            self._bodies[etag] = compressed
+            while len(self._bodies) > MAX_COMPRESSED_BODIES:
+                self._bodies.popitem(last=False)
+        return compressed
+
+    def __call__(self, response: Response) -> Response:
+        if response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or 'gzip' not in request.accept_encodings):
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        response.set_data(self._compress(body, etag))
+        response.headers['Content-Encoding'] = 'gzip'
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app: Flask) -> None:
+    """
+    Compress HTML and JSON responses for clients accepting gzip.
+
+    Configurations:
+        - COMPRESS_MIN_SIZE: The smallest body, in bytes, that gets compressed; None disables compression.
+        - COMPRESS_LEVEL: The gzip compression level.
+
+    Args:
+        app (Flask): The application.
+    """
+    if app.config.get('COMPRESS_MIN_SIZE') is None:
+        return
+    app.after_request(Compressor(app.config['COMPRESS_MIN_SIZE'], app.config.get('COMPRESS_LEVEL', 6),
+                                 ('text/html', 'application/json')))
@@ -0,0 +1,139 @@
+# config.py
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+class Config:
+    """
+    Default configuration of the application.
+
+    `create_app` loads these values, then overrides them with `FLASK_`-prefixed environment
+    variables (e.g. FLASK_SQLALCHEMY_DATABASE_URI, FLASK_DB_POOL_SIZE=20), then with its `config`
+    argument.
+    """
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///budget_tracker.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Apply pending schema migrations at startup; when disabled, run `flask db upgrade` before starting
+    SCHEMA_AUTO_UPGRADE = True
+
+    # Connection pool of file-based SQLite and server databases
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800  # Seconds after which server connections are replaced
+    DB_POOL_PRE_PING = True  # Check server connections before use
+
+    # SQLite pragmas applied to every new connection; None leaves the SQLite default
+    SQLITE_JOURNAL_MODE = 'WAL'  # Readers no longer block on the writer, nor the writer on readers
+    SQLITE_SYNCHRONOUS = 'NORMAL'  # Durable with WAL except on power loss; no fsync per commit
+    SQLITE_CACHE_SIZE = -64000  # Negative values are KiB: a 64 MB page cache per connection
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT = 5000  # Milliseconds a writer waits for the write lock
+
+    # JSON responses: 'auto' encodes with orjson when it is installed, 'stdlib' never does
+    JSON_ENCODER = 'auto'
+    JSON_STREAM_MIN_ROWS = 500  # Row arrays at least this long are streamed in chunks
+
+    # Write-behind queue for POST /transactions, off by default
+    WRITE_BEHIND = False
+
+    # Database read by the analytics endpoints: None for the primary, 'snapshot' or a read-only replica URI
+    ANALYTICS_REPLICA = None
+    ANALYTICS_REFRESH_INTERVAL = 60  # Seconds between snapshots
+    ANALYTICS_MAX_STALENESS = 300  # Seconds; older replica data is not served and analytics read the primary
+
+    # Requests served by each worker of the pre-fork server (`python -m app.server`) before it accepts connections
+    SERVER_WARMUP_URLS = ('/categories', '/summary', '/averages')
+
+    # Compiled templates are cached on disk; None puts them in a per-user temporary directory
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_BYTECODE_CACHE_DIR = None
+
+    # HTML and JSON responses at least this large are gzipped for clients accepting it; None disables
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+
+    # Request metrics served at GET /metrics
+    METRICS = True
+    # Dump a stack-sampling profile of requests slower than this many milliseconds; None disables
+    PROFILE_SLOW_REQUESTS = None
+    PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+    PROFILE_DIR = None  # instance/profiles by default
+
+
+def _is_sqlite_memory(url) -> bool:
+    return url.database is None or url.database in ('', ':memory:')
+
+
+def engine_options(config) -> dict:
+    """
+    Build the SQLAlchemy engine options for the configured database.
+
+    Options given explicitly in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+
+    Args:
+        config: The application configuration.
+
+    Returns:
+        dict: The engine options.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and _is_sqlite_memory(url):
+        return options  # A single shared connection (StaticPool); there is no pool to size
+
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    if url.get_backend_name() != 'sqlite':
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    return options
+
+
+def sqlite_pragmas(config, url) -> list:
+    """
+    List the pragmas to run on every new SQLite connection.
+
+    Args:
+        config: The application configuration.
+        url: The database URL.
+
+    Returns:
+        list: (pragma, value) pairs, skipping settings that are None.
+    """
+    pragmas = [
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT')),
+        ('cache_size', config.get('SQLITE_CACHE_SIZE')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS')),
+    ]
+    if not _is_sqlite_memory(url):
+        # In-memory databases have neither a journal file nor a file to map
+        pragmas += [
+            ('journal_mode', config.get('SQLITE_JOURNAL_MODE')),
+            ('mmap_size', config.get('SQLITE_MMAP_SIZE')),
+        ]
+    return [(pragma, value) for pragma, value in pragmas if value is not None]
+
+
+def configure_engine(engine: Engine, config) -> None:
+    """
+    Register a connect hook applying the SQLITE_* pragmas to every new connection of a SQLite engine.
+
+    Other databases are left untouched; their pool is configured by `engine_options`.
+
+    Args:
+        engine (Engine): The engine, before it opens its first connection.
+        config: The application configuration.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config, engine.url)
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute('PRAGMA %s = %s' % (pragma, value))
+        cursor.close()
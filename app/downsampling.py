@@ -0,0 +1,54 @@
+# downsampling.py
+from numbers import Real
+from typing import List, Sequence
+
+
+def largest_triangle_three_buckets(values: Sequence[Real], threshold: int) -> List[int]:
+    """
+    Choose at most `threshold` points of an evenly spaced series that keep its visual shape.
+
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first and last points are kept, the
+    others are split into `threshold - 2` buckets, and each bucket keeps the point forming the
+    largest triangle with the point kept in the previous bucket and the average of the next
+    bucket. Peaks and dips therefore survive, unlike with averaging or keeping every n-th point.
+    The cost is linear in the length of the series.
+
+    Args:
+        values (Sequence[Real]): The series, one value per evenly spaced x, e.g. ints or floats.
+        threshold (int): The number of points to keep; at least 3.
+
+    Returns:
+        List[int]: The positions of the points kept, in increasing order; every position if the
+        series is not longer than `threshold`.
+
+    Raises:
+        ValueError: If a series longer than `threshold` is to be reduced to fewer than 3 points.
+    """
+    count = len(values)
+    if count <= threshold:
+        return list(range(count))
+    if threshold < 3:
+        raise ValueError('threshold must be at least 3')
+
+    bucket_size = (count - 2) / (threshold - 2)
+    kept = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        # The average point of the next bucket; for the last bucket, the last point
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        average_x = (next_start + next_end - 1) / 2
+        average_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        previous_y = values[previous]
+        best, best_area = next_start - 1, -1.0
+        for position in range(int(bucket * bucket_size) + 1, next_start):
+            # Twice the area of the triangle; only comparisons matter
+            area = abs((previous - average_x) * (values[position] - previous_y)
+                       - (previous - position) * (average_y - previous_y))
+            if area > best_area:
+                best, best_area = position, area
+        kept.append(best)
+        previous = best
+    kept.append(count - 1)
+    return kept
@@ -0,0 +1,330 @@
+# ingest.py
+import csv
+import io
+import time
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from .models import Category, Transaction
+from .money import parse_amount
+from .registry import get_category_registry, parse_category_id
+from .rollups import add_delta, apply_deltas, new_deltas
+from .tenancy import effective_user_id
+from . import db
+
+# Number of rows sent to the database per executemany call
+DEFAULT_CHUNK_SIZE = 1000
+
+# Maximum number of rejected rows described in an import report
+DEFAULT_MAX_REPORTED_ERRORS = 100
+
+# Stands for a category to be created while the other fields of its first row are validated
+NEW_CATEGORY = -1
+
+
+def load_category_ids() -> set:
+    """
+    Return the IDs of the current user's categories from the category registry.
+
+    The registry is checked against the database version row first, so the set includes
+    categories created by other processes.
+
+    Returns:
+        set: The set of the user's category IDs currently in the database.
+    """
+    registry = get_category_registry()
+    registry.refresh(force=True)
+    return set(registry.names().values())
+
+
+def validate_transaction_row(row, category_ids: set) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Validate a single incoming transaction row without touching the database.
+
+    The rules and error messages mirror those of the single-row `create_transaction` handler.
+
+    Args:
+        row: A mapping with 'date', 'amount', 'category_id' and optionally 'notes'.
+        category_ids (set): The IDs of the current user's categories.
+
+    Returns:
+        Tuple[Optional[dict], Optional[str]]: The column values ready for insertion and None,
+        or None and an error message describing why the row was rejected.
+    """
+    if not isinstance(row, dict):
+        return None, 'Each row must be a JSON object'
+
+    date_str = row.get('date')
+    amount = row.get('amount')
+    category_id = row.get('category_id')
+    notes = row.get('notes', '')
+
+    if not date_str or not amount or not category_id:
+        return None, 'Date, amount, and category_id are required fields'
+
+    try:
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None, 'Invalid date format. Use YYYY-MM-DD.'
+
+    try:
+        category_id = parse_category_id(category_id)
+    except ValueError:
+        return None, 'Category not found'
+    if category_id not in category_ids:
+        return None, 'Category not found'
+
+    try:
+        amount = parse_amount(amount)
+    except ValueError as error:
+        return None, str(error)
+
+    return {'date': date, 'amount': amount, 'category_id': category_id, 'notes': notes}, None
+
+
+def chunked(values: Iterable[dict], chunk_size: int) -> Iterator[List[dict]]:
+    """
+    Split an iterable of rows into lists of at most `chunk_size` rows.
+
+    Args:
+        values (Iterable[dict]): The rows to split.
+        chunk_size (int): The maximum number of rows per chunk.
+
+    Yields:
+        List[dict]: Consecutive chunks of rows.
+    """
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_transactions(values: Iterable[dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Insert validated transaction rows using executemany batches.
+
+    The rows are added to the current session's transaction, together with the matching spending
+    rollup updates; committing is left to the caller so that a whole request is persisted with a
+    single commit. Rows without a `user_id` are given to the current user.
+
+    Args:
+        values (Iterable[dict]): Validated column values, as returned by `validate_transaction_row`.
+        chunk_size (int): The number of rows sent per executemany call.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    inserted = 0
+    deltas = new_deltas()
+    user_id = effective_user_id()
+    for chunk in chunked(values, chunk_size):
+        for value in chunk:
+            value.setdefault('user_id', user_id)
+        db.session.execute(insert(Transaction), chunk)
+        for value in chunk:
+            add_delta(deltas, value['category_id'], value['date'], value['amount'], 1)
+        inserted += len(chunk)
+    # One upsert for the whole call: rows sharing a category and period collapse into one change
+    apply_deltas(db.session.connection(), deltas)
+    return inserted
+
+
+class CategoryResolver:
+    """
+    Resolves category names to IDs from a copy of the category registry's name map of the current user.
+
+    Attributes:
+        by_name (dict): Category IDs keyed by category name.
+        ids (set): The IDs of the user's known categories.
+        create_missing (bool): Whether unknown names create a new category.
+        created (int): The number of categories created so far.
+    """
+
+    def __init__(self, create_missing: bool = False):
+        registry = get_category_registry()
+        registry.refresh(force=True)
+        self.by_name = dict(registry.names())
+        self.ids = set(self.by_name.values())
+        self.create_missing = create_missing
+        self.created = 0
+
+    def resolve(self, name: str) -> Optional[int]:
+        """
+        Return the ID of the named category.
+
+        Args:
+            name (str): The category name.
+
+        Returns:
+            Optional[int]: The category ID, or None if the category does not exist.
+        """
+        return self.by_name.get(name)
+
+    def create(self, name: str) -> int:
+        """
+        Create the named category, in the current database transaction.
+
+        Args:
+            name (str): The category name.
+
+        Returns:
+            int: The ID of the new category.
+        """
+        category = Category(name=name)
+        db.session.add(category)
+        db.session.flush()
+        category_id = self.by_name[name] = category.id
+        self.ids.add(category_id)
+        self.created += 1
+        return category_id
+
+
+def open_text_stream(stream: IO) -> IO[str]:
+    """
+    Wrap a binary stream (such as an upload) so it can be read as UTF-8 text line by line.
+
+    Args:
+        stream (IO): A text or binary stream.
+
+    Returns:
+        IO[str]: A text stream reading from `stream` without loading it into memory.
+    """
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_csv_rows(stream: IO) -> Iterator[Tuple[int, dict]]:
+    """
+    Read CSV rows one at a time from a stream.
+
+    The CSV must have a header with 'date' and 'amount' columns and either a 'category'
+    (name) or 'category_id' column; a 'notes' column is optional.
+
+    Args:
+        stream (IO): A text or binary stream holding the CSV data.
+
+    Yields:
+        Tuple[int, dict]: The line number and the row keyed by column name.
+
+    Raises:
+        ValueError: If the header is missing required columns.
+    """
+    reader = csv.DictReader(open_text_stream(stream))
+    columns = set(reader.fieldnames or ())
+    if not {'date', 'amount'} <= columns or not columns & {'category', 'category_id'}:
+        raise ValueError('CSV must have date, amount and category or category_id columns')
+    for row in reader:
+        yield reader.line_num, row
+
+
+def coerce_amount(amount):
+    """
+    Normalize an amount read from a CSV cell, dropping whitespace and thousands separators.
+
+    Args:
+        amount: The raw cell value.
+
+    Returns:
+        The cleaned amount text, or the value unchanged if it is not a string.
+    """
+    if isinstance(amount, str):
+        return amount.strip().replace(',', '').replace(' ', '')
+    return amount
+
+
+def parse_csv_rows(rows: Iterable[Tuple[int, dict]],
+                   resolver: CategoryResolver) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Map category names to IDs and validate CSV rows.
+
+    Args:
+        rows (Iterable[Tuple[int, dict]]): Rows as yielded by `read_csv_rows`.
+        resolver (CategoryResolver): The resolver used for the 'category' column.
+
+    Yields:
+        Tuple[int, Optional[dict], Optional[str]]: The line number, the validated column values
+        and an error message, one of which is None.
+    """
+    for line, row in rows:
+        name = (row.get('category') or '').strip()
+        category_id = resolver.resolve(name) if name else row.get('category_id')
+        if name and category_id is None and not resolver.create_missing:
+            yield line, None, 'Category not found'
+            continue
+        record = {
+            'date': (row.get('date') or '').strip(),
+            'amount': coerce_amount(row.get('amount')),
+            'category_id': category_id,
+            'notes': row.get('notes') or ''
+        }
+        if name and category_id is None:
+            # Validate the other fields first, so that rejected rows create no category
+            values, error = validate_transaction_row(dict(record, category_id=NEW_CATEGORY), {NEW_CATEGORY})
+            if values is not None:
+                values['category_id'] = resolver.create(name)
+        else:
+            values, error = validate_transaction_row(record, resolver.ids)
+        yield line, values, error
+
+
+def import_csv(stream: IO, create_categories: bool = False, batch_size: int = DEFAULT_CHUNK_SIZE,
+               max_errors: int = DEFAULT_MAX_REPORTED_ERRORS) -> dict:
+    """
+    Stream transactions from a CSV file into the database.
+
+    Rows flow through a generator pipeline and are inserted and committed in batches of
+    `batch_size`, so memory use does not depend on the size of the file.
+
+    Args:
+        stream (IO): A text or binary stream holding the CSV data.
+        create_categories (bool): Create categories for unknown names instead of rejecting the rows.
+        batch_size (int): The number of rows inserted and committed at a time.
+        max_errors (int): The maximum number of rejected rows described in the report.
+
+    Returns:
+        dict: The import report with imported/rejected counts, created categories, the first
+        rejected rows, the elapsed time and the throughput in rows per second.
+
+    Raises:
+        ValueError: If the CSV header is missing required columns.
+    """
+    started = time.perf_counter()
+    resolver = CategoryResolver(create_categories)
+    imported = rejected = 0
+    errors = []
+    batch = []
+
+    for line, values, error in parse_csv_rows(read_csv_rows(stream), resolver):
+        if error:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append({'line': line, 'error': error})
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            imported += insert_transactions(batch, batch_size)
+            db.session.commit()
+            batch = []
+
+    if batch:
+        imported += insert_transactions(batch, batch_size)
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'categories_created': resolver.created,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round((imported + rejected) / elapsed) if elapsed else 0
+    }
@@ -0,0 +1,41 @@
+# instrumentation.py
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """
+    Context manager recording the SQL statements executed on an engine while it is active.
+
+    An executemany call is recorded once, as it is a single round trip.
+
+    Example:
+        with QueryCounter(db.engine) as counter:
+            client.get('/transactions')
+        assert counter.count == 1
+
+    Attributes:
+        engine (Engine): The engine being observed.
+        statements (List[str]): The SQL text of each executed statement, in order.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        """int: The number of statements executed so far."""
+        return len(self.statements)
+
+    def __enter__(self) -> 'QueryCounter':
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self.engine, 'before_cursor_execute', self._record)
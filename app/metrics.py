@@ -0,0 +1,361 @@
+# metrics.py
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import db
+from .cache import get_response_cache
+from .writebehind import get_write_behind
+
+# Histogram bucket upper bounds, in seconds, bytes and statements
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Deepest stack kept by the sampling profiler
+MAX_STACK_DEPTH = 128
+
+
+class Histogram:
+    """
+    Distribution of observed values over fixed buckets, as exposed by Prometheus histograms.
+
+    Args:
+        buckets (Sequence[float]): The ascending upper bounds of the buckets; +Inf is implied.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: List[str]) -> None:
+        """Append the `_bucket`, `_sum` and `_count` samples of the histogram to `lines`."""
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative))
+        lines.append('%s_sum{%s} %r' % (name, labels, self.sum))
+        lines.append('%s_count{%s} %d' % (name, labels, self.count))
+
+
+class RequestTimer:
+    """
+    Time and SQL statements spent by the request being served.
+
+    Attributes:
+        started (float): `time.perf_counter()` when the request started.
+        statements (int): The SQL statements executed so far.
+        db_time (float): Seconds spent executing them.
+    """
+    __slots__ = ('started', 'statements', 'db_time', 'statement_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.statement_started = 0.0
+
+
+# The timer of the request served in the current context, if any
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar('request_timer', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.statements += 1
+        timer.statement_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.db_time += time.perf_counter() - timer.statement_started
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request counters and histograms of latency, response size, SQL statements and database time.
+
+    Latency runs from the start of the request until its response is ready; the body of a streamed
+    response is produced afterwards, so neither its time nor its size is included.
+    """
+
+    def __init__(self):
+        self.requests: Counter = Counter()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.statements: Dict[str, Histogram] = {}
+        self.db_time: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, method: str, status: int, seconds: float, statements: int,
+                db_seconds: float, size: Optional[int]) -> None:
+        """
+        Record a served request.
+
+        Args:
+            endpoint (str): The endpoint that served it.
+            method (str): The HTTP method.
+            status (int): The response status code.
+            seconds (float): Its latency.
+            statements (int): The SQL statements it executed.
+            db_seconds (float): Seconds it spent executing them.
+            size (Optional[int]): The size of the response body, or None if it is streamed.
+        """
+        with self._lock:
+            self.requests[endpoint, method, status] += 1
+            latency = self.latency.get((endpoint, method))
+            if latency is None:
+                latency = self.latency[endpoint, method] = Histogram(LATENCY_BUCKETS)
+                self.sizes[endpoint] = Histogram(SIZE_BUCKETS)
+                self.statements[endpoint] = Histogram(STATEMENT_BUCKETS)
+                self.db_time[endpoint] = Histogram(LATENCY_BUCKETS)
+            latency.observe(seconds)
+            self.statements[endpoint].observe(statements)
+            self.db_time[endpoint].observe(db_seconds)
+            if size is not None:
+                self.sizes[endpoint].observe(size)
+
+    def render(self) -> List[str]:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            List[str]: The lines of the exposition.
+        """
+        lines = [
+            '# HELP budget_http_requests_total Requests served.',
+            '# TYPE budget_http_requests_total counter',
+        ]
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append('budget_http_requests_total{endpoint="%s",method="%s",status="%d"} %d'
+                             % (endpoint, method, status, count))
+            lines.append('# HELP budget_http_request_duration_seconds Time until the response is ready.')
+            lines.append('# TYPE budget_http_request_duration_seconds histogram')
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                histogram.render('budget_http_request_duration_seconds',
+                                 'endpoint="%s",method="%s"' % (endpoint, method), lines)
+            for name, histograms, description in (
+                    ('budget_http_response_size_bytes', self.sizes, 'Size of the response bodies, if not streamed.'),
+                    ('budget_db_statements_per_request', self.statements, 'SQL statements executed per request.'),
+                    ('budget_db_seconds_per_request', self.db_time, 'Time spent executing SQL per request.')):
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s histogram' % name)
+                for endpoint, histogram in sorted(histograms.items()):
+                    histogram.render(name, 'endpoint="%s"' % endpoint, lines)
+        return lines
+
+
+def _collapse(frame) -> str:
+    """Render a stack as `outermost;...;innermost` frames, the format read by flame graph tools."""
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        frames.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of the threads serving requests, and dump the samples of slow requests.
+
+    A single background thread samples every `interval` seconds while a request is being served;
+    it sleeps otherwise. The samples of a request slower than `threshold` are written to `directory`
+    in the collapsed stack format (one `frame;frame;... count` line per distinct stack), which flame
+    graph tools such as flamegraph.pl and speedscope read.
+
+    Args:
+        threshold (float): The latency, in seconds, above which a request's profile is dumped.
+        interval (float): Seconds between samples.
+        directory (str): The directory the profiles are written to.
+    """
+
+    def __init__(self, threshold: float, interval: float, directory: str):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self._samples: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling the current thread."""
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        if not self._active.is_set():
+            self._active.set()
+
+    def discard(self) -> Optional[Counter]:
+        """Stop sampling the current thread, returning its samples."""
+        with self._lock:
+            return self._samples.pop(threading.get_ident(), None)
+
+    def finish(self, endpoint: str, seconds: float) -> Optional[str]:
+        """
+        Stop sampling the current thread, dumping its samples if the request was slow.
+
+        Args:
+            endpoint (str): The endpoint that served the request.
+            seconds (float): The latency of the request.
+
+        Returns:
+            Optional[str]: The path of the profile, if one was written.
+        """
+        samples = self.discard()
+        if not samples or seconds < self.threshold:
+            return None
+        path = os.path.join(self.directory, '%s-%s-%dms.collapsed' % (
+            time.strftime('%Y%m%d-%H%M%S'), endpoint.replace('.', '_'), seconds * 1000))
+        with open(path, 'w') as profile:
+            profile.writelines('%s %d\n' % (stack, count) for stack, count in samples.most_common())
+        logging.warning('Slow request to %s took %.0f ms, profile written to %s', endpoint, seconds * 1000, path)
+        return path
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._samples:
+                    # Idle for a whole interval: sleep until the next request rather than waking per request
+                    self._active.clear()
+                for ident, samples in self._samples.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        samples[_collapse(frame)] += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count the statements run on an engine, and their time, in the metrics of the current request."""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_metrics(app: Flask) -> None:
+    """
+    Record request metrics, served by `GET /metrics`, and optionally profile slow requests.
+
+    Must run before the response compression is set up, so that response sizes are measured
+    after compression.
+
+    Configurations:
+        - METRICS: Record request metrics (default True).
+        - PROFILE_SLOW_REQUESTS: Sample request stacks and dump the profile of requests slower than
+          this many milliseconds; None (default) disables the profiler.
+        - PROFILE_INTERVAL: Seconds between stack samples.
+        - PROFILE_DIR: The directory profiles are written to, `instance/profiles` by default.
+
+    Args:
+        app (Flask): The application.
+    """
+    if not app.config.get('METRICS', True):
+        return
+    metrics = app.extensions['request_metrics'] = RequestMetrics()
+    with app.app_context():
+        instrument_engine(db.engine)
+
+    profiler = None
+    if app.config.get('PROFILE_SLOW_REQUESTS') is not None:
+        directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        profiler = SamplingProfiler(app.config['PROFILE_SLOW_REQUESTS'] / 1000,
+                                    app.config.get('PROFILE_INTERVAL', 0.005), directory)
+
+    @app.before_request
+    def _start_request_timer() -> None:
+        _current_timer.set(RequestTimer())
+        if profiler is not None:
+            profiler.start()
+
+    @app.after_request
+    def _record_request(response: Response) -> Response:
+        timer = _current_timer.get()
+        if timer is None:
+            return response
+        seconds = time.perf_counter() - timer.started
+        endpoint = request.endpoint or 'unmatched'
+        size = response.content_length
+        if size is None and not response.is_streamed:
+            size = len(response.get_data())
+        metrics.observe(endpoint, request.method, response.status_code, seconds, timer.statements,
+                        timer.db_time, size)
+        if profiler is not None:
+            profiler.finish(endpoint, seconds)
+        return response
+
+    @app.teardown_request
+    def _clear_request_timer(error) -> None:
+        _current_timer.set(None)
+        if profiler is not None:
+            profiler.discard()  # The request failed before its response was ready
+
+
+def get_request_metrics() -> Optional[RequestMetrics]:
+    """Return the request metrics of the current application, or None if they are disabled."""
+    return current_app.extensions.get('request_metrics')
+
+
+def _render_stats(prefix: str, stats: dict, gauges: Sequence[str], lines: List[str]) -> None:
+    """Append the numeric `stats` as counters, or as gauges for the names in `gauges`."""
+    for name, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if name in gauges:
+            lines.append('# TYPE %s_%s gauge' % (prefix, name))
+            lines.append('%s_%s %r' % (prefix, name, value))
+        else:
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            lines.append('%s_%s_total %r' % (prefix, name, value))
+
+
+def render_metrics() -> str:
+    """
+    Render the request metrics of the current application, with the counters of its response cache,
+    template fragment cache and write-behind queue, in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition; empty if metrics are disabled.
+    """
+    metrics = get_request_metrics()
+    if metrics is None:
+        return ''
+    lines = metrics.render()
+    cache = get_response_cache()
+    if cache is not None:
+        _render_stats('budget_response_cache', cache.stats(), ('entries', 'bytes'), lines)
+    fragments = current_app.extensions.get('template_fragments')
+    if fragments is not None:
+        _render_stats('budget_template_fragment', {'hits': fragments.hits, 'misses': fragments.misses}, (), lines)
+    queue = get_write_behind()
+    if queue is not None:
+        _render_stats('budget_write_behind', queue.stats(), ('pending',), lines)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,163 @@
+# migrations.py
+import logging
+from collections import namedtuple
+from typing import List
+
+from flask import Flask, jsonify
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from .models import RegistryVersion
+from . import db
+
+# Name of the version row holding the version of the database schema
+SCHEMA_VERSION_NAME = 'schema'
+
+Migration = namedtuple('Migration', ['version', 'description', 'upgrade'])
+
+
+def _create_tables(engine: Engine) -> None:
+    db.metadata.create_all(engine)
+
+
+def _add_users(engine: Engine) -> None:
+    from .tenancy import ensure_default_user, ensure_user_columns
+    ensure_user_columns(engine)
+    ensure_default_user()
+
+
+def _convert_amounts(engine: Engine) -> None:
+    from .money import ensure_minor_unit_amounts
+    ensure_minor_unit_amounts(engine)
+
+
+def _create_indexes(engine: Engine) -> None:
+    # create_all() skips existing tables, so add indexes introduced since they were created
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def _create_search_index(engine: Engine) -> None:
+    from .search import ensure_search_index
+    ensure_search_index(engine)
+
+
+def _build_rollups(engine: Engine) -> None:
+    from .rollups import ensure_rollups
+    ensure_rollups()
+
+
+def _add_commit_times(engine: Engine) -> None:
+    from .writebehind import ensure_commit_times
+    ensure_commit_times(engine)
+
+
+# Every change to the schema, in order. A database created before versioning starts at version 0,
+# and each step also brings such a database, whatever its age, to the state the step describes.
+# New steps are appended with the next version; released steps are never changed.
+MIGRATIONS = [
+    Migration(1, 'Create missing tables', _create_tables),
+    Migration(2, 'Assign existing rows to the default user', _add_users),
+    Migration(3, 'Store amounts as integer minor units', _convert_amounts),
+    Migration(4, 'Create missing indexes', _create_indexes),
+    Migration(5, 'Create the full-text index over transaction notes', _create_search_index),
+    Migration(6, 'Build the spending rollups', _build_rollups),
+    Migration(7, 'Record when spooled writes were committed', _add_commit_times),
+]
+
+# The version of the schema the models describe
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(engine: Engine) -> int:
+    """
+    Return the version of a database's schema: one indexed read, with no schema inspection.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        int: The version of the last migration applied; 0 for a new database or one created
+        before schemas were versioned.
+    """
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(
+                select(RegistryVersion.version).where(RegistryVersion.name == SCHEMA_VERSION_NAME)
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        return 0  # No registry_versions table yet
+    return version or 0
+
+
+def _stamp(engine: Engine, version: int) -> None:
+    with engine.begin() as connection:
+        stamped = connection.execute(
+            update(RegistryVersion).where(RegistryVersion.name == SCHEMA_VERSION_NAME).values(version=version)
+        )
+        if not stamped.rowcount:
+            connection.execute(insert(RegistryVersion).values(name=SCHEMA_VERSION_NAME, version=version))
+
+
+def upgrade(engine: Engine) -> List[Migration]:
+    """
+    Apply the migrations newer than a database's schema version, in order; requires an app context.
+
+    The version is stored after each migration, so an interrupted upgrade resumes with the
+    migration that failed.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        List[Migration]: The migrations applied.
+    """
+    version = schema_version(engine)
+    pending = [migration for migration in MIGRATIONS if migration.version > version]
+    for migration in pending:
+        logging.info('Applying migration %d: %s', migration.version, migration.description)
+        migration.upgrade(engine)
+        _stamp(engine, migration.version)
+    return pending
+
+
+def init_schema(app: Flask) -> bool:
+    """
+    Check the database schema at startup; requires an app context.
+
+    A database at the current version costs a single query: the schema is neither inspected nor
+    created. An older database is upgraded, unless automatic upgrades are disabled: the
+    application then answers every request with a 503, and only its CLI commands are usable, so
+    that `flask db upgrade` can be run before it is restarted.
+
+    Configurations:
+        - SCHEMA_AUTO_UPGRADE: Whether startup applies pending migrations; True by default.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        bool: True if the schema is usable, False if it is outdated.
+    """
+    version = schema_version(db.engine)
+    if version == SCHEMA_VERSION:
+        return True
+    if version > SCHEMA_VERSION:
+        logging.warning('Database schema version %d is newer than the version %d of this code',
+                        version, SCHEMA_VERSION)
+        return True
+    if app.config.get('SCHEMA_AUTO_UPGRADE', True):
+        upgrade(db.engine)
+        return True
+
+    logging.error('Database schema version %d is older than the required version %d; run `flask db upgrade`',
+                  version, SCHEMA_VERSION)
+
+    def _refuse_requests():
+        return jsonify({'error': 'Database schema is outdated'}), 503
+
+    # First, so that no other hook queries the outdated schema
+    app.before_request_funcs.setdefault(None, []).insert(0, _refuse_requests)
+    return False
@@ -1,39 +1,209 @@
 # models.py
 from datetime import datetime
+from sqlalchemy.orm import declared_attr
+from .money import Money
 from . import db
 
 
-class Category(db.Model):
+class User(db.Model):
+    """
+    Model representing a user: the tenant owning categories, transactions and budgets.
+
+    Attributes:
+        id (int): Primary key, unique identifier for the user.
+        name (str): Name of the user, must be unique and not nullable.
+    """
+    __tablename__ = 'users'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+
+class UserOwned:
+    """
+    Mixin of the models whose rows belong to one user.
+
+    Queries made on behalf of a user only see that user's rows, and new rows are assigned to
+    that user (see `tenancy.py`).
+
+    Attributes:
+        user_id (int): Foreign key linking to the owning user.
+    """
+
+    @declared_attr
+    def user_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+
+class Category(UserOwned, db.Model):
     """
     Model representing a spending category.
 
     Attributes:
         id (int): Primary key, unique identifier for the category.
-        name (str): Name of the category, must be unique and not nullable.
+        name (str): Name of the category, unique per user and not nullable.
+        user_id (int): Foreign key linking to the owning user.
     """
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), unique=True, nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+
+    __table_args__ = (
+        # Also backs listing a user's categories by name
+        db.UniqueConstraint('user_id', 'name'),
+    )
 
 
-class Transaction(db.Model):
+class Transaction(UserOwned, db.Model):
     """
     Model representing a financial transaction.
 
     Attributes:
         id (int): Primary key, unique identifier for the transaction.
         date (datetime.date): Date of the transaction, defaults to current date.
-        amount (float): Amount spent in the transaction, cannot be null.
+        amount (Decimal): Amount spent in the transaction, cannot be null; stored as integer cents.
         category_id (int): Foreign key linking to the category of the transaction.
         notes (str): Additional notes about the transaction (optional).
+        user_id (int): Foreign key linking to the owning user.
         category (Category): Relationship to the Category model.
     """
     __tablename__ = 'transactions'
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, default=datetime.utcnow)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money(), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     notes = db.Column(db.String(200))
 
     # Relationship with Category model
     category = db.relationship('Category', backref=db.backref('transactions', lazy=True))
+
+    # Every index leads with the user, so that a user's searches never touch other users' rows
+    __table_args__ = (
+        # Backs keyset pagination ordered by (date, id) and date range filters
+        db.Index('ix_transactions_user_id_date_id', 'user_id', 'date', 'id'),
+        # Backs category filters, alone or with a date range
+        db.Index('ix_transactions_user_id_category_id_date', 'user_id', 'category_id', 'date'),
+        # Backs amount range filters
+        db.Index('ix_transactions_user_id_amount', 'user_id', 'amount'),
+    )
+
+
+class SpendingRollup(db.Model):
+    """
+    Model holding the running spending total of a category over one calendar period.
+
+    Rows are maintained incrementally on every transaction write (see `rollups.py`), so summaries
+    read a handful of pre-aggregated rows instead of scanning the transactions table. Rows belong
+    to the user of their category, and queries made on behalf of a user only see the rows of that
+    user's categories.
+
+    Attributes:
+        period (str): Period granularity: 'day', 'week' (starting Monday), 'month' or 'year'.
+        period_start (datetime.date): First day of the period.
+        category_id (int): Foreign key linking to the category.
+        total (Decimal): Sum of the amounts of the category's transactions in the period; stored as integer cents.
+        count (int): Number of the category's transactions in the period.
+    """
+    __tablename__ = 'spending_rollups'
+    period = db.Column(db.String(5), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    total = db.Column(Money(), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Backs reading the rollups of one user's categories
+        db.Index('ix_spending_rollups_category_id_period', 'category_id', 'period', 'period_start'),
+    )
+
+
+class RegistryVersion(db.Model):
+    """
+    Model holding a version counter per cached reference table.
+
+    The counter is bumped in the same database transaction as every write to the table, so each
+    process can tell whether its in-memory copy (see `registry.py`) is still current.
+
+    Attributes:
+        name (str): Name of the table, e.g. 'categories'.
+        version (int): Number of committed write transactions to the table.
+    """
+    __tablename__ = 'registry_versions'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SpooledWrite(db.Model):
+    """
+    Model recording which spooled write-behind entries have been committed.
+
+    Rows are inserted in the same database transaction as the transactions they describe, so
+    replaying the spool after a crash never inserts an entry twice (see `writebehind.py`). They
+    are kept for a while after their spool is emptied, so that any worker can answer status lookups.
+
+    Attributes:
+        provisional_id (str): The ID returned to the client when the write was accepted.
+        transaction_id (int): The ID of the inserted transaction.
+        committed_at (float): When the entry was committed, as a Unix time.
+    """
+    __tablename__ = 'spooled_writes'
+    provisional_id = db.Column(db.String(32), primary_key=True)
+    transaction_id = db.Column(db.Integer, nullable=False)
+    committed_at = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class Budget(UserOwned, db.Model):
+    """
+    Model representing a spending limit of a category over a calendar period.
+
+    Attributes:
+        id (int): Primary key, unique identifier for the budget.
+        category_id (int): Foreign key linking to the budgeted category.
+        period (str): Period the limit applies to: 'day', 'week', 'month' or 'year'.
+        limit (Decimal): Most the category may spend per period; stored as integer cents.
+        user_id (int): Foreign key linking to the owning user.
+        category (Category): Relationship to the Category model.
+    """
+    __tablename__ = 'budgets'
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    period = db.Column(db.String(5), nullable=False)
+    limit = db.Column(Money(), nullable=False)
+
+    category = db.relationship('Category')
+
+    __table_args__ = (
+        # One limit per category and period
+        db.UniqueConstraint('category_id', 'period'),
+        db.Index('ix_budgets_user_id', 'user_id'),
+    )
+
+
+class BudgetAlert(UserOwned, db.Model):
+    """
+    Model recording that a category's spending went over its budget in one period.
+
+    Rows are inserted by the alert engine (see `budgets.py`) in the same database transaction as
+    the write that crossed the limit; a budget raises at most one alert per period.
+
+    Attributes:
+        id (int): Primary key, increasing in the order alerts were raised.
+        budget_id (int): Foreign key linking to the exceeded budget.
+        period_start (datetime.date): First day of the period the budget was exceeded in.
+        total (Decimal): Spending of the period right after the write; stored as integer cents.
+        limit (Decimal): The limit of the budget at that time; stored as integer cents.
+        created_at (datetime.datetime): When the alert was raised, in UTC.
+        user_id (int): Foreign key linking to the owning user.
+    """
+    __tablename__ = 'budget_alerts'
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(db.Integer, db.ForeignKey('budgets.id'), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    total = db.Column(Money(), nullable=False)
+    limit = db.Column(Money(), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('budget_id', 'period_start'),
+        # Backs polling a user's alerts in order
+        db.Index('ix_budget_alerts_user_id_id', 'user_id', 'id'),
+    )
@@ -0,0 +1,174 @@
+# money.py
+import logging
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+from sqlalchemy import BigInteger, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+# Decimal places of the currency: amounts are stored as integer multiples of 10 ** -AMOUNT_EXPONENT
+AMOUNT_EXPONENT = 2
+
+# Error message of an amount that is not a positive number
+INVALID_AMOUNT = 'Invalid amount. Must be a positive number'
+
+# Largest amount, in minor units, a 64-bit integer column holds
+MAX_MINOR_UNITS = 2 ** 63 - 1
+
+
+def to_decimal(value) -> Decimal:
+    """
+    Convert a number or numeric string to a Decimal without binary rounding.
+
+    Floats, such as amounts parsed from JSON, are converted through their shortest repr, so
+    12.34 becomes Decimal('12.34') rather than Decimal(12.339999999999999857891452847979962825775146484375).
+
+    Args:
+        value: An int, float, Decimal or numeric string.
+
+    Returns:
+        Decimal: The value.
+
+    Raises:
+        ValueError: If the value is not a finite number.
+    """
+    if isinstance(value, bool):
+        raise ValueError('Not a number: %r' % value)
+    try:
+        number = value if isinstance(value, Decimal) else Decimal(repr(value) if isinstance(value, float) else value)
+    except (InvalidOperation, TypeError):
+        raise ValueError('Not a number: %r' % value) from None
+    if not number.is_finite():
+        raise ValueError('Not a finite number: %r' % value)
+    return number
+
+
+def to_minor_units(value, exponent: int = AMOUNT_EXPONENT) -> int:
+    """
+    Convert an amount to an integer number of minor units (cents), rounding half to even.
+
+    Args:
+        value: The amount in major units, as accepted by `to_decimal`.
+        exponent (int): The decimal places of the currency.
+
+    Returns:
+        int: The amount in minor units.
+
+    Raises:
+        ValueError: If the value is not a finite number or does not fit in 64 bits.
+    """
+    minor = int(to_decimal(value).scaleb(exponent).to_integral_value(ROUND_HALF_EVEN))
+    if abs(minor) > MAX_MINOR_UNITS:
+        raise ValueError('Amount out of range: %r' % value)
+    return minor
+
+
+def from_minor_units(minor: int, exponent: int = AMOUNT_EXPONENT) -> Decimal:
+    """
+    Convert an integer number of minor units to an exact Decimal amount, e.g. 1234 to Decimal('12.34').
+
+    Args:
+        minor (int): The amount in minor units.
+        exponent (int): The decimal places of the currency.
+
+    Returns:
+        Decimal: The amount in major units.
+    """
+    return Decimal(minor).scaleb(-exponent)
+
+
+def parse_amount(value, exponent: int = AMOUNT_EXPONENT) -> Decimal:
+    """
+    Validate a transaction amount from a request.
+
+    Args:
+        value: The amount as sent by the client: a JSON number or a numeric string.
+        exponent (int): The decimal places of the currency.
+
+    Returns:
+        Decimal: The amount, with exactly `exponent` decimal places.
+
+    Raises:
+        ValueError: If the amount is not a positive number that fits in 64 bits of minor units, or has
+            more than `exponent` decimal places; the message is meant for the client.
+    """
+    try:
+        amount = to_decimal(value)
+        minor = to_minor_units(amount, exponent)
+    except ValueError:
+        raise ValueError(INVALID_AMOUNT) from None
+    if amount <= 0:
+        raise ValueError(INVALID_AMOUNT)
+    if amount.scaleb(exponent) != minor:
+        raise ValueError('Invalid amount. Use at most %d decimal places' % exponent)
+    return from_minor_units(minor, exponent)
+
+
+class Money(TypeDecorator):
+    """
+    Exact decimal amount stored as a 64-bit integer number of minor units.
+
+    Python values are Decimals in major units (Decimal('12.34') is stored as 1234); ints, floats
+    and numeric strings are accepted as bound values too. SQL aggregates such as SUM run on the
+    integers, so totals are exact however many rows they add up, and their results are converted
+    back to Decimals.
+
+    Args:
+        exponent (int): The decimal places of the currency.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def __init__(self, exponent: int = AMOUNT_EXPONENT):
+        super().__init__()
+        self.exponent = exponent
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor_units(value, self.exponent)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor_units(int(value), self.exponent)
+
+
+def ensure_minor_unit_amounts(engine: Engine) -> None:
+    """
+    Convert transaction amounts stored as floating point by earlier versions to integer minor units.
+
+    SQLite cannot change a column's type, so the transactions table is rebuilt: renamed, created
+    again from the model with its indexes, filled with the converted rows and dropped. Other
+    databases convert the column in place. The rollups are rebuilt from the converted amounts, and
+    the full-text index stays valid as transaction IDs and notes are unchanged. Runs after
+    `tenancy.ensure_user_columns`, which gives the table its `user_id` column.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    from .models import SpendingRollup, Transaction
+    from .search import FTS_TABLE
+
+    columns = {column['name']: column['type'] for column in inspect(engine).get_columns('transactions')}
+    if 'amount' not in columns or isinstance(columns['amount'], BigInteger):
+        return
+
+    scale = 10 ** AMOUNT_EXPONENT
+    logging.info('Converting transaction amounts to integer minor units')
+    with engine.begin() as connection:
+        if engine.dialect.name == 'sqlite':
+            for index in Transaction.__table__.indexes:
+                connection.exec_driver_sql('DROP INDEX IF EXISTS %s' % index.name)
+            for trigger in ('insert', 'delete', 'update'):
+                connection.exec_driver_sql('DROP TRIGGER IF EXISTS %s_%s' % (FTS_TABLE, trigger))
+            connection.exec_driver_sql('ALTER TABLE transactions RENAME TO transactions_float')
+            Transaction.__table__.create(connection)
+            connection.exec_driver_sql(
+                'INSERT INTO transactions (id, date, amount, category_id, notes, user_id) '
+                'SELECT id, date, CAST(ROUND(amount * %d) AS INTEGER), category_id, notes, user_id '
+                'FROM transactions_float'
+                % scale)
+            connection.exec_driver_sql('DROP TABLE transactions_float')
+        else:
+            connection.exec_driver_sql(
+                'ALTER TABLE transactions ALTER COLUMN amount TYPE BIGINT USING ROUND(amount * %d)' % scale)
+        # Emptied, so that `ensure_rollups` rebuilds them from the converted amounts
+        SpendingRollup.__table__.drop(connection)
+        SpendingRollup.__table__.create(connection)
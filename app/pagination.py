@@ -0,0 +1,96 @@
+# pagination.py
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+# Upper bound for the `limit` query parameter of paginated endpoints
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: Sequence) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        values (Sequence): The values of the sort key columns.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> tuple:
+    """
+    Decode a cursor produced by `encode_cursor` for the given sort key columns.
+
+    Args:
+        cursor (str): The cursor string.
+        columns (Sequence): The sort key columns, used to restore the value types.
+
+    Returns:
+        tuple: The values of the sort key columns.
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match the columns.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for column, value in zip(columns, payload):
+        python_type = column.type.python_type
+        if python_type is date and isinstance(value, str):
+            value = date.fromisoformat(value)
+        elif not isinstance(value, python_type):
+            raise ValueError('Invalid cursor')
+        values.append(value)
+    return tuple(values)
+
+
+def paginate_keyset(query, columns: Sequence, after: Optional[str], limit: int, offset: int = 0,
+                    ordering: Optional[Sequence] = None, descending: bool = False) -> Tuple[list, Optional[str]]:
+    """
+    Fetch one page of a query ordered by a unique sort key, starting after a cursor.
+
+    Unlike OFFSET, the database seeks directly to the cursor position through the index on the
+    sort key, so every page costs the same no matter how deep it is.
+
+    Args:
+        query: The query to paginate, with filters already applied.
+        columns (Sequence): The sort key columns; together they must be unique.
+        after (Optional[str]): The cursor returned with the previous page, or None for the first page.
+        limit (int): The maximum number of rows in the page.
+        offset (int): Rows to skip before the page, for legacy offset pagination.
+        ordering (Optional[Sequence]): Expressions equivalent to `columns` to sort by, when the
+            query planner needs them written differently; defaults to `columns`.
+        descending (bool): Sort from the largest sort key down; the index is then read backwards.
+
+    Returns:
+        Tuple[list, Optional[str]]: The rows of the page and the cursor of the next page,
+        or None if this is the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if after:
+        key, position = tuple_(*columns), tuple_(*decode_cursor(after, columns))
+        query = query.filter(key < position if descending else key > position)
+    ordering = ordering or columns
+    if descending:
+        ordering = [column.desc() for column in ordering]
+    rows = query.order_by(*ordering).offset(offset or None).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
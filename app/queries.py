@@ -0,0 +1,210 @@
+# queries.py
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Mapping, Tuple
+
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+
+from .models import Category, Transaction
+from .money import MAX_MINOR_UNITS, from_minor_units, to_decimal
+from .search import notes_search_clause
+from .tenancy import current_user_id, user_criteria
+from . import db
+
+# Indexes able to drive a transaction search; all lead with the user the search is made for
+CATEGORY_DATE_INDEX = 'ix_transactions_user_id_category_id_date'
+DATE_INDEX = 'ix_transactions_user_id_date_id'
+AMOUNT_INDEX = 'ix_transactions_user_id_amount'
+SEARCH_INDEX = 'transactions_fts'
+
+
+def _amount_bound(value) -> Decimal:
+    """Parse an amount filter, clamped to the range of stored amounts: no transaction lies beyond it."""
+    limit = from_minor_units(MAX_MINOR_UNITS)
+    return min(max(to_decimal(value), -limit), limit)
+
+
+def parse_transaction_search(args: Mapping) -> dict:
+    """
+    Read the transaction search criteria from request arguments.
+
+    Supported arguments:
+        category_id (int, optional): Filter by category ID.
+        start_date (str, optional): Filter transactions from this date (format: YYYY-MM-DD).
+        end_date (str, optional): Filter transactions up to this date (format: YYYY-MM-DD).
+        min_amount (Decimal, optional): Minimum amount for filtering; bounds beyond the 64-bit range of
+            stored amounts are clamped to it.
+        max_amount (Decimal, optional): Maximum amount for filtering.
+        q (str, optional): Words that must all appear in the notes.
+
+    Args:
+        args (Mapping): The request arguments, usually `request.args`.
+
+    Returns:
+        dict: The criteria keyed by argument name; missing criteria are None.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    search = args.get('q', '')
+    return {
+        'category_id': args.get('category_id', type=int) or None,
+        'start_date': datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+        'end_date': datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None,
+        'min_amount': args.get('min_amount', type=_amount_bound),
+        'max_amount': args.get('max_amount', type=_amount_bound),
+        'q': search if any(c.isalnum() for c in search) else None
+    }
+
+
+def _unindexed(column, dialect_name: str):
+    """
+    Prefix a column with SQLite's unary '+' so the query planner will not drive the query through
+    an index on it. Other dialects get the column unchanged.
+    """
+    if dialect_name != 'sqlite':
+        return column
+    return UnaryExpression(column, operator=custom_op('+'), type_=column.type)
+
+
+def plan_transaction_search(criteria: dict, dialect_name: str) -> Tuple[str, List, List]:
+    """
+    Choose the index that drives a transaction search and build its filter and ordering clauses.
+
+    The most selective available access path wins, in this order:
+        1. the full-text index, when searching notes;
+        2. (user_id, category_id, date), when filtering by category, optionally with a date range;
+        3. (user_id, date, id), when filtering by date range;
+        4. (user_id, amount), when filtering by amount range;
+        5. (user_id, date, id), scanned in order, when there is no filter.
+
+    The user filter itself is added to every query made on behalf of a user (see `tenancy.py`),
+    and is served by whichever index drives the search.
+
+    The clauses served by the chosen index come first; the others are marked so that SQLite
+    checks them row by row instead of switching to a less selective index. For the same reason the
+    (date, id) ordering is marked when the driving index does not return rows in date order, so
+    SQLite sorts the matches instead of scanning the whole date index.
+
+    Args:
+        criteria (dict): The search criteria, as returned by `parse_transaction_search`.
+        dialect_name (str): The name of the database dialect.
+
+    Returns:
+        Tuple[str, List, List]: The name of the driving index, the filter clauses and the
+        (date, id) ordering clauses.
+    """
+    if criteria['q']:
+        index = SEARCH_INDEX
+    elif criteria['category_id']:
+        index = CATEGORY_DATE_INDEX
+    elif criteria['start_date'] or criteria['end_date']:
+        index = DATE_INDEX
+    elif criteria['min_amount'] is not None or criteria['max_amount'] is not None:
+        index = AMOUNT_INDEX
+    else:
+        index = DATE_INDEX
+
+    def col(column, indexes):
+        return column if index in indexes else _unindexed(column, dialect_name)
+
+    category_id = col(Transaction.category_id, (CATEGORY_DATE_INDEX,))
+    date = col(Transaction.date, (CATEGORY_DATE_INDEX, DATE_INDEX))
+    amount = col(Transaction.amount, (AMOUNT_INDEX,))
+
+    filters = []
+    if criteria['q']:
+        filters.append(notes_search_clause(criteria['q'], dialect_name))
+    if criteria['category_id']:
+        filters.append(category_id == criteria['category_id'])
+    if criteria['start_date']:
+        filters.append(date >= criteria['start_date'])
+    if criteria['end_date']:
+        filters.append(date <= criteria['end_date'])
+    if criteria['min_amount'] is not None:
+        filters.append(amount >= criteria['min_amount'])
+    if criteria['max_amount'] is not None:
+        filters.append(amount <= criteria['max_amount'])
+    ordering = [col(Transaction.date, (CATEGORY_DATE_INDEX, DATE_INDEX)),
+                col(Transaction.id, (CATEGORY_DATE_INDEX, DATE_INDEX))]
+    return index, filters, ordering
+
+
+def transaction_filters(args: Mapping) -> List:
+    """
+    Build the planned SQL filter clauses for a transaction search from request arguments.
+
+    Args:
+        args (Mapping): The request arguments; see `parse_transaction_search`.
+
+    Returns:
+        List: The filter clauses, to be passed to `filter()` or `where()`.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    return plan_transaction_search(parse_transaction_search(args), db.engine.dialect.name)[1]
+
+
+def transaction_search(args: Mapping) -> Tuple[List, List]:
+    """
+    Plan a transaction search listed in (date, id) order from request arguments.
+
+    Args:
+        args (Mapping): The request arguments; see `parse_transaction_search`.
+
+    Returns:
+        Tuple[List, List]: The filter clauses and the (date, id) ordering clauses.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    _, filters, ordering = plan_transaction_search(parse_transaction_search(args), db.engine.dialect.name)
+    return filters, ordering
+
+
+def explain_query_plan(statement) -> List[str]:
+    """
+    Return SQLite's query plan for a statement, one detail line per step.
+
+    In a user scope, the plan includes the user filter the statement runs with.
+
+    Args:
+        statement: A select or ORM query.
+
+    Returns:
+        List[str]: The `detail` column of `EXPLAIN QUERY PLAN`.
+    """
+    statement = getattr(statement, 'statement', statement)
+    user_id = current_user_id()
+    if user_id is not None:
+        statement = statement.options(*user_criteria(user_id))
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled))
+    return [row[-1] for row in rows]
+
+
+# Keys of the rows returned by `transaction_rows_query`, in column order
+TRANSACTION_ROW_COLUMNS = ('id', 'date', 'amount', 'category', 'notes')
+
+
+def transaction_rows_query():
+    """
+    Build a query returning transactions as plain rows with the category name joined in.
+
+    Each row has `id`, `date`, `amount`, `category` and `notes` attributes. No ORM instances are
+    created and no per-row category lookups are issued, so listing N transactions costs one SELECT.
+
+    Returns:
+        Query: The query, ready for further filtering, ordering and pagination.
+    """
+    return db.session.query(
+        Transaction.id,
+        Transaction.date,
+        Transaction.amount,
+        Category.name.label('category'),
+        Transaction.notes
+    ).join(Category, Transaction.category_id == Category.id)
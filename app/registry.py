@@ -0,0 +1,225 @@
+# registry.py
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from typing import Dict, List, Optional
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import Category, RegistryVersion
+from .replica import PRIMARY
+from .tenancy import ALL_USERS, effective_user_id
+from . import db
+
+# Seconds between checks of the version row for category writes made by other processes
+DEFAULT_CHECK_INTERVAL = 1.0
+
+# Name of the version row counting committed category writes
+CATEGORIES_VERSION = 'categories'
+
+CategoryEntry = namedtuple('CategoryEntry', ['id', 'name'])
+
+
+def parse_category_id(value) -> int:
+    """
+    Validate a category ID from a request.
+
+    Args:
+        value: The ID as sent by the client: a JSON integer or a string of digits.
+
+    Returns:
+        int: The category ID.
+
+    Raises:
+        ValueError: If the ID is anything else, e.g. a boolean, a float or a signed string.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    raise ValueError('Invalid category ID: %r' % (value,))
+
+
+def _categories_version():
+    return select(RegistryVersion.version).where(RegistryVersion.name == CATEGORIES_VERSION).execution_options(
+        **{PRIMARY: True})
+
+
+class CategoryRegistry:
+    """
+    Process-local copy of the categories table of every user, held as id -> name and, per user,
+    name -> id maps.
+
+    Category writes committed by this process mark the registry stale, and the next lookup reloads
+    it. Writes committed by other processes are noticed through the 'categories' version row. That
+    row is checked at most every `check_interval` seconds, and right away when a lookup misses, so
+    a category created by another process is never reported as missing.
+
+    Lookups are made for the current user (see `tenancy.effective_user_id`): other users'
+    categories are neither found nor listed.
+
+    Args:
+        check_interval (float): Seconds between checks of the version row; 0 checks on every lookup.
+
+    Attributes:
+        version (Optional[int]): The version of the categories currently loaded.
+        by_id (dict): Category names keyed by ID.
+        owners (dict): User IDs keyed by category ID.
+        by_user (dict): Per user ID, category IDs keyed by name.
+    """
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = None
+        self.by_id = {}
+        self.owners = {}
+        self.by_user = {}
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Reload every category, together with the version it corresponds to."""
+        # The version is read first: a write committed in between only causes one more reload
+        version = db.session.execute(_categories_version()).scalar()
+        rows = db.session.execute(
+            # Read from the primary even in analytics requests: an older replica would take the registry back in time
+            select(Category.id, Category.name, Category.user_id).execution_options(**{ALL_USERS: True, PRIMARY: True})
+        ).all()
+        by_id, owners, by_user = {}, {}, {}
+        for category_id, name, user_id in rows:
+            by_id[category_id] = name
+            owners[category_id] = user_id
+            by_user.setdefault(user_id, {})[name] = category_id
+        with self._lock:
+            self.by_id, self.owners, self.by_user, self.version = by_id, owners, by_user, version
+            self._checked = time.monotonic()
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Reload the registry if the version row has changed since it was loaded.
+
+        Args:
+            force (bool): Check the version row even if it was checked less than `check_interval` ago.
+        """
+        if not force and time.monotonic() - self._checked < self.check_interval:
+            return
+        if db.session.execute(_categories_version()).scalar() != self.version:
+            self.load()
+        else:
+            self._checked = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Make the next lookup check the version row."""
+        self._checked = float('-inf')
+
+    def exists(self, category_id) -> bool:
+        """
+        Return whether a category of the current user exists.
+
+        Args:
+            category_id: The category ID, as an int or a string of digits.
+
+        Returns:
+            bool: True if the category exists and belongs to the current user.
+        """
+        try:
+            category_id = parse_category_id(category_id)
+        except ValueError:
+            return False
+        user_id = effective_user_id()
+        self.refresh()
+        if self.owners.get(category_id) != user_id:
+            self.refresh(force=True)
+        return self.owners.get(category_id) == user_id
+
+    def names(self) -> Dict[str, int]:
+        """
+        Return the category IDs of the current user keyed by name.
+
+        Returns:
+            Dict[str, int]: The map held by the registry; callers must not modify it.
+        """
+        return self.by_user.get(effective_user_id(), {})
+
+    def find(self, name: str) -> Optional[int]:
+        """
+        Return the ID of the current user's category with a name.
+
+        Args:
+            name (str): The category name.
+
+        Returns:
+            Optional[int]: The category ID, or None if the user has no category with that name.
+        """
+        self.refresh()
+        if name not in self.names():
+            self.refresh(force=True)
+        return self.names().get(name)
+
+    def categories(self) -> List[CategoryEntry]:
+        """
+        Return the current user's categories, in creation order.
+
+        Returns:
+            List[CategoryEntry]: The categories, with `id` and `name` attributes like `Category`.
+        """
+        self.refresh()
+        return [CategoryEntry(category_id, name) for name, category_id in
+                sorted(self.names().items(), key=lambda item: item[1])]
+
+
+def init_category_registry(app: Flask) -> None:
+    """
+    Create the category registry of an application and load it; requires an app context.
+
+    Configurations:
+        - CATEGORY_REGISTRY_CHECK_INTERVAL: Seconds between checks for writes by other processes.
+
+    Args:
+        app (Flask): The application.
+    """
+    if db.session.get(RegistryVersion, CATEGORIES_VERSION) is None:
+        db.session.add(RegistryVersion(name=CATEGORIES_VERSION, version=0))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Created by another process meanwhile
+    registry = CategoryRegistry(app.config.get('CATEGORY_REGISTRY_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+    registry.load()
+    app.extensions['category_registry'] = registry
+
+
+def get_category_registry() -> CategoryRegistry:
+    """Return the category registry of the current application."""
+    return current_app.extensions['category_registry']
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_categories_version(session, flush_context, instances) -> None:
+    """Bump the categories version in the database transaction of the first category write."""
+    if session.info.get('categories_changed'):
+        return
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Category) and (obj not in session.dirty or session.is_modified(obj)):
+            session.execute(
+                update(RegistryVersion).where(RegistryVersion.name == CATEGORIES_VERSION)
+                .values(version=RegistryVersion.version + 1)
+            )
+            session.info['categories_changed'] = True
+            return
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_category_registry(session) -> None:
+    if session.info.pop('categories_changed', False) and has_app_context():
+        registry = current_app.extensions.get('category_registry')
+        if registry is not None:
+            registry.invalidate()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_category_changes(session, previous_transaction) -> None:
+    session.info.pop('categories_changed', None)
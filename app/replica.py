@@ -0,0 +1,342 @@
+# replica.py
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Callable, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Flask, current_app, has_request_context, make_response, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from . import db
+
+try:
+    import fcntl
+except ImportError:  # Without file locks, several processes may refresh the snapshot at the same time
+    fcntl = None
+
+# Defaults of the ANALYTICS_* settings
+DEFAULT_REFRESH_INTERVAL = 60.0
+DEFAULT_MAX_STALENESS = 300.0
+DEFAULT_REPLICA_LAG = 5.0
+
+# Execution option keeping a select of an analytics request on the primary database, e.g. to load
+# a process-wide cache that must not go back in time
+PRIMARY = 'primary'
+
+# WSGI environment key holding the replica engine an analytics request reads from
+REPLICA_ENVIRON_KEY = 'budget_tracker.replica'
+
+# Response headers telling where the data of an analytics response comes from, and how old it may be
+SOURCE_HEADER = 'X-Data-Source'
+STALENESS_HEADER = 'X-Data-Staleness'
+
+# Tables read by the analytics endpoints, whose cached responses are dropped when the replica data changes
+ANALYTICS_TABLES = ('categories', 'transactions', 'spending_rollups', 'budgets')
+
+
+class AnalyticsReplica:
+    """
+    Read-only copy of the database serving the analytics endpoints, so that their long read
+    transactions neither take connections from the primary pool nor stall its checkpoints and writers.
+
+    This class reads a replica kept up to date by the database server, e.g. a streaming replica
+    whose replication lag is at most `lag` seconds. `refresh` runs every `refresh_interval` seconds;
+    it restarts the staleness clock and drops the cached analytics responses, which may have been
+    computed before the replica caught up with a write.
+
+    The data of the replica is `staleness()` seconds old at most. When that exceeds `max_staleness`,
+    e.g. because refreshes stopped, analytics requests are served by the primary database instead.
+
+    Args:
+        engine (Engine): The engine of the replica.
+        refresh_interval (Optional[float]): Seconds between refreshes; None leaves refreshing to the caller.
+        max_staleness (float): The age of the replica data above which the primary is read instead.
+        lag (float): The maximum replication lag, in seconds.
+
+    Attributes:
+        captured (Optional[float]): The time the replica data was current at, or None before the first refresh.
+        refreshes (int): The number of refreshes made by this process.
+    """
+
+    source = 'replica'
+
+    def __init__(self, engine: Engine, refresh_interval: Optional[float] = DEFAULT_REFRESH_INTERVAL,
+                 max_staleness: float = DEFAULT_MAX_STALENESS, lag: float = DEFAULT_REPLICA_LAG):
+        self.engine = engine
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.lag = lag
+        self.captured = None
+        self.refreshes = 0
+        self._generation = 0
+        self._served = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _set_captured(self, captured: float) -> None:
+        with self._lock:
+            self.captured = captured
+            self._generation += 1
+
+    def refresh(self) -> bool:
+        """
+        Record that the replica has caught up to `lag` seconds ago.
+
+        Returns:
+            bool: True if the replica data changed.
+        """
+        self._set_captured(time.time() - self.lag)
+        self.refreshes += 1
+        return True
+
+    def staleness(self) -> Optional[float]:
+        """Return the number of seconds of writes the replica data may be missing, or None if it has no data yet."""
+        return None if self.captured is None else max(time.time() - self.captured, 0.0)
+
+    def choose(self) -> Tuple[Optional[Engine], Optional[float]]:
+        """
+        Choose where an analytics request reads from.
+
+        Whenever the choice changes, to a newer copy of the data or between the replica and the
+        primary, the cached responses of the analytics endpoints are dropped, so that a cached
+        response is never older than the data it claims to come from.
+
+        Returns:
+            Tuple[Optional[Engine], Optional[float]]: The replica engine and the time its data was
+            current at, or (None, None) if the primary must be read.
+        """
+        with self._lock:
+            captured = self.captured
+            fresh = captured is not None and time.time() - captured <= self.max_staleness
+            served = (self._generation, fresh)
+            changed, self._served = served != self._served, served
+        if changed:
+            from .cache import get_response_cache
+            cache = get_response_cache()
+            if cache is not None:
+                cache.invalidate(ANALYTICS_TABLES)
+        return (self.engine, captured) if fresh else (None, None)
+
+    def start(self) -> None:
+        """Start the thread refreshing the replica every `refresh_interval` seconds."""
+        self._thread = threading.Thread(target=self._run, name='analytics-replica', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the refreshing thread and close the connections to the replica."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.engine.dispose()
+
+    def _due(self) -> bool:
+        staleness = self.staleness()
+        return staleness is None or staleness - self.lag >= self.refresh_interval
+
+    def _run(self) -> None:
+        while True:
+            if self._due():
+                try:
+                    self.refresh()
+                except Exception:
+                    logging.exception('Refreshing the analytics %s failed', self.source)
+            if self._stop.wait(self.refresh_interval):
+                return
+
+
+class SnapshotReplica(AnalyticsReplica):
+    """
+    Analytics replica made of a copy of a SQLite database, taken with the online backup API.
+
+    Each refresh copies the database to a temporary file in a single read transaction, which
+    writers do not wait for in WAL mode, then atomically renames it over the snapshot. Requests
+    reading the previous snapshot keep their open file; new connections open the new one. The
+    snapshot is opened as immutable, so its readers take no locks at all.
+
+    Processes sharing a snapshot file take turns refreshing it through a lock file, and each one
+    notices a snapshot written by another from its modification time, which is set to the time the
+    copy started: the staleness of a snapshot is the age of that time.
+
+    Args:
+        database (str): The path of the primary SQLite database.
+        path (str): The path of the snapshot.
+        refresh_interval (Optional[float]): Seconds between refreshes; None leaves refreshing to the caller.
+        max_staleness (float): The age of the snapshot above which the primary is read instead.
+    """
+
+    source = 'snapshot'
+
+    def __init__(self, database: str, path: str, refresh_interval: Optional[float] = DEFAULT_REFRESH_INTERVAL,
+                 max_staleness: float = DEFAULT_MAX_STALENESS):
+        super().__init__(create_engine('sqlite:///file:%s?mode=ro&immutable=1&uri=true' % quote(path)),
+                         refresh_interval, max_staleness, lag=0.0)
+        self.database = database
+        self.path = path
+        self._file = None
+        self._check_file()
+
+    def _check_file(self) -> None:
+        """Switch to the snapshot file if it was replaced, by this process or another one."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity != self._file:
+            self._file = identity
+            self.engine.dispose()  # Pooled connections still read the replaced file
+            self._set_captured(stat.st_mtime)
+
+    def refresh(self) -> bool:
+        """
+        Copy the primary database to the snapshot, unless another process is doing so.
+
+        Returns:
+            bool: True if this process wrote a new snapshot.
+        """
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+            started = time.time()
+            temporary = '%s.%d.tmp' % (self.path, os.getpid())
+            try:
+                source = sqlite3.connect(self.database)
+                target = sqlite3.connect(temporary)
+                try:
+                    # All pages in one step: a stepwise copy restarts whenever another connection writes
+                    source.backup(target)
+                    # Immutable databases are read without a shared-memory index, which WAL mode needs
+                    target.execute('PRAGMA journal_mode = DELETE')
+                finally:
+                    target.close()
+                    source.close()
+                os.utime(temporary, (started, started))
+                os.replace(temporary, self.path)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+        self.refreshes += 1
+        logging.info('Analytics snapshot refreshed in %.2f s', time.time() - started)
+        self._check_file()
+        return True
+
+    def choose(self) -> Tuple[Optional[Engine], Optional[float]]:
+        self._check_file()
+        return super().choose()
+
+    def _due(self) -> bool:
+        self._check_file()
+        return super()._due()
+
+
+def init_replica(app: Flask) -> None:
+    """
+    Serve the analytics endpoints from a read-only replica, if one is configured; requires an app context.
+
+    Configurations:
+        - ANALYTICS_REPLICA: None (default) to serve analytics from the primary database, 'snapshot'
+          for a periodically refreshed copy of the SQLite database, or the URI of a read-only replica.
+        - ANALYTICS_SNAPSHOT_PATH: The snapshot file; 'analytics_snapshot.db' in the instance folder by default.
+        - ANALYTICS_REFRESH_INTERVAL: Seconds between snapshots, or between the cache flushes of a
+          replica; None disables the refreshing thread.
+        - ANALYTICS_REPLICA_LAG: The maximum replication lag of a replica given by URI, in seconds.
+        - ANALYTICS_MAX_STALENESS: The age in seconds of the replica data above which analytics are
+          served from the primary.
+
+    Args:
+        app (Flask): The application.
+
+    Raises:
+        ValueError: If a snapshot is requested for a database that is not a SQLite file.
+    """
+    kind = app.config.get('ANALYTICS_REPLICA')
+    if not kind:
+        return
+    interval = app.config.get('ANALYTICS_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+    max_staleness = app.config.get('ANALYTICS_MAX_STALENESS', DEFAULT_MAX_STALENESS)
+    if kind == 'snapshot':
+        database = db.engine.url.database
+        if db.engine.dialect.name != 'sqlite' or database in (None, '', ':memory:'):
+            raise ValueError('Analytics snapshots need a file-based SQLite database')
+        path = app.config.get('ANALYTICS_SNAPSHOT_PATH') or os.path.join(app.instance_path, 'analytics_snapshot.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        replica = SnapshotReplica(database, path, interval, max_staleness)
+    else:
+        replica = AnalyticsReplica(create_engine(kind), interval, max_staleness,
+                                   app.config.get('ANALYTICS_REPLICA_LAG', DEFAULT_REPLICA_LAG))
+
+    if 'request_metrics' in app.extensions:
+        from .metrics import instrument_engine
+        instrument_engine(replica.engine)
+    app.extensions['analytics_replica'] = replica
+    if interval:
+        replica.start()
+        atexit.register(replica.close)
+
+
+def get_analytics_replica() -> Optional[AnalyticsReplica]:
+    """Return the analytics replica of the current application, or None if analytics read the primary."""
+    return current_app.extensions.get('analytics_replica')
+
+
+def read_engine() -> Engine:
+    """Return the engine the current request reads from: the replica in analytics requests, else the primary."""
+    if has_request_context():
+        engine = request.environ.get(REPLICA_ENVIRON_KEY)
+        if engine is not None:
+            return engine
+    return db.engine
+
+
+def analytics(view: Callable) -> Callable:
+    """
+    Decorate a read-only view so that its ORM selects, and the connections it gets from `read_engine`,
+    read the analytics replica, if one is configured.
+
+    The responses get an X-Data-Source header ('primary', 'snapshot' or 'replica') and an
+    X-Data-Staleness header with the number of seconds of writes their data may be missing. Apply
+    it above `cache.cached`, so that cached responses are dropped before they could outlive their data.
+
+    Args:
+        view (Callable): The view function.
+
+    Returns:
+        Callable: The decorated view.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica = get_analytics_replica()
+        if replica is None:
+            return view(*args, **kwargs)
+        engine, captured = replica.choose()
+        if engine is not None:
+            # Kept with the request, so that streamed responses still read the replica
+            request.environ[REPLICA_ENVIRON_KEY] = engine
+        response = make_response(view(*args, **kwargs))
+        response.headers[SOURCE_HEADER] = replica.source if engine is not None else 'primary'
+        response.headers[STALENESS_HEADER] = '%.1f' % (max(time.time() - captured, 0.0) if engine is not None else 0)
+        return response
+    return wrapper
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _read_replica(orm_execute_state):
+    """Run the ORM selects of analytics requests on the replica."""
+    if (not orm_execute_state.is_select or not has_request_context()
+            or orm_execute_state.execution_options.get(PRIMARY)):
+        return None
+    engine = request.environ.get(REPLICA_ENVIRON_KEY)
+    if engine is None:
+        return None
+    return orm_execute_state.invoke_statement(bind_arguments=dict(orm_execute_state.bind_arguments, bind=engine))
@@ -0,0 +1,285 @@
+# rollups.py
+import importlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.engine import Connection
+
+from .budgets import evaluate_budgets
+from .models import Category, SpendingRollup, Transaction
+from .money import from_minor_units, to_minor_units
+from .tenancy import ALL_USERS
+from . import db
+
+# Granularities maintained in the rollup table
+PERIODS = ('day', 'week', 'month', 'year')
+
+# Columns of a transaction that determine which rollup rows it contributes to
+ROLLUP_FIELDS = ('category_id', 'date', 'amount')
+
+
+def period_start(day: date, period: str) -> date:
+    """
+    Return the first day of the period containing `day`.
+
+    Args:
+        day (date): The day.
+        period (str): One of PERIODS; weeks start on Monday.
+
+    Returns:
+        date: The first day of the period.
+    """
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def new_deltas() -> Dict[tuple, list]:
+    """
+    Create an empty set of rollup changes.
+
+    Returns:
+        Dict[tuple, list]: [total, count] changes keyed by (period, period_start, category_id), with
+        totals in integer minor units so that accumulating them is exact.
+    """
+    return defaultdict(lambda: [0, 0])
+
+
+def add_delta(deltas: dict, category_id: int, day, amount, count: int) -> None:
+    """
+    Record the contribution of transactions to every period containing `day`.
+
+    Args:
+        deltas (dict): The changes being accumulated, from `new_deltas`.
+        category_id (int): The category of the transactions.
+        day: The date of the transactions.
+        amount: The amount to add, as accepted by `money.to_minor_units`; negative to remove transactions.
+        count (int): The number of transactions to add; negative to remove transactions.
+    """
+    if isinstance(day, datetime):
+        day = day.date()
+    category_id = int(category_id)
+    amount = to_minor_units(amount)
+    for period in PERIODS:
+        entry = deltas[(period, period_start(day, period), category_id)]
+        entry[0] += amount
+        entry[1] += count
+
+
+def dialect_insert(connection: Connection, table):
+    """
+    Return an INSERT into `table` supporting ON CONFLICT clauses, on SQLite and PostgreSQL.
+
+    Only the dialect of the connection is imported, when first needed: importing the PostgreSQL
+    dialect takes longer than importing the rest of the application.
+
+    Args:
+        connection (Connection): The connection the statement is for.
+        table: The table to insert into.
+
+    Returns:
+        The dialect-specific INSERT, or None on other databases.
+    """
+    if connection.dialect.name not in ('sqlite', 'postgresql'):
+        return None
+    return importlib.import_module('sqlalchemy.dialects.%s' % connection.dialect.name).insert(table)
+
+
+def apply_deltas(connection: Connection, deltas: dict, check_budgets: bool = True) -> None:
+    """
+    Add accumulated changes to the rollup table, creating missing rows.
+
+    SQLite and PostgreSQL get a single executemany upsert; other databases update row by row.
+    The budgets of the changed periods are then checked against their new totals (see `budgets.py`).
+
+    Args:
+        connection (Connection): The connection of the database transaction that made the writes.
+        deltas (dict): The changes, from `new_deltas`.
+        check_budgets (bool): Raise alerts for budgets the changes push over their limit; off
+            when the rollups are rebuilt rather than written to.
+    """
+    rows = [
+        {'period': period, 'period_start': start, 'category_id': category_id, 'total': from_minor_units(total),
+         'count': count}
+        for (period, start, category_id), (total, count) in deltas.items()
+        if total or count
+    ]
+    if not rows:
+        return
+
+    table = SpendingRollup.__table__
+    insert = dialect_insert(connection, table)
+    if insert is not None:
+        statement = insert.on_conflict_do_update(
+            index_elements=[table.c.period, table.c.period_start, table.c.category_id],
+            set_={'total': table.c.total + insert.excluded.total, 'count': table.c.count + insert.excluded.count}
+        )
+        connection.execute(statement, rows)
+    else:
+        for row in rows:
+            result = connection.execute(
+                update(table).where(
+                    table.c.period == row['period'],
+                    table.c.period_start == row['period_start'],
+                    table.c.category_id == row['category_id']
+                ).values(total=table.c.total + row['total'], count=table.c.count + row['count'])
+            )
+            if not result.rowcount:
+                connection.execute(table.insert(), row)
+
+    if check_budgets:
+        evaluate_budgets(connection, deltas)
+
+
+def _rollup_fields_changed(transaction: Transaction) -> bool:
+    """Return whether a pending update changes the category, date or amount of a transaction."""
+    attrs = inspect(transaction).attrs
+    return any(attrs[field].history.has_changes() for field in ROLLUP_FIELDS)
+
+
+def _previous_values(session, transaction: Transaction) -> dict:
+    """
+    Return the values of ROLLUP_FIELDS as stored in the database before pending changes.
+    """
+    attrs = inspect(transaction).attrs
+    values = {}
+    for field in ROLLUP_FIELDS:
+        history = attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        elif not history.added:
+            values[field] = getattr(transaction, field)
+    if len(values) < len(ROLLUP_FIELDS):
+        # An attribute was assigned without its previous value being loaded
+        row = session.execute(
+            select(Transaction.category_id, Transaction.date, Transaction.amount)
+            .where(Transaction.id == transaction.id)
+        ).one()
+        values = dict(zip(ROLLUP_FIELDS, row))
+    return values
+
+
+@event.listens_for(db.session, 'before_flush')
+def _remove_changed_transactions(session, flush_context, instances) -> None:
+    """Subtract updated and deleted transactions from the rollups while their old values are still stored."""
+    deltas = session.info.setdefault('rollup_deltas', new_deltas())
+    deleted_categories = []
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            old = _previous_values(session, obj)
+            add_delta(deltas, old['category_id'], old['date'], -old['amount'], -1)
+        elif isinstance(obj, Category):
+            deleted_categories.append(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and obj not in session.deleted and _rollup_fields_changed(obj):
+            old = _previous_values(session, obj)
+            add_delta(deltas, old['category_id'], old['date'], -old['amount'], -1)
+    if deleted_categories:
+        session.execute(delete(SpendingRollup).where(SpendingRollup.category_id.in_(deleted_categories)))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _add_written_transactions(session, flush_context) -> None:
+    """Add created and updated transactions to the rollups, in the same database transaction."""
+    deltas = session.info.pop('rollup_deltas', None) or new_deltas()
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add_delta(deltas, obj.category_id, obj.date, obj.amount, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and obj not in session.deleted and _rollup_fields_changed(obj):
+            add_delta(deltas, obj.category_id, obj.date, obj.amount, 1)
+    apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_deltas(session, previous_transaction) -> None:
+    session.info.pop('rollup_deltas', None)
+
+
+def compute_rollups() -> dict:
+    """
+    Compute every rollup row from the transactions table.
+
+    The database groups transactions per category and day; the coarser periods are derived from
+    those daily totals.
+
+    Returns:
+        dict: The rollups as [total, count] keyed by (period, period_start, category_id), with
+        totals in minor units.
+    """
+    deltas = new_deltas()
+    daily = db.session.execute(
+        select(Transaction.category_id, Transaction.date, func.sum(Transaction.amount), func.count())
+        .group_by(Transaction.category_id, Transaction.date)
+        .execution_options(**{ALL_USERS: True})  # Rollups are kept for every user at once
+    )
+    for category_id, day, total, count in daily:
+        add_delta(deltas, category_id, day, total, count)
+    return deltas
+
+
+def rebuild_rollups() -> int:
+    """
+    Replace the rollup table with a full recomputation from the transactions table.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    deltas = compute_rollups()
+    db.session.execute(delete(SpendingRollup).execution_options(**{ALL_USERS: True}))
+    apply_deltas(db.session.connection(), deltas, check_budgets=False)
+    db.session.commit()
+    return len(deltas)
+
+
+def check_rollups() -> List[dict]:
+    """
+    Compare the stored rollups with a full recomputation from the transactions table.
+
+    Totals are integer minor units on both sides, so they must match exactly.
+
+    Returns:
+        List[dict]: One entry per mismatching rollup row; empty if the rollups are consistent.
+    """
+    expected = compute_rollups()
+    stored = {
+        (row.period, row.period_start, row.category_id): (to_minor_units(row.total), row.count)
+        for row in db.session.execute(select(SpendingRollup).execution_options(**{ALL_USERS: True})).scalars()
+    }
+
+    mismatches = []
+    for key in set(expected) | set(stored):
+        expected_total, expected_count = expected.get(key, (0, 0))
+        stored_total, stored_count = stored.get(key, (0, 0))
+        if (stored_total, stored_count) != (expected_total, expected_count):
+            period, start, category_id = key
+            mismatches.append({
+                'period': period,
+                'period_start': start.isoformat(),
+                'category_id': category_id,
+                'expected': {'total': from_minor_units(expected_total), 'count': expected_count},
+                'stored': {'total': from_minor_units(stored_total), 'count': stored_count}
+            })
+    return sorted(mismatches, key=lambda item: (item['period'], item['period_start'], item['category_id']))
+
+
+def ensure_rollups() -> None:
+    """
+    Build the rollups of a database whose transactions predate the rollup table.
+    """
+    has_rollups = db.session.execute(
+        select(SpendingRollup.category_id).limit(1).execution_options(**{ALL_USERS: True})
+    ).first()
+    has_transactions = db.session.execute(
+        select(Transaction.id).limit(1).execution_options(**{ALL_USERS: True})
+    ).first()
+    if has_transactions and not has_rollups:
+        rebuild_rollups()
@@ -1,8 +1,26 @@
 # routes.py
-from datetime import datetime
-from typing import Union
-from flask import Blueprint, request, jsonify, render_template, Response
-from .models import Category, Transaction
+import csv
+import io
+from datetime import date, datetime
+from typing import Iterator, Union
+from flask import Blueprint, current_app, request, jsonify, render_template, Response, stream_with_context, url_for
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from .budgets import ALERT_COLUMNS, budget_status, evaluate_budget, list_alerts
+from .cache import cached, get_response_cache
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_request_metrics, render_metrics
+from .models import Budget, Category, SpendingRollup, Transaction, User
+from .money import parse_amount
+from .ingest import DEFAULT_CHUNK_SIZE, import_csv, insert_transactions, load_category_ids, validate_transaction_row
+from .registry import get_category_registry
+from .replica import analytics, read_engine
+from .tenancy import effective_user_id, user_criteria
+from .writebehind import get_write_behind, spooled_status
+from .pagination import MAX_PAGE_SIZE, paginate_keyset
+from .rollups import PERIODS
+from .summaries import DEFAULT_TREND_POINTS, period_averages, period_summary, spending_trends
+from .queries import TRANSACTION_ROW_COLUMNS, transaction_filters, transaction_rows_query, transaction_search
+from .serialization import dumps_bytes, rows_response, rows_to_objects
 from . import db
 import logging
 
@@ -23,6 +41,35 @@ def internal_error(error) -> tuple:
     return jsonify({'error': 'An internal error occurred'}), 500
 
 
+@main.route('/users', methods=['POST'])
+def create_user() -> tuple:
+    """
+    Create a new user, with no categories or transactions.
+
+    Expects:
+        JSON with a 'name' field for the user name.
+
+    Other requests act on behalf of a user by sending its ID in the X-User-Id header; requests
+    without it act on behalf of the default user.
+
+    Returns:
+        tuple: A JSON response with the created user, or an error message.
+    """
+    name = request.get_json().get('name')
+    if not name:
+        return jsonify({'error': 'User name is required'}), 400
+
+    user = User(name=name)
+    db.session.add(user)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'User already exists'}), 400
+    logging.info('User %d created', user.id)
+    return jsonify({'message': 'User created successfully', 'user': {'id': user.id, 'name': user.name}}), 201
+
+
 @main.route('/categories', methods=['POST'])
 def create_category() -> Union[Response, tuple]:
     """
@@ -42,14 +89,20 @@ def create_category() -> Union[Response, tuple]:
         logging.warning('Category name is missing')
         return jsonify({'error': 'Category name is required'}), 400
 
-    if Category.query.filter_by(name=name).first():
+    if get_category_registry().find(name) is not None:
         logging.warning('Category already exists')
         return jsonify({'error': 'Category already exists'}), 400
 
     new_category = Category(name=name)
     db.session.add(new_category)
-    db.session.commit()
-    logging.info(f'Category {name} created successfully')
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Created by another process since the registry was last refreshed
+        db.session.rollback()
+        logging.warning('Category already exists')
+        return jsonify({'error': 'Category already exists'}), 400
+    logging.info('Category %s created successfully', name)
 
     if request.is_json:
         return jsonify({
@@ -60,25 +113,34 @@ def create_category() -> Union[Response, tuple]:
             }
         }), 201
     else:
-        categories = Category.query.all()
         logging.info('Rendering template for category creation response')
-        return render_template('categories.html', categories=categories), 200
+        return render_template('categories.html'), 200
 
 
 @main.route('/categories', methods=['GET'])
+@cached('categories')
 def get_categories() -> tuple:
     """
-    Retrieve all spending categories.
+    Retrieve spending categories ordered by name, one page at a time.
+
+    Query Parameters:
+        limit (int, optional): Page size, 10 by default.
+        after (str, optional): The `next_cursor` returned with the previous page.
+        offset (int, optional): Legacy offset pagination; prefer `after`.
 
     Returns:
-        tuple: A JSON response with a list of all categories.
+        tuple: A JSON response with a page of categories and the cursor of the next page.
     """
     logging.info('Retrieving categories')
-    limit = request.args.get('limit', 10, type=int)  # Default limit is 10
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)  # Default limit is 10
     offset = request.args.get('offset', 0, type=int)  # Default offset is 0
-    categories = Category.query.offset(offset).limit(limit).all()
-    category_list = [{'id': cat.id, 'name': cat.name} for cat in categories]
-    return jsonify({'categories': category_list}), 200
+    try:
+        categories, next_cursor = paginate_keyset(db.session.query(Category.id, Category.name),
+                                                  (Category.name, Category.id),
+                                                  request.args.get('after'), limit, offset)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return rows_response('categories', categories, ('id', 'name'), next_cursor=next_cursor), 200
 
 
 @main.route('/categories/<int:category_id>', methods=['PUT'])
@@ -92,7 +154,7 @@ def update_category(category_id: int) -> tuple:
     Returns:
         tuple: A JSON response with a success message and updated category or an error message.
     """
-    logging.info(f'Received request to update category with ID {category_id}')
+    logging.info('Received request to update category with ID %d', category_id)
     data = request.get_json()
     new_name = data.get('name')
 
@@ -109,7 +171,7 @@ def update_category(category_id: int) -> tuple:
     category.name = new_name
     db.session.commit()
 
-    logging.info(f'Category with ID {category_id} updated successfully')
+    logging.info('Category with ID %d updated successfully', category_id)
     return jsonify(
         {'message': 'Category updated successfully',
          'category': {'category_id': category.id, 'name': category.name}}), 200
@@ -126,7 +188,7 @@ def delete_category(category_id: int) -> tuple:
     Returns:
         tuple: A JSON response with a success message and updated list of categories, or an error message.
     """
-    logging.info(f'Received request to delete category with ID {category_id}')
+    logging.info('Received request to delete category with ID %d', category_id)
     category = db.session.get(Category, category_id)
 
     if not category:
@@ -141,7 +203,7 @@ def delete_category(category_id: int) -> tuple:
     db.session.delete(category)
     db.session.commit()
 
-    categories = Category.query.all()
+    categories = get_category_registry().categories()
     category_list = [{'id': cat.id, 'name': cat.name} for cat in categories]
     return jsonify({'message': 'Category deleted successfully', 'categories': category_list}), 200
 
@@ -154,6 +216,9 @@ def create_transaction() -> Union[Response, tuple]:
     Expects:
         JSON or form data with 'date', 'amount', 'category_id', and optionally 'notes'.
 
+    With WRITE_BEHIND enabled, a valid JSON request is spooled for the background writer and
+    answered with 202 and a provisional ID; see `GET /transactions/pending/<provisional_id>`.
+
     Returns:
         Union[Response, tuple]: A JSON response or rendered template with success information.
     """
@@ -172,15 +237,23 @@ def create_transaction() -> Union[Response, tuple]:
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
 
-    if not db.session.get(Category, category_id):
+    if not get_category_registry().exists(category_id):
         return jsonify({'error': 'Category not found'}), 404
 
     try:
-        amount = float(amount)
-        if amount <= 0:
-            raise ValueError('Amount must be positive')
-    except ValueError:
-        return jsonify({'error': 'Invalid amount. Must be a positive number'}), 400
+        amount = parse_amount(amount)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    writer = get_write_behind()
+    if writer is not None and request.is_json:
+        values = {'date': date, 'amount': amount, 'category_id': int(category_id), 'notes': notes}
+        provisional_id = writer.submit(dict(values, user_id=effective_user_id()))
+        return jsonify({
+            'message': 'Transaction accepted',
+            'transaction': dict(values, id=None, provisional_id=provisional_id, date=date.isoformat()),
+            'status_url': url_for('main.get_pending_transaction', provisional_id=provisional_id)
+        }), 202
 
     new_transaction = Transaction(date=date, amount=amount, category_id=category_id, notes=notes)
     db.session.add(new_transaction)
@@ -201,28 +274,278 @@ def create_transaction() -> Union[Response, tuple]:
         return render_template('transaction_result.html', transaction=new_transaction), 200
 
 
+@main.route('/transactions/pending/<provisional_id>', methods=['GET'])
+def get_pending_transaction(provisional_id: str) -> tuple:
+    """
+    Retrieve the state of a transaction accepted by the write-behind queue of any worker.
+
+    Transactions accepted by other workers are looked up in the shared spools and commit markers;
+    once committed, they can be looked up for WRITE_BEHIND_STATUS_RETENTION seconds after their
+    spool is emptied.
+
+    Args:
+        provisional_id (str): The provisional ID returned with the 202 response.
+
+    Returns:
+        tuple: A JSON response with the status ('pending' or 'committed', with the transaction ID),
+        or an error message if the ID is unknown.
+    """
+    writer = get_write_behind()
+    status = writer.status(provisional_id) if writer is not None else None
+    if status is None:
+        status = spooled_status(provisional_id)
+    if status is None:
+        return jsonify({'error': 'Pending transaction not found'}), 404
+    return jsonify(status), 200
+
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson')
+
+
+def _parse_bulk_body() -> Union[list, None]:
+    """
+    Parse the body of a bulk request into a list of rows.
+
+    JSON bodies must be an array of objects. NDJSON bodies hold one object per line; lines that
+    are not valid JSON are kept as None so that they are reported as rejected rows.
+
+    Returns:
+        Union[list, None]: The parsed rows, or None if the body is not a JSON array or NDJSON.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(current_app.json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows
+
+    data = request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+
+@main.route('/transactions/bulk', methods=['POST'])
+def create_transactions_bulk() -> tuple:
+    """
+    Create many transactions in a single request.
+
+    Expects:
+        A JSON array of transaction objects, or NDJSON (one object per line), each with 'date',
+        'amount', 'category_id', and optionally 'notes'.
+
+    All rows are validated against a single preloaded set of category IDs, the valid rows are
+    inserted in chunked executemany batches and everything is committed once.
+
+    Returns:
+        tuple: A JSON response with accepted/rejected counts and a per-row report.
+    """
+    rows = _parse_bulk_body()
+    if rows is None:
+        return jsonify({'error': 'Expected a JSON array or NDJSON body of transactions'}), 400
+
+    logging.info('Received bulk request with %d transactions', len(rows))
+    category_ids = load_category_ids()
+    accepted = []
+    results = []
+    for index, row in enumerate(rows):
+        values, error = validate_transaction_row(row, category_ids) if row is not None else (None, 'Invalid JSON')
+        if error:
+            results.append({'row': index, 'status': 'rejected', 'error': error})
+        else:
+            accepted.append(values)
+            results.append({'row': index, 'status': 'accepted'})
+
+    if accepted:
+        chunk_size = current_app.config.get('BULK_INSERT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        insert_transactions(accepted, chunk_size)
+        db.session.commit()
+
+    logging.info('Bulk request finished: %d accepted, %d rejected', len(accepted), len(rows) - len(accepted))
+    return jsonify({
+        'accepted': len(accepted),
+        'rejected': len(rows) - len(accepted),
+        'results': results
+    }), 201 if accepted else 400
+
+
+@main.route('/import/csv', methods=['POST'])
+def import_transactions_csv() -> tuple:
+    """
+    Import transactions from a CSV file.
+
+    Expects:
+        A CSV body (or a multipart upload in the 'file' field) with 'date', 'amount', either
+        'category' (name) or 'category_id', and optionally 'notes' columns.
+
+    Query Parameters:
+        create_categories (bool, optional): Create categories for unknown names instead of rejecting the rows.
+
+    The upload is read as a stream and flushed to the database in fixed-size batches, so memory use
+    does not depend on the size of the file.
+
+    Returns:
+        tuple: A JSON response with the import report, or an error message.
+    """
+    create_categories = request.args.get('create_categories', '').lower() in ('1', 'true', 'yes')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'A CSV file is required'}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+
+    batch_size = current_app.config.get('BULK_INSERT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    try:
+        report = import_csv(stream, create_categories=create_categories, batch_size=batch_size)
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
+
+    logging.info('CSV import finished: %d imported, %d rejected, %d rows/s',
+                 report['imported'], report['rejected'], report['rows_per_second'])
+    return jsonify(report), 200
+
+
+def _search_transactions(limit: int, offset: int = 0) -> tuple:
+    """
+    Fetch one page of the transactions matching the search parameters of the current request.
+
+    Args:
+        limit (int): The maximum number of transactions in the page.
+        offset (int): Rows to skip before the page, for legacy offset pagination.
+
+    Returns:
+        tuple: The rows of the page and the cursor of the next page, or None if this is the last page.
+
+    Raises:
+        ValueError: With a message for the client, if a parameter is invalid.
+    """
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('Invalid order. Use asc or desc.')
+    try:
+        filters, ordering = transaction_search(request.args)
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    try:
+        return paginate_keyset(transaction_rows_query().filter(*filters), (Transaction.date, Transaction.id),
+                               request.args.get('after'), limit, offset, ordering, descending=order == 'desc')
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+
 @main.route('/transactions', methods=['GET'])
 def get_transactions() -> tuple:
     """
-    Retrieve all transactions.
+    Search transactions, returning them ordered by date one page at a time.
+
+    Query Parameters:
+        category_id (int, optional): Filter by category ID.
+        start_date (str, optional): Filter transactions from this date (format: YYYY-MM-DD).
+        end_date (str, optional): Filter transactions up to this date (format: YYYY-MM-DD).
+        min_amount (float, optional): Minimum amount for filtering.
+        max_amount (float, optional): Maximum amount for filtering.
+        q (str, optional): Words that must all appear in the notes.
+        order (str, optional): 'asc' (default) for oldest first, 'desc' for newest first.
+        limit (int, optional): Page size, 10 by default.
+        after (str, optional): The `next_cursor` returned with the previous page.
+        offset (int, optional): Legacy offset pagination; prefer `after`.
 
     Returns:
-        tuple: A JSON response with a list of all transactions.
+        tuple: A JSON response with a page of matching transactions and the cursor of the next page.
     """
-    limit = request.args.get('limit', 10, type=int)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
     offset = request.args.get('offset', 0, type=int)
-    transactions = Transaction.query.offset(offset).limit(limit).all()
-    transaction_list = [
-        {
-            'id': txn.id,
-            'date': txn.date.isoformat(),
-            'amount': txn.amount,
-            'category': txn.category.name,
-            'notes': txn.notes
-        }
-        for txn in transactions
-    ]
-    return jsonify({'transactions': transaction_list}), 200
+    try:
+        transactions, next_cursor = _search_transactions(limit, offset)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return rows_response('transactions', transactions, TRANSACTION_ROW_COLUMNS, next_cursor=next_cursor), 200
+
+
+EXPORT_COLUMNS = ('id', 'date', 'amount', 'category', 'notes')
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_rows(statement) -> Iterator[list]:
+    """
+    Run a select on its own connection and yield the result in batches using a server-side cursor.
+
+    The connection is taken from the analytics replica, if one is configured.
+
+    Args:
+        statement: The select to run.
+
+    Yields:
+        list: Batches of at most EXPORT_BATCH_SIZE result rows.
+    """
+    with read_engine().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def _export_csv(statement) -> Iterator[str]:
+    """Yield the rows of an export select as CSV text, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in _export_rows(statement):
+        writer.writerows((txn_id, date.isoformat(), amount, category, notes)
+                         for txn_id, date, amount, category, notes in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(statement) -> Iterator[bytes]:
+    """Yield the rows of an export select as NDJSON, one chunk per batch."""
+    for rows in _export_rows(statement):
+        yield b''.join(dumps_bytes(row) + b'\n' for row in rows_to_objects(rows, EXPORT_COLUMNS))
+
+
+@main.route('/transactions/export', methods=['GET'])
+@analytics
+def export_transactions() -> Union[Response, tuple]:
+    """
+    Export transactions as a streamed CSV or NDJSON file.
+
+    Query Parameters:
+        format (str, optional): 'csv' (default) or 'ndjson'.
+        The filters of `GET /transactions` (category_id, start_date, end_date, min_amount, max_amount).
+
+    Rows are read with a server-side cursor and written out batch by batch, so memory use does not
+    depend on the number of exported transactions.
+
+    Returns:
+        Union[Response, tuple]: A streaming response with the exported rows, or an error message.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Invalid format. Use csv or ndjson.'}), 400
+
+    try:
+        filters = transaction_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    # Run on a connection of its own, outside the session that adds the user filter to queries
+    statement = select(
+        Transaction.id, Transaction.date, Transaction.amount, Category.name, Transaction.notes
+    ).join(Category).where(*filters).order_by(Transaction.id).options(*user_criteria(effective_user_id()))
+
+    if export_format == 'csv':
+        body, mimetype = _export_csv(statement), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(statement), 'application/x-ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename=transactions.%s' % export_format
+    return response
 
 
 @main.route('/transactions/<int:transaction_id>', methods=['PUT'])
@@ -247,11 +570,15 @@ def update_transaction(transaction_id: int) -> tuple:
             transaction.date = datetime.strptime(data['date'], "%Y-%m-%d").date()
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
-    transaction.amount = data.get('amount', transaction.amount)
+    if 'amount' in data:
+        try:
+            transaction.amount = parse_amount(data['amount'])
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
     transaction.category_id = data.get('category_id', transaction.category_id)
     transaction.notes = data.get('notes', transaction.notes)
 
-    if data.get('category_id') and not db.session.get(Category, transaction.category_id):
+    if data.get('category_id') and not get_category_registry().exists(transaction.category_id):
         return jsonify({'error': 'Category not found'}), 404
 
     db.session.commit()
@@ -281,85 +608,363 @@ def delete_transaction(transaction_id: int) -> tuple:
     return jsonify({'message': 'Transaction deleted successfully'}), 200
 
 
+def _period_range_args() -> tuple:
+    """
+    Read the `start` and `end` query parameters of the period endpoints.
+
+    Returns:
+        tuple: The start and end dates, either of which may be None.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    start = request.args.get('start')
+    end = request.args.get('end')
+    return (datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+            datetime.strptime(end, '%Y-%m-%d').date() if end else None)
+
+
 @main.route('/summary', methods=['GET'])
+@analytics
+@cached('categories', 'transactions', 'spending_rollups')
 def get_summary():
+    """
+    Retrieve the total spent per category, all-time or per period.
+
+    Query Parameters:
+        period (str, optional): 'day', 'week', 'month' or 'year' to break the totals down per period.
+        start (str, optional): A date (YYYY-MM-DD) in the first period; only with `period`.
+        end (str, optional): A date (YYYY-MM-DD) in the last period; only with `period`.
+
+    Totals are read from the spending rollups, so the cost depends on the number of categories
+    and periods rather than on the number of transactions.
+
+    Returns:
+        tuple: A JSON response with the total spent per category, and with `period` the gap-filled
+        totals and counts of each category in every period.
+    """
+    period = request.args.get('period')
+    if period:
+        if period not in PERIODS:
+            return jsonify({'error': 'Invalid period. Use day, week, month or year.'}), 400
+        try:
+            start, end = _period_range_args()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+        try:
+            return jsonify(period_summary(period, start, end)), 200
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+
     summary = db.session.query(
         Category.name,
-        db.func.sum(Transaction.amount).label('total_spent')
-    ).join(Transaction).group_by(Category.name).all()
+        db.func.sum(SpendingRollup.total).label('total_spent')
+    ).join(SpendingRollup, SpendingRollup.category_id == Category.id).filter(
+        SpendingRollup.period == 'year'
+    ).group_by(Category.name).having(db.func.sum(SpendingRollup.count) > 0).all()
 
     summary_data = [{'category': item[0], 'total_spent': item[1]} for item in summary]
     return jsonify({'summary': summary_data}), 200
 
 
+@main.route('/averages', methods=['GET'])
+@analytics
+@cached('categories', 'transactions', 'spending_rollups')
+def get_averages() -> tuple:
+    """
+    Retrieve the historical average spending per period of every category.
+
+    Query Parameters:
+        period (str, optional): 'day', 'week', 'month' (default) or 'year'.
+        start (str, optional): A date (YYYY-MM-DD) in the first period; defaults to the earliest spending.
+        end (str, optional): A date (YYYY-MM-DD) in the last period; defaults to the latest spending.
+
+    Returns:
+        tuple: A JSON response with the per-category totals and averages.
+    """
+    period = request.args.get('period', 'month')
+    if period not in PERIODS:
+        return jsonify({'error': 'Invalid period. Use day, week, month or year.'}), 400
+    try:
+        start, end = _period_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    try:
+        return jsonify(period_averages(period, start, end)), 200
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+
+@main.route('/trends', methods=['GET'])
+@analytics
+@cached('categories', 'transactions', 'spending_rollups')
+def get_trends() -> tuple:
+    """
+    Retrieve spending time series for charts: one gap-filled series per category, downsampled to
+    at most `max_points` points while keeping peaks and dips.
+
+    Query Parameters:
+        granularity (str, optional): 'day', 'week', 'month' (default) or 'year'.
+        category_id (int, optional): A category to chart; repeat it or separate IDs with commas to chart
+            several. Every category with spending by default.
+        start (str, optional): A date (YYYY-MM-DD) in the first period; defaults to the earliest spending.
+        end (str, optional): A date (YYYY-MM-DD) in the last period; defaults to the latest spending.
+        max_points (int, optional): The most points per series, 500 by default and at least 3.
+
+    Returns:
+        tuple: A JSON response with the range and one columnar series (`periods` and `totals` arrays)
+        per category.
+    """
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in PERIODS:
+        return jsonify({'error': 'Invalid granularity. Use day, week, month or year.'}), 400
+    try:
+        category_ids = [int(value) for values in request.args.getlist('category_id')
+                        for value in values.split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'Invalid category ID'}), 400
+    registry = get_category_registry()
+    if not all(registry.exists(category_id) for category_id in category_ids):
+        return jsonify({'error': 'Category not found'}), 404
+    try:
+        start, end = _period_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    max_points = max(request.args.get('max_points', DEFAULT_TREND_POINTS, type=int), 3)
+    try:
+        return jsonify(spending_trends(granularity, category_ids, start, end, max_points)), 200
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+
+def _budget_json(budget: Budget) -> dict:
+    return {'id': budget.id, 'category_id': budget.category_id, 'period': budget.period, 'limit': budget.limit}
+
+
+@main.route('/budgets', methods=['POST'])
+def create_budget() -> tuple:
+    """
+    Create a spending limit for a category over a period.
+
+    Expects:
+        JSON with 'category_id', 'period' ('day', 'week', 'month' or 'year') and 'limit'.
+
+    If the category has already spent more than the limit in the current period, an alert is
+    raised right away.
+
+    Returns:
+        tuple: A JSON response with the created budget, or an error message.
+    """
+    data = request.get_json()
+    category_id = data.get('category_id')
+    period = data.get('period')
+    limit = data.get('limit')
+
+    if not category_id or not period or not limit:
+        return jsonify({'error': 'category_id, period and limit are required fields'}), 400
+    if period not in PERIODS:
+        return jsonify({'error': 'Invalid period. Use day, week, month or year.'}), 400
+    if not get_category_registry().exists(category_id):
+        return jsonify({'error': 'Category not found'}), 404
+    try:
+        limit = parse_amount(limit)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    budget = Budget(category_id=int(category_id), period=period, limit=limit)
+    db.session.add(budget)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Budget already exists'}), 400
+    exceeded = evaluate_budget(budget, date.today())
+    db.session.commit()
+    logging.info('Budget %d created for category %d', budget.id, budget.category_id)
+    return jsonify({'message': 'Budget created successfully', 'budget': _budget_json(budget),
+                    'exceeded': exceeded}), 201
+
+
+@main.route('/budgets', methods=['GET'])
+@cached('budgets')
+def get_budgets() -> tuple:
+    """
+    Retrieve every budget.
+
+    Returns:
+        tuple: A JSON response with the budgets, ordered by ID.
+    """
+    budgets = db.session.execute(
+        select(Budget.id, Budget.category_id, Budget.period, Budget.limit).order_by(Budget.id)
+    ).all()
+    return rows_response('budgets', budgets, ('id', 'category_id', 'period', 'limit')), 200
+
+
+@main.route('/budgets/<int:budget_id>', methods=['PUT'])
+def update_budget(budget_id: int) -> tuple:
+    """
+    Change the limit of a budget.
+
+    Args:
+        budget_id (int): The ID of the budget to update.
+
+    Returns:
+        tuple: A JSON response with the updated budget, or an error message.
+    """
+    data = request.get_json()
+    budget = db.session.get(Budget, budget_id)
+
+    if not budget:
+        return jsonify({'error': 'Budget not found'}), 404
+    try:
+        budget.limit = parse_amount(data.get('limit'))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    db.session.flush()
+    exceeded = evaluate_budget(budget, date.today())
+    db.session.commit()
+    return jsonify({'message': 'Budget updated successfully', 'budget': _budget_json(budget),
+                    'exceeded': exceeded}), 200
+
+
+@main.route('/budgets/<int:budget_id>', methods=['DELETE'])
+def delete_budget(budget_id: int) -> tuple:
+    """
+    Delete a budget and its alerts.
+
+    Args:
+        budget_id (int): The ID of the budget to delete.
+
+    Returns:
+        tuple: A JSON response with a success message, or an error message if the budget is not found.
+    """
+    budget = db.session.get(Budget, budget_id)
+
+    if not budget:
+        return jsonify({'error': 'Budget not found'}), 404
+
+    db.session.delete(budget)
+    db.session.commit()
+    return jsonify({'message': 'Budget deleted successfully'}), 200
+
+
+@main.route('/budgets/status', methods=['GET'])
+@analytics
+def get_budget_status() -> tuple:
+    """
+    Compare the current spending of every budgeted category with its limit.
+
+    Query Parameters:
+        date (str, optional): A date (YYYY-MM-DD) in the periods to report; defaults to today.
+        period (str, optional): Only report budgets of this period.
+
+    The spending comes from the rollup row of each budget's period, joined in a single query, so
+    the cost depends on the number of budgets rather than on the number of transactions.
+
+    Returns:
+        tuple: A JSON response with, per budget, the period, limit, amount spent and remaining, the
+        share of the limit used and whether it is exceeded.
+    """
+    day = request.args.get('date')
+    period = request.args.get('period')
+    if period and period not in PERIODS:
+        return jsonify({'error': 'Invalid period. Use day, week, month or year.'}), 400
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else date.today()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    return jsonify({'date': day, 'status': budget_status(day, period)}), 200
+
+
+@main.route('/budgets/alerts', methods=['GET'])
+def get_budget_alerts() -> tuple:
+    """
+    Retrieve the alerts raised when categories went over their budget, oldest first.
+
+    Query Parameters:
+        after (int, optional): The `last_id` of the previous response, to only get newer alerts.
+        limit (int, optional): Page size, 100 by default.
+
+    Returns:
+        tuple: A JSON response with the alerts and the ID of the last one.
+    """
+    after = request.args.get('after', 0, type=int)
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PAGE_SIZE)
+    alerts = list_alerts(after, limit)
+    return rows_response('alerts', alerts, ALERT_COLUMNS, last_id=alerts[-1].id if alerts else after), 200
+
+
 @main.route('/categories-page', methods=['GET'])
+@cached('categories')
 def get_categories_page():
-    categories = Category.query.all()
-    return render_template('categories.html', categories=categories)
+    return render_template('categories.html')
+
+
+# Rows rendered server-side by the transactions page; the rest is fetched as the user scrolls
+TRANSACTIONS_PAGE_SIZE = 50
 
 
 @main.route('/transactions-page', methods=['GET'])
+@analytics
+@cached('categories', 'transactions')
 def get_transactions_page():
-    categories = Category.query.all()
-    transactions = Transaction.query.all()
-    return render_template('transactions.html', categories=categories, transactions=transactions)
+    """
+    Render the first screen of transactions; the page fetches the next ones from `GET /transactions`.
 
+    Query Parameters:
+        The filters of `GET /transactions` and `order`, applied by the database.
 
-@main.route('/')
-def home():
+    Returns:
+        Response: The rendered page, or an error message if a parameter is invalid.
     """
-    Render the homepage or redirect to categories page.
+    try:
+        transactions, next_cursor = _search_transactions(TRANSACTIONS_PAGE_SIZE)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    filters = {name: request.args.get(name, '') for name in
+               ('category_id', 'start_date', 'end_date', 'min_amount', 'max_amount', 'q')}
+    return render_template('transactions.html', transactions=transactions, next_cursor=next_cursor,
+                           filters=filters, order=request.args.get('order', 'asc'),
+                           page_size=TRANSACTIONS_PAGE_SIZE)
+
+
+@main.route('/cache/stats', methods=['GET'])
+def get_cache_stats() -> tuple:
+    """
+    Retrieve the hit, miss and eviction counters of the response cache.
 
     Returns:
-        Response: A rendered template or redirect.
+        tuple: A JSON response with the cache counters, or `enabled: false` if caching is disabled.
     """
-    # Option 1: Redirect to categories page
-    return render_template('index.html')  # Or use redirect(url_for('main.get_categories_page'))
+    cache = get_response_cache()
+    if cache is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(cache.stats(), enabled=True)), 200
 
 
-@main.route('/transactions', methods=['GET'])
-def get_transactions() -> tuple:
+@main.route('/metrics', methods=['GET'])
+def get_metrics():
     """
-    Retrieve all transactions with optional search and filtering.
+    Expose request latency, response size and SQL histograms per endpoint, with the cache and
+    write-behind counters, in the Prometheus text format.
+
+    Returns:
+        Response: The metrics, or an error message if metrics are disabled.
+    """
+    if get_request_metrics() is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
-    Query Parameters:
-        category_id (int, optional): Filter by category ID.
-        start_date (str, optional): Filter transactions from this date (format: YYYY-MM-DD).
-        end_date (str, optional): Filter transactions up to this date (format: YYYY-MM-DD).
-        min_amount (float, optional): Minimum amount for filtering.
-        max_amount (float, optional): Maximum amount for filtering.
+
+@main.route('/')
+@cached()  # Reads no table: rendered once
+def home():
+    """
+    Render the homepage or redirect to categories page.
 
     Returns:
-        tuple: A JSON response with a list of filtered transactions.
-    """
-    category_id = request.args.get('category_id', type=int)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    min_amount = request.args.get('min_amount', type=float)
-    max_amount = request.args.get('max_amount', type=float)
-
-    query = Transaction.query
-
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if start_date:
-        query = query.filter(Transaction.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-    if end_date:
-        query = query.filter(Transaction.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
-    if min_amount is not None:
-        query = query.filter(Transaction.amount >= min_amount)
-    if max_amount is not None:
-        query = query.filter(Transaction.amount <= max_amount)
-
-    transactions = query.all()
-    transaction_list = [
-        {
-            'id': txn.id,
-            'date': txn.date.isoformat(),
-            'amount': txn.amount,
-            'category': txn.category.name,
-            'notes': txn.notes
-        }
-        for txn in transactions
-    ]
-    return jsonify({'transactions': transaction_list}), 200
+        Response: A rendered template or redirect.
+    """
+    # Option 1: Redirect to categories page
+    return render_template('index.html')  # Or use redirect(url_for('main.get_categories_page'))
@@ -0,0 +1,79 @@
+# search.py
+import re
+
+from sqlalchemy import Integer, and_, column, text
+from sqlalchemy.engine import Engine
+
+from .models import Transaction
+
+# Name of the SQLite FTS5 table indexing `transactions.notes`
+FTS_TABLE = 'transactions_fts'
+
+# The FTS5 table stores only the index; the text stays in `transactions` (external content).
+# Triggers keep it in sync with every write, including bulk and raw SQL ones.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts "
+    "USING fts5(notes, content='transactions', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts(rowid, notes) VALUES (new.id, new.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts(transactions_fts, rowid, notes) VALUES ('delete', old.id, old.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF notes ON transactions BEGIN "
+    "INSERT INTO transactions_fts(transactions_fts, rowid, notes) VALUES ('delete', old.id, old.notes); "
+    "INSERT INTO transactions_fts(rowid, notes) VALUES (new.id, new.notes); END",
+)
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the full-text index over transaction notes and its sync triggers if they are missing.
+
+    A newly created index is filled from the existing transactions. Only SQLite is supported;
+    other databases fall back to pattern matching in `notes_search_clause`.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        for statement in FTS_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+
+
+def fts_query(search: str) -> str:
+    """
+    Turn free text into an FTS5 query matching rows that contain every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the input are matched literally.
+
+    Args:
+        search (str): The text entered by the user.
+
+    Returns:
+        str: The FTS5 query, or an empty string if the text contains no words.
+    """
+    return ' '.join('"%s"' % word for word in re.findall(r'\w+', search))
+
+
+def notes_search_clause(search: str, dialect_name: str):
+    """
+    Build a filter clause matching transactions whose notes contain every word of `search`.
+
+    Args:
+        search (str): The text entered by the user; must contain at least one word.
+        dialect_name (str): The name of the database dialect.
+
+    Returns:
+        The filter clause.
+    """
+    if dialect_name != 'sqlite':
+        words = re.findall(r'\w+', search)
+        return and_(*[Transaction.notes.ilike('%%%s%%' % word) for word in words])
+    matches = text('SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH :query')
+    return Transaction.id.in_(matches.bindparams(query=fts_query(search)).columns(column('rowid', Integer)))
@@ -0,0 +1,141 @@
+# serialization.py
+import json
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Iterator, Sequence
+
+from flask import Flask, Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+# Rows encoded per chunk of a streamed JSON array
+STREAM_BATCH_SIZE = 250
+
+# Significant digits of the decimals that floats represent exactly: their shortest repr gives the digits back
+FLOAT_DIGITS = 15
+
+
+def _default(value):
+    """Encode the values neither encoder handles natively, the same way with both encoders."""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # A float would round longer decimals, which neither encoder can write as raw number text
+        return float(value) if len(value.as_tuple().digits) <= FLOAT_DIGITS else str(value)
+    raise TypeError('Object of type %s is not JSON serializable' % type(value).__name__)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson when it is installed, and with the standard library otherwise.
+
+    Dates are encoded as ISO 8601 strings by both encoders. Decimals, such as amounts, are encoded
+    as numbers when they have at most FLOAT_DIGITS significant digits, which floats represent
+    exactly, and as strings of their exact digits otherwise. Keys are not sorted: responses keep the
+    order in which the handlers build them.
+
+    Configurations:
+        - JSON_ENCODER: 'auto' (default) uses orjson if it is installed; 'stdlib' never does.
+    """
+    sort_keys = False
+
+    def __init__(self, app: Flask):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get('JSON_ENCODER', 'auto') != 'stdlib'
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        """
+        Encode an object as UTF-8 JSON.
+
+        Args:
+            obj: The object to encode.
+            indent (bool): Indent the output by two spaces.
+
+        Returns:
+            bytes: The encoded object.
+        """
+        if self.use_orjson:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if indent else 0)
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2 if indent else None,
+                          separators=None if indent else (',', ':')).encode()
+
+    def dumps(self, obj, **kwargs) -> str:
+        if self.use_orjson and set(kwargs) <= {'separators'}:
+            return orjson.dumps(obj, default=_default).decode()
+        kwargs.setdefault('default', _default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def dumps_bytes(obj) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON with the current application's JSON provider.
+
+    Args:
+        obj: The object to encode.
+
+    Returns:
+        bytes: The encoded object.
+    """
+    provider = current_app.json
+    if isinstance(provider, FastJSONProvider):
+        return provider.dumps_bytes(obj)
+    return provider.dumps(obj).encode()
+
+
+def rows_to_objects(rows: Iterable[Sequence], columns: Sequence[str]) -> list:
+    """
+    Turn result rows into JSON objects keyed by `columns`, leaving value encoding to the encoder.
+
+    Args:
+        rows (Iterable[Sequence]): Result rows (or any tuples) whose values are in `columns` order.
+        columns (Sequence[str]): The keys of the objects.
+
+    Returns:
+        list: One dict per row.
+    """
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _stream_rows(key: str, rows: Sequence[Sequence], columns: Sequence[str], extra: dict) -> Iterator[bytes]:
+    head = dumps_bytes(dict(extra, **{key: []}))
+    # `head` ends with the empty array and the closing brace: the rows go between them
+    yield head[:-2]
+    for start in range(0, len(rows), STREAM_BATCH_SIZE):
+        chunk = dumps_bytes(rows_to_objects(rows[start:start + STREAM_BATCH_SIZE], columns))[1:-1]
+        yield chunk if start == 0 else b',' + chunk
+    yield b']}\n'
+
+
+def rows_response(key: str, rows: Sequence[Sequence], columns: Sequence[str], **extra) -> Response:
+    """
+    Build a JSON response holding result rows as an array of objects under `key`, plus `extra` members.
+
+    The rows are encoded straight from the result tuples. Arrays longer than the JSON_STREAM_MIN_ROWS
+    setting are streamed in chunks of STREAM_BATCH_SIZE rows rather than encoded as one body.
+
+    Args:
+        key (str): The member holding the rows.
+        rows (Sequence[Sequence]): Result rows whose values are in `columns` order.
+        columns (Sequence[str]): The keys of the row objects.
+        **extra: Other members of the response object, placed before the rows.
+
+    Returns:
+        Response: The JSON response.
+    """
+    if len(rows) >= current_app.config['JSON_STREAM_MIN_ROWS']:
+        return Response(stream_with_context(_stream_rows(key, rows, columns, extra)), mimetype='application/json')
+    return current_app.json.response(dict(extra, **{key: rows_to_objects(rows, columns)}))
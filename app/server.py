@@ -0,0 +1,320 @@
+# server.py
+import argparse
+import importlib
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from .cache import ForkSharedTags
+
+# Defaults of the command line options
+DEFAULT_BIND = '127.0.0.1:8000'
+DEFAULT_THREADS = 4
+DEFAULT_GRACEFUL_TIMEOUT = 30.0
+
+# Seconds a new worker may take to create its application and warm up
+START_TIMEOUT = 60.0
+
+# Seconds a client may take to send its request before its request thread is freed
+REQUEST_TIMEOUT = 10
+
+# Connections waiting to be accepted, e.g. while workers are replaced
+BACKLOG = 2048
+
+# Seconds a worker whose request threads are all busy waits for one before checking for a shutdown
+ACCEPT_WAIT = 0.5
+
+# Seconds between checks of the master for exited workers
+MONITOR_INTERVAL = 0.2
+
+
+class RequestHandler(WSGIRequestHandler):
+    """
+    Request handler of the pre-fork workers: HTTP/1.1, so that streamed responses are chunked.
+
+    Connections are closed after each response, so idle clients never hold a request thread.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server handling requests on a fixed pool of threads, accepting connections on a listening
+    socket shared with other processes.
+
+    A connection is only accepted once a request thread is free, so a busy worker leaves the
+    connections waiting on the socket to the other workers instead of queueing them.
+
+    Args:
+        app (Flask): The application.
+        listener (socket.socket): The listening socket, in non-blocking mode so that the processes
+            woken by the same connection do not wait in `accept` for the next one.
+        threads (int): The number of request threads.
+    """
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, app: Flask, listener: socket.socket, threads: int):
+        self._pool = None
+        host, port = listener.getsockname()[:2]
+        super().__init__(host, port, app, RequestHandler, fd=listener.fileno())
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='request')
+        self._free_threads = threading.Semaphore(threads)
+
+    def get_request(self) -> tuple:
+        if not self._free_threads.acquire(timeout=ACCEPT_WAIT):
+            raise BlockingIOError('Every request thread is busy')  # Skipped by the serving loop, like a lost accept
+        try:
+            return super().get_request()
+        except BaseException:
+            self._free_threads.release()
+            raise
+
+    def shutdown_request(self, request) -> None:
+        # Called once for every accepted connection, after its request or when it is rejected
+        super().shutdown_request(request)
+        self._free_threads.release()
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        # Stop accepting first, so that waiting connections go to other workers, then finish the requests in progress
+        super().server_close()
+        if self._pool is not None:  # Also called by the base constructor, before the pool exists
+            self._pool.shutdown(wait=True)
+
+
+def warm_up(app: Flask) -> None:
+    """
+    Fill the caches of a new worker by serving the SERVER_WARMUP_URLS on behalf of the default user.
+
+    Args:
+        app (Flask): The application of the worker.
+    """
+    client = app.test_client()
+    for url in app.config.get('SERVER_WARMUP_URLS') or ():
+        response = client.get(url)
+        if response.status_code != 200:
+            logging.warning('Warm-up request to %s failed with status %d', url, response.status_code)
+
+
+def _forget_application_modules() -> None:
+    """Drop the application modules imported by the master, so that a worker imports the current code."""
+    for name in list(sys.modules):
+        if name == __package__ or name.startswith(__package__ + '.'):
+            del sys.modules[name]
+
+
+class PreforkServer:
+    """
+    Pre-fork WSGI server: a master process binds the listening socket, then forks workers that
+    each create their own application with `create_app`, warm its caches up (see `warm_up`) and
+    serve requests on a pool of threads.
+
+    Workers share nothing that would not survive a fork: each has its own connection pool,
+    registries, cache entries and background threads. Only the listening socket and the versions
+    of the response cache tags (see `cache.ForkSharedTags`) are shared, so a write served by one
+    worker invalidates the responses cached by every worker. Each worker spools write-behind
+    transactions to a file of its own; any worker answers pending-transaction lookups from the
+    spools and the commit markers in the database.
+
+    The first worker is started alone, so that pending schema migrations are applied once.
+    Workers that exit unexpectedly are replaced.
+
+    Signals to the master:
+        - SIGHUP: graceful reload. Workers are replaced one at a time: each finishes its requests
+          in progress and exits, then its replacement imports the application code anew, creates
+          its application and warms up before the next worker is replaced.
+        - SIGTERM, SIGINT: graceful shutdown. Workers stop accepting connections and exit once their
+          requests in progress are done.
+
+    Args:
+        bind (str): The 'host:port' to listen on; port 0 picks a free port.
+        workers (int): The number of worker processes.
+        threads (int): The number of request threads per worker.
+        config (Optional[dict]): Configuration passed to `create_app` in every worker.
+        graceful_timeout (float): Seconds a stopping worker may take to finish its requests before it is killed.
+    """
+
+    def __init__(self, bind: str = DEFAULT_BIND, workers: int = 1, threads: int = DEFAULT_THREADS,
+                 config: Optional[dict] = None, graceful_timeout: float = DEFAULT_GRACEFUL_TIMEOUT):
+        host, _, port = bind.rpartition(':')
+        self.address = (host.strip('[]') or '127.0.0.1', int(port))
+        self.workers = workers
+        self.threads = threads
+        self.config = dict(config or {})
+        self.graceful_timeout = graceful_timeout
+        self.listener = None
+        self.generation = 0
+        self._pids: Dict[int, int] = {}  # Worker index by process ID
+        self._stopping = False
+        self._reloading = False
+
+    def run(self) -> None:
+        """Bind the listening socket, start the workers and supervise them until a shutdown signal."""
+        self.listener = socket.create_server(self.address, backlog=BACKLOG)
+        self.listener.setblocking(False)
+        self.config.setdefault('RESPONSE_CACHE_TAGS', ForkSharedTags())
+        host, port = self.listener.getsockname()[:2]
+        logging.info('Listening on http://%s:%d with %d workers of %d threads', host, port,
+                     self.workers, self.threads)
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_reload)
+
+        if not self._start(0):
+            self.listener.close()
+            raise RuntimeError('The first worker failed to start')
+        for index in range(1, self.workers):
+            self._start(index)
+        while not self._stopping:
+            if self._reloading:
+                self._reloading = False
+                self._reload()
+            self._replace_exited()
+            time.sleep(MONITOR_INTERVAL)
+
+        for pid in list(self._pids):
+            self._stop(pid)
+        self.listener.close()
+        logging.info('Server stopped')
+
+    def _request_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _request_reload(self, signum, frame) -> None:
+        self._reloading = True
+
+    def _start(self, index: int) -> bool:
+        """Fork worker `index` and wait until it serves requests; return False if it failed to start."""
+        ready, notify = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready)
+            code = 0
+            try:
+                self._serve(index, notify)
+            except BaseException:
+                logging.exception('Worker %d failed', index)
+                code = 1
+            finally:
+                os._exit(code)  # Never return into the master's loop
+        os.close(notify)
+        self._pids[pid] = index
+        try:
+            started = select.select([ready], [], [], START_TIMEOUT)[0] and os.read(ready, 1)
+        finally:
+            os.close(ready)
+        if not started:
+            logging.error('Worker %d (pid %d) failed to start', index, pid)
+            return False
+        logging.info('Worker %d (pid %d) started', index, pid)
+        return True
+
+    def _stop(self, pid: int) -> None:
+        """Stop a worker gracefully, killing it if it is still running after `graceful_timeout` seconds."""
+        self._pids.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while os.waitpid(pid, os.WNOHANG) == (0, 0):
+            if time.monotonic() > deadline:
+                logging.warning('Worker %d did not stop in %.0f s, killing it', pid, self.graceful_timeout)
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return
+            time.sleep(0.05)
+
+    def _replace_exited(self) -> None:
+        while self._pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            index = self._pids.pop(pid, None)
+            if index is not None and not self._stopping:
+                logging.warning('Worker %d (pid %d) exited with status %d, replacing it', index, pid, status)
+                self._start(index)
+
+    def _reload(self) -> None:
+        self.generation += 1
+        logging.info('Reloading %d workers', len(self._pids))
+        for pid, index in sorted(self._pids.items(), key=lambda item: item[1]):
+            self._stop(pid)
+            self._start(index)
+        logging.info('Reload finished')
+
+    def _serve(self, index: int, notify: int) -> None:
+        """Run worker `index` in the forked process, telling the master through `notify` once it is ready."""
+        # The master coordinates shutdowns: a Ctrl-C reaching the whole process group must not stop workers on its own
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if self.generation:
+            _forget_application_modules()
+        package = importlib.import_module(__package__)
+        app = package.create_app(dict(self.config, WORKER_ID=index))
+        warm_up(app)
+
+        server = PooledWSGIServer(app, self.listener, self.threads)
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        os.write(notify, b'1')
+        os.close(notify)
+        server.serve_forever()
+
+        # Commit the write-behind queue and stop the background threads before the process exits
+        with app.app_context():
+            writer = importlib.import_module(__package__ + '.writebehind').get_write_behind()
+            if writer is not None:
+                writer.close()
+            replica = importlib.import_module(__package__ + '.replica').get_analytics_replica()
+            if replica is not None:
+                replica.close()
+            package.db.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve the application with a pre-fork multi-process WSGI server.')
+    parser.add_argument('--bind', default=DEFAULT_BIND, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help='request threads per worker')
+    parser.add_argument('--graceful-timeout', type=float, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help='seconds a stopping worker may take to finish its requests')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(process)d] %(levelname)s %(message)s')
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    try:
+        PreforkServer(args.bind, args.workers, args.threads, graceful_timeout=args.graceful_timeout).run()
+    except RuntimeError as error:
+        parser.exit(1, '%s\n' % error)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+# summaries.py
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import BigInteger, case, func, select, type_coerce
+
+from .downsampling import largest_triangle_three_buckets
+from .models import Category, SpendingRollup
+from .money import from_minor_units
+from .replica import PRIMARY, read_engine
+from .rollups import period_start
+from .tenancy import effective_user_id, user_criteria
+from . import db
+
+# Total of a period without spending
+ZERO = Decimal('0.00')
+
+# Upper bound on the number of periods a single summary may span
+MAX_PERIODS = 5000
+
+# Upper bound on the number of periods a trend may span before downsampling: over 50 years of days
+MAX_TREND_PERIODS = 20000
+
+# Points per trend series when the client does not ask for a number, enough for a chart's width
+DEFAULT_TREND_POINTS = 500
+
+
+def next_period_start(start: date, period: str) -> date:
+    """
+    Return the first day of the period following the one starting at `start`.
+
+    Args:
+        start (date): The first day of a period.
+        period (str): One of `rollups.PERIODS`.
+
+    Returns:
+        date: The first day of the next period.
+    """
+    if period == 'day':
+        return start + timedelta(days=1)
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start.replace(year=start.year + 1)
+
+
+def period_starts(first: date, last: date, period: str, max_periods: int = MAX_PERIODS) -> List[date]:
+    """
+    List the first days of all periods from the one containing `first` to the one containing `last`.
+
+    Args:
+        first (date): A day in the first period.
+        last (date): A day in the last period.
+        period (str): One of `rollups.PERIODS`.
+        max_periods (int): The most periods the range may span.
+
+    Returns:
+        List[date]: The period starts, in order.
+
+    Raises:
+        ValueError: If the range spans more than `max_periods` periods.
+    """
+    starts = []
+    current, last = period_start(first, period), period_start(last, period)
+    while current <= last:
+        if len(starts) >= max_periods:
+            raise ValueError('The requested range spans more than %d periods' % max_periods)
+        starts.append(current)
+        current = next_period_start(current, period)
+    return starts
+
+
+def _rollup_filters(period: str, start: Optional[date], end: Optional[date],
+                    category_ids: Optional[List[int]] = None) -> list:
+    filters = [SpendingRollup.period == period]
+    if category_ids:
+        filters.append(SpendingRollup.category_id.in_(category_ids))
+    if start:
+        filters.append(SpendingRollup.period_start >= period_start(start, period))
+    if end:
+        filters.append(SpendingRollup.period_start <= end)
+    return filters
+
+
+def period_summary(period: str, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """
+    Compute the spending of every category in every period of a date range.
+
+    The totals come from the spending rollups in one query, so the cost grows with
+    categories x periods, not with the number of transactions. The periods are gap-filled: each
+    category has one total and one count per period, in the order of `periods`.
+
+    Args:
+        period (str): One of `rollups.PERIODS`.
+        start (Optional[date]): A day in the first period; defaults to the earliest spending.
+        end (Optional[date]): A day in the last period; defaults to the latest spending.
+
+    Returns:
+        dict: The period, the list of period starts and the per-category totals and counts.
+
+    Raises:
+        ValueError: If the range spans more than MAX_PERIODS periods.
+    """
+    rows = db.session.execute(
+        select(SpendingRollup.category_id, Category.name, SpendingRollup.period_start,
+               SpendingRollup.total, SpendingRollup.count)
+        .join(Category, SpendingRollup.category_id == Category.id)
+        .where(*_rollup_filters(period, start, end), SpendingRollup.count > 0)
+    ).all()
+
+    if rows or (start and end):
+        first = start or min(row.period_start for row in rows)
+        last = end or max(row.period_start for row in rows)
+        periods = period_starts(first, last, period)
+    else:
+        periods = []
+    index = {day: position for position, day in enumerate(periods)}
+
+    categories = {}
+    for category_id, name, day, total, count in rows:
+        entry = categories.get(category_id)
+        if entry is None:
+            entry = categories[category_id] = {
+                'category_id': category_id,
+                'category': name,
+                'totals': [ZERO] * len(periods),
+                'counts': [0] * len(periods)
+            }
+        entry['totals'][index[day]] = total
+        entry['counts'][index[day]] = count
+
+    summary = sorted(categories.values(), key=lambda entry: entry['category'])
+    for entry in summary:
+        entry['total_spent'] = sum(entry['totals'])
+    return {'period': period, 'periods': [day.isoformat() for day in periods], 'summary': summary}
+
+
+def period_averages(period: str, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """
+    Compute the historical average spending per period of every category.
+
+    `average` spreads each category's total over every period of the range, including periods
+    without spending; `active_average` only counts the periods in which the category had spending.
+
+    Args:
+        period (str): One of `rollups.PERIODS`.
+        start (Optional[date]): A day in the first period; defaults to the earliest spending.
+        end (Optional[date]): A day in the last period; defaults to the latest spending.
+
+    Returns:
+        dict: The period, the range of periods and the per-category averages.
+
+    Raises:
+        ValueError: If the range spans more than MAX_PERIODS periods.
+    """
+    filters = _rollup_filters(period, start, end) + [SpendingRollup.count > 0]
+    first, last = db.session.execute(
+        select(func.min(SpendingRollup.period_start), func.max(SpendingRollup.period_start)).where(*filters)
+    ).one()
+    first, last = start or first, end or last
+    if first is None or last is None:
+        return {'period': period, 'start': None, 'end': None, 'periods': 0, 'averages': []}
+    span = len(period_starts(first, last, period))
+
+    rows = db.session.execute(
+        select(SpendingRollup.category_id, Category.name, func.sum(SpendingRollup.total),
+               func.sum(SpendingRollup.count), func.sum(case((SpendingRollup.count > 0, 1), else_=0)))
+        .join(Category, SpendingRollup.category_id == Category.id)
+        .where(*filters)
+        .group_by(SpendingRollup.category_id, Category.name)
+        .order_by(Category.name)
+    ).all()
+
+    averages = [
+        {
+            'category_id': category_id,
+            'category': name,
+            'total_spent': total,
+            'count': count,
+            'active_periods': active,
+            'average': total / span,
+            'active_average': total / active
+        }
+        for category_id, name, total, count, active in rows
+    ]
+    return {
+        'period': period,
+        'start': period_start(first, period).isoformat(),
+        'end': period_start(last, period).isoformat(),
+        'periods': span,
+        'averages': averages
+    }
+
+
+def spending_trends(period: str, category_ids: Optional[List[int]] = None, start: Optional[date] = None,
+                    end: Optional[date] = None, max_points: int = DEFAULT_TREND_POINTS) -> dict:
+    """
+    Compute chart-ready spending series: one gap-filled series per category, downsampled on the server.
+
+    Like `period_summary`, the series are built from the spending rollups in one query. Series
+    longer than `max_points` are then reduced with `downsampling.largest_triangle_three_buckets`,
+    which keeps peaks and dips, so a ten-year daily chart ships `max_points` points per category.
+    Totals are read as integer minor units and only the points kept are converted to Decimal.
+    Each series is columnar: a list of period starts and a list of totals of the same length.
+
+    Args:
+        period (str): One of `rollups.PERIODS`.
+        category_ids (Optional[List[int]]): The categories to chart; every category with spending by default.
+        start (Optional[date]): A day in the first period; defaults to the earliest spending.
+        end (Optional[date]): A day in the last period; defaults to the latest spending.
+        max_points (int): The most points per series; at least 3.
+
+    Returns:
+        dict: The period, the range and number of periods, whether the series were downsampled,
+        and the series, ordered by category name.
+
+    Raises:
+        ValueError: If the range spans more than MAX_TREND_PERIODS periods.
+    """
+    # Run on the session's connection, without ORM row processing that would double the cost of the
+    # tens of thousands of rows of daily series; the user filter and the replica are therefore chosen explicitly
+    rows = db.session.connection(bind_arguments={'bind': read_engine()}).execute(
+        select(SpendingRollup.category_id, SpendingRollup.period_start,
+               type_coerce(SpendingRollup.total, BigInteger))
+        .where(*_rollup_filters(period, start, end, category_ids), SpendingRollup.count > 0)
+        .options(*user_criteria(effective_user_id()))
+    ).all()
+
+    if rows or (start and end):
+        first = start or min(row[1] for row in rows)
+        last = end or max(row[1] for row in rows)
+        periods = period_starts(first, last, period, MAX_TREND_PERIODS)
+    else:
+        periods = []
+    index = {day: position for position, day in enumerate(periods)}
+
+    # Requested categories without spending in the range are charted as zeros
+    totals = {category_id: [0] * len(periods) for category_id in category_ids or ()}
+    for category_id, day, total in rows:
+        values = totals.get(category_id)
+        if values is None:
+            values = totals[category_id] = [0] * len(periods)
+        values[index[day]] = total
+    # Names come from the primary, which the requested categories were validated against; series of
+    # categories deleted since the analytics replica was refreshed are left out
+    names = dict(db.session.execute(
+        select(Category.id, Category.name).where(Category.id.in_(totals)).execution_options(**{PRIMARY: True})
+    ).all()) if totals else {}
+
+    labels = [day.isoformat() for day in periods]
+    series = []
+    for category_id in sorted(names, key=names.get):
+        values = totals[category_id]
+        kept = largest_triangle_three_buckets(values, max_points)
+        series.append({
+            'category_id': category_id,
+            'category': names[category_id],
+            'total_spent': from_minor_units(sum(values)),
+            'periods': [labels[position] for position in kept],
+            'totals': [from_minor_units(values[position]) for position in kept]
+        })
+    return {
+        'granularity': period,
+        'start': labels[0] if labels else None,
+        'end': labels[-1] if labels else None,
+        'periods': len(periods),
+        'downsampled': len(periods) > max_points,
+        'series': series
+    }
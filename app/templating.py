@@ -0,0 +1,103 @@
+# templating.py
+import threading
+from collections import OrderedDict
+
+from flask import Flask, current_app, render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from .registry import get_category_registry
+from .tenancy import effective_user_id
+
+# Number of rendered fragments kept per application
+MAX_FRAGMENTS = 256
+
+
+class FragmentCache:
+    """
+    Bounded LRU map of rendered template fragments.
+
+    Args:
+        max_entries (int): The maximum number of fragments kept.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that rendered the fragment.
+    """
+
+    def __init__(self, max_entries: int = MAX_FRAGMENTS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: tuple, render) -> Markup:
+        """
+        Return the fragment stored under `key`, rendering and storing it on a miss.
+
+        Args:
+            key (tuple): The fragment's key, including the version of the data it shows.
+            render: A callable returning the rendered fragment.
+
+        Returns:
+            Markup: The rendered fragment.
+        """
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+        fragment = Markup(render())
+        with self._lock:
+            self.misses += 1
+            self._fragments[key] = fragment
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+        return fragment
+
+
+def category_fragment(template_name: str, **context) -> Markup:
+    """
+    Render a template fragment listing the current user's categories, reusing the previous
+    rendering if the categories have not changed since.
+
+    The fragment is keyed by the user and the category registry version, which every category
+    write bumps.
+    Use it as `{{ category_fragment('_category_options.html', selected=...) }}`.
+
+    Args:
+        template_name (str): The fragment template; it receives `categories` and `context`.
+        **context: Further template variables; they are part of the cache key.
+
+    Returns:
+        Markup: The rendered fragment.
+    """
+    registry = get_category_registry()
+    registry.refresh()
+    key = (template_name, effective_user_id(), registry.version, tuple(sorted(context.items())))
+    return current_app.extensions['template_fragments'].get_or_render(
+        key, lambda: render_template(template_name, categories=registry.categories(), **context))
+
+
+def init_templating(app: Flask) -> None:
+    """
+    Set up template bytecode caching and the `category_fragment` template global, then compile
+    every template; must run before the Jinja environment is first used.
+
+    Configurations:
+        - TEMPLATE_BYTECODE_CACHE: Cache compiled templates on disk so that new processes skip compiling.
+        - TEMPLATE_BYTECODE_CACHE_DIR: The cache directory; a per-user temporary directory by default.
+
+    Args:
+        app (Flask): The application.
+    """
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')))
+    app.extensions['template_fragments'] = FragmentCache()
+    app.add_template_global(category_fragment)
+    # Compile up front, so that the first request to each page does not pay for it
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
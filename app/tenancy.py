@@ -0,0 +1,210 @@
+# tenancy.py
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from flask import Flask, current_app, has_request_context, jsonify, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import with_loader_criteria
+
+from .models import Budget, BudgetAlert, Category, SpendingRollup, Transaction, User, UserOwned
+from . import db
+
+# User of requests that do not name one, and owner of rows written outside of any user scope
+DEFAULT_USER_ID = 1
+DEFAULT_USER_NAME = 'default'
+
+# Request header naming the user a request is made on behalf of; trusted as is, see `init_tenancy`
+USER_HEADER = 'X-User-Id'
+
+# WSGI environment key holding the user of a request
+USER_ENVIRON_KEY = 'budget_tracker.user_id'
+
+# Execution option letting an ORM query see every user's rows, e.g. to load a process-wide cache
+ALL_USERS = 'all_users'
+
+# Indexes of the transactions table replaced by user-leading ones
+LEGACY_INDEXES = ('ix_transactions_date_id', 'ix_transactions_category_id_date', 'ix_transactions_amount')
+
+_current_user: ContextVar[Optional[int]] = ContextVar('current_user', default=None)
+
+
+def current_user_id() -> Optional[int]:
+    """
+    Return the user the running code acts on behalf of: the user of the innermost `user_scope`,
+    else the user of the current request, else None.
+    """
+    user_id = _current_user.get()
+    if user_id is None and has_request_context():
+        # Kept with the request rather than in the context variable, so that streamed responses still see it
+        user_id = request.environ.get(USER_ENVIRON_KEY)
+    return user_id
+
+
+def effective_user_id() -> int:
+    """Return the user that lookups and new rows belong to: the current user, or the default user."""
+    user_id = current_user_id()
+    return DEFAULT_USER_ID if user_id is None else user_id
+
+
+@contextmanager
+def user_scope(user_id: int) -> Iterator[None]:
+    """
+    Act on behalf of a user while the block runs, as requests naming that user do.
+
+    Args:
+        user_id (int): The user.
+    """
+    token = _current_user.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def user_exists(user_id: int) -> bool:
+    """
+    Return whether a user exists, querying the database only for users not seen before.
+
+    Users are never deleted, so the IDs found are remembered for the life of the process.
+
+    Args:
+        user_id (int): The user ID.
+
+    Returns:
+        bool: True if the user exists.
+    """
+    known = current_app.extensions['known_users']
+    if user_id in known:
+        return True
+    if db.session.get(User, user_id) is None:
+        return False
+    known.add(user_id)
+    return True
+
+
+def ensure_default_user() -> None:
+    """Create the default user, owner of the rows written before users existed; requires an app context."""
+    if db.session.get(User, DEFAULT_USER_ID) is None:
+        db.session.add(User(id=DEFAULT_USER_ID, name=DEFAULT_USER_NAME))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Created by another process meanwhile
+
+
+def ensure_user_columns(engine: Engine) -> None:
+    """
+    Assign the rows of a database created before users existed to the default user.
+
+    A `user_id` column defaulting to the default user is added to every user-owned table. On
+    SQLite the categories table is rebuilt, as its names become unique per user rather than
+    globally; other databases swap the constraint in place. The transaction indexes are replaced
+    by the user-leading ones created with the other missing indexes.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    inspector = inspect(engine)
+    missing = [model.__table__ for model in (Category, Transaction, Budget, BudgetAlert)
+               if inspector.has_table(model.__tablename__)
+               and 'user_id' not in {column['name'] for column in inspector.get_columns(model.__tablename__)}]
+    if not missing:
+        return
+
+    logging.info('Assigning existing rows to the default user')
+    with engine.begin() as connection:
+        for table in missing:
+            if table is Category.__table__ and engine.dialect.name == 'sqlite':
+                # Without legacy renaming, SQLite would point the foreign keys of other tables to the old table
+                connection.exec_driver_sql('PRAGMA legacy_alter_table = ON')
+                connection.exec_driver_sql('ALTER TABLE categories RENAME TO categories_single_user')
+                table.create(connection)
+                connection.exec_driver_sql(
+                    'INSERT INTO categories (id, name, user_id) SELECT id, name, %d FROM categories_single_user'
+                    % DEFAULT_USER_ID)
+                connection.exec_driver_sql('DROP TABLE categories_single_user')
+                connection.exec_driver_sql('PRAGMA legacy_alter_table = OFF')
+                continue
+            connection.exec_driver_sql('ALTER TABLE %s ADD COLUMN user_id INTEGER NOT NULL DEFAULT %d'
+                                       % (table.name, DEFAULT_USER_ID))
+            if table is Category.__table__:
+                connection.exec_driver_sql('ALTER TABLE categories DROP CONSTRAINT IF EXISTS categories_name_key')
+                connection.exec_driver_sql('ALTER TABLE categories ADD UNIQUE (user_id, name)')
+        for index in LEGACY_INDEXES:
+            connection.exec_driver_sql('DROP INDEX IF EXISTS %s' % index)
+
+
+def init_tenancy(app: Flask) -> None:
+    """
+    Run every request on behalf of the user named by its X-User-Id header, or of the default user.
+
+    Requests naming an unknown user are answered with a 404, and malformed IDs with a 400.
+
+    The header is not authenticated: whoever sets it can read and write that user's data. Users
+    are partitions of the data, not a security boundary, unless the application runs behind a
+    trusted proxy that authenticates clients, sets X-User-Id from the authenticated identity and
+    strips the header from every external request. Never expose the application directly to
+    clients that must not see each other's data.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.extensions['known_users'] = {DEFAULT_USER_ID}
+
+    @app.before_request
+    def _enter_user_scope():
+        header = request.headers.get(USER_HEADER)
+        if header is None:
+            user_id = DEFAULT_USER_ID
+        else:
+            try:
+                user_id = int(header)
+            except ValueError:
+                return jsonify({'error': 'Invalid user ID'}), 400
+            if not user_exists(user_id):
+                return jsonify({'error': 'User not found'}), 404
+        request.environ[USER_ENVIRON_KEY] = user_id
+
+
+def user_criteria(user_id: int) -> tuple:
+    """
+    Build the statement options restricting an ORM statement to one user's rows.
+
+    User-owned entities are filtered on their `user_id` column. Spending rollups have no user
+    column and are restricted to the user's categories instead; the subquery also lets the
+    database drive rollup reads from those categories rather than from every user's rollups.
+
+    Args:
+        user_id (int): The user.
+
+    Returns:
+        tuple: The options, to pass to the statement's `options()`.
+    """
+    return (
+        with_loader_criteria(UserOwned, lambda cls: cls.user_id == user_id, include_aliases=True),
+        with_loader_criteria(SpendingRollup, lambda cls: cls.category_id.in_(
+            select(Category.id).where(Category.user_id == user_id)), include_aliases=True),
+    )
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _filter_by_user(orm_execute_state) -> None:
+    """Restrict ORM selects, updates and deletes made on behalf of a user to that user's rows."""
+    user_id = current_user_id()
+    if (user_id is None or orm_execute_state.is_column_load or orm_execute_state.is_relationship_load
+            or orm_execute_state.execution_options.get(ALL_USERS)):
+        return
+    if orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.statement = orm_execute_state.statement.options(*user_criteria(user_id))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _assign_new_rows(session, flush_context, instances) -> None:
+    """Give new user-owned objects without an owner to the current user."""
+    for obj in session.new:
+        if isinstance(obj, UserOwned) and obj.user_id is None:
+            obj.user_id = effective_user_id()
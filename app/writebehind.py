@@ -0,0 +1,444 @@
+# writebehind.py
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import delete, insert, inspect, select
+from sqlalchemy.engine import Engine
+
+from .models import SpooledWrite, Transaction
+from .rollups import add_delta, apply_deltas, new_deltas
+from .tenancy import DEFAULT_USER_ID
+from . import db
+
+try:
+    import fcntl
+except ImportError:  # Without file locks, only the spool of this process is replayed
+    fcntl = None
+
+# Defaults of the WRITE_BEHIND_* settings
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_DELAY = 0.05
+DEFAULT_RETRY_DELAY = 0.5
+
+# Number of committed provisional IDs remembered for status lookups
+MAX_TRACKED_IDS = 100_000
+
+# Seconds the commit markers of entries are kept after their spool is emptied, to answer status lookups
+DEFAULT_STATUS_RETENTION = 600
+
+
+def _encode_entry(provisional_id: str, values: dict) -> str:
+    return json.dumps(dict(values, id=provisional_id, date=values['date'].isoformat(),
+                           amount=str(values['amount']))) + '\n'
+
+
+def _lock_spool(spool, blocking: bool = True) -> bool:
+    """Lock an open spool file for this process; return False if another process holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(spool, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _forget_entries(provisional_ids: List[str]) -> None:
+    """
+    Delete the commit markers of spooled entries once no spool holds them.
+
+    Only the markers of entries known to be out of every spool may go: every writer shares the
+    table, and the other spools may still hold committed entries whose markers keep them from being
+    inserted again.
+    """
+    for start in range(0, len(provisional_ids), DEFAULT_BATCH_SIZE):
+        db.session.execute(delete(SpooledWrite).where(
+            SpooledWrite.provisional_id.in_(provisional_ids[start:start + DEFAULT_BATCH_SIZE])))
+
+
+def _decode_entry(line: str) -> dict:
+    entry = json.loads(line)
+    entry['date'] = date.fromisoformat(entry['date'])
+    entry['amount'] = Decimal(entry['amount'])
+    return entry
+
+
+def write_entries(entries: List[dict]) -> List[int]:
+    """
+    Insert spooled entries as transactions, skipping entries that were already committed.
+
+    The transactions, their rollup updates and the `SpooledWrite` markers are added to the current
+    session's transaction; committing is left to the caller.
+
+    Args:
+        entries (List[dict]): Validated transaction values, each with its provisional 'id' and the
+            'user_id' it was submitted for.
+
+    Returns:
+        List[int]: The IDs of the inserted transactions, in the order of `entries`; None for
+        entries that had already been committed.
+    """
+    provisional_ids = [entry['id'] for entry in entries]
+    committed = dict(db.session.execute(
+        select(SpooledWrite.provisional_id, SpooledWrite.transaction_id)
+        .where(SpooledWrite.provisional_id.in_(provisional_ids))
+    ).all())
+    pending = [entry for entry in entries if entry['id'] not in committed]
+    if not pending:
+        return [None] * len(entries)
+
+    rows = [{name: entry[name] for name in ('date', 'amount', 'category_id', 'notes')} for entry in pending]
+    for row, entry in zip(rows, pending):
+        row['user_id'] = entry.get('user_id', DEFAULT_USER_ID)  # Spooled before users existed
+    ids = db.session.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    deltas = new_deltas()
+    for row in rows:
+        add_delta(deltas, row['category_id'], row['date'], row['amount'], 1)
+    apply_deltas(db.session.connection(), deltas)
+    committed_at = time.time()
+    db.session.execute(insert(SpooledWrite), [
+        {'provisional_id': entry['id'], 'transaction_id': transaction_id, 'committed_at': committed_at}
+        for entry, transaction_id in zip(pending, ids)
+    ])
+    inserted = dict(zip((entry['id'] for entry in pending), ids))
+    return [inserted.get(provisional_id) for provisional_id in provisional_ids]
+
+
+class WriteBehindQueue:
+    """
+    Background writer that group-commits accepted transactions in micro-batches.
+
+    `submit` appends the transaction to a spool file and returns at once. A writer thread collects
+    queued transactions until it has `batch_size` of them or the oldest has waited `max_delay`
+    seconds, then inserts the whole batch with a single commit. Once every spooled entry is
+    committed the spool is truncated; entries left in it by a crash are replayed by `recover_spool`.
+    The commit markers of the entries are deleted `status_retention` seconds after the spool is
+    emptied; until then, every worker can answer status lookups for them (see `spooled_status`).
+    The spool stays locked while the writer runs, so other processes never replay it.
+
+    Args:
+        app (Flask): The application whose database receives the writes.
+        spool_path (str): The spool file.
+        batch_size (int): The maximum number of transactions per commit.
+        max_delay (float): The maximum number of seconds a transaction waits for its batch.
+        fsync (bool): Whether each spool append is synced to disk before `submit` returns.
+        status_retention (float): Seconds the commit markers are kept after the spool is emptied.
+
+    Attributes:
+        submitted (int): The number of accepted transactions.
+        written (int): The number of committed transactions.
+        commits (int): The number of commits made by the writer.
+    """
+
+    def __init__(self, app: Flask, spool_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_delay: float = DEFAULT_MAX_DELAY, fsync: bool = True,
+                 status_retention: float = DEFAULT_STATUS_RETENTION):
+        self.app = app
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.status_retention = status_retention
+        self.submitted = 0
+        self.written = 0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._spooled = []  # Provisional IDs in the spool
+        self._emptied = deque()  # (time, provisional IDs) of the emptied spool contents whose markers are kept
+        self._committed = OrderedDict()
+        self._lock = threading.Lock()
+        self._spool = open(spool_path, 'a', encoding='utf-8')
+        _lock_spool(self._spool)
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, values: dict) -> str:
+        """
+        Spool a validated transaction and queue it for the writer.
+
+        Args:
+            values (dict): Column values as returned by `ingest.validate_transaction_row`, with the
+                'user_id' of the transaction.
+
+        Returns:
+            str: The provisional ID of the transaction.
+        """
+        provisional_id = uuid.uuid4().hex
+        line = _encode_entry(provisional_id, values)
+        with self._lock:
+            self._spool.write(line)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending.add(provisional_id)
+            self._spooled.append(provisional_id)
+            self.submitted += 1
+        self._queue.put(dict(values, id=provisional_id))
+        return provisional_id
+
+    def status(self, provisional_id: str) -> Optional[dict]:
+        """
+        Return the state of an accepted transaction.
+
+        Args:
+            provisional_id (str): The ID returned by `submit`.
+
+        Returns:
+            Optional[dict]: {'status': 'pending'} or {'status': 'committed', 'id': ...}, or None if the
+            ID is unknown.
+        """
+        with self._lock:
+            if provisional_id in self._pending:
+                return {'status': 'pending'}
+            if provisional_id in self._committed:
+                return {'status': 'committed', 'id': self._committed[provisional_id]}
+        return None
+
+    def flush(self) -> None:
+        """Block until every submitted transaction is committed."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Commit the queued transactions and stop the writer."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._spool.close()
+
+    def stats(self) -> dict:
+        return {'submitted': self.submitted, 'written': self.written, 'commits': self.commits,
+                'pending': len(self._pending)}
+
+    def _next_batch(self) -> Optional[list]:
+        """Wait for a transaction, then collect more until the batch is full or max_delay has passed."""
+        first = self._queue.get()
+        if first is None:
+            self._queue.task_done()
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.task_done()
+                self._queue.put(None)  # Stop after this batch
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            while True:
+                try:
+                    self._write(batch)
+                    break
+                except Exception:
+                    # The entries stay in the spool; keep retrying rather than lose accepted writes
+                    logging.exception('Write-behind batch of %d transactions failed, retrying', len(batch))
+                    time.sleep(DEFAULT_RETRY_DELAY)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch: list) -> None:
+        with self.app.app_context():
+            try:
+                ids = write_entries(batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            expired = []
+            with self._lock:
+                for entry, transaction_id in zip(batch, ids):
+                    self._pending.discard(entry['id'])
+                    self._committed[entry['id']] = transaction_id
+                while len(self._committed) > MAX_TRACKED_IDS:
+                    self._committed.popitem(last=False)
+                self.written += len(batch)
+                self.commits += 1
+                if not self._pending:
+                    # Every spooled entry is committed: empty the spool before forgetting the markers
+                    self._spool.truncate(0)
+                    self._spool.flush()
+                    os.fsync(self._spool.fileno())
+                    now = time.monotonic()
+                    self._emptied.append((now, self._spooled))
+                    self._spooled = []
+                    while self._emptied and self._emptied[0][0] < now - self.status_retention:
+                        expired.extend(self._emptied.popleft()[1])
+            if expired:
+                _forget_entries(expired)
+                db.session.commit()
+
+
+def recover_spool(spool_path: str) -> int:
+    """
+    Commit the entries left in a spool file by a writer that stopped before committing them.
+
+    Entries already committed are skipped, then the spool is emptied. The commit markers are left
+    for `recover_spools` to delete once they expire. Requires an app context.
+
+    Args:
+        spool_path (str): The spool file.
+
+    Returns:
+        int: The number of transactions inserted.
+    """
+    if not os.path.exists(spool_path):
+        return 0
+    with open(spool_path, encoding='utf-8') as spool:
+        # A crash in the middle of an append leaves an incomplete last line; that write was never acknowledged
+        entries = [_decode_entry(line) for line in spool if line.endswith('\n')]
+    inserted = sum(transaction_id is not None for transaction_id in write_entries(entries)) if entries else 0
+    db.session.commit()
+    open(spool_path, 'w').close()
+    if inserted:
+        logging.info('Recovered %d spooled transactions from %s', inserted, spool_path)
+    return inserted
+
+
+def _spool_paths(spool_path: str) -> List[str]:
+    """Return the existing spool files: the single-process spool and the per-worker spools next to it."""
+    return glob.glob(glob.escape(spool_path)) + sorted(glob.glob(glob.escape(spool_path) + '.*'))
+
+
+def _read_spooled_ids(path: str) -> set:
+    # Another writer may be appending: its incomplete last line is not accepted yet
+    with open(path, encoding='utf-8') as spool:
+        return {json.loads(line)['id'] for line in spool if line.endswith('\n')}
+
+
+def recover_spools(spool_path: str, status_retention: float = DEFAULT_STATUS_RETENTION) -> int:
+    """
+    Replay a spool file and the per-worker spools next to it (`<spool_path>.<worker>`) that no
+    running writer holds, e.g. those of workers that crashed or are no longer started, then delete
+    the expired commit markers of entries no spool holds any more. Requires an app context.
+
+    Args:
+        spool_path (str): The spool file of a single-process application.
+        status_retention (float): Seconds the commit markers are kept for status lookups.
+
+    Returns:
+        int: The number of transactions inserted.
+    """
+    inserted = 0
+    for path in _spool_paths(spool_path):
+        with open(path, 'a', encoding='utf-8') as spool:
+            if _lock_spool(spool, blocking=False):
+                inserted += recover_spool(path)
+
+    # Markers left by writers that stopped before their markers expired. Read after the expired
+    # markers, so that the entries of running writers committed meanwhile are still in the spools.
+    expired = db.session.execute(select(SpooledWrite.provisional_id).where(
+        SpooledWrite.committed_at < time.time() - status_retention)).scalars().all()
+    if expired:
+        spooled = set().union(*(_read_spooled_ids(path) for path in _spool_paths(spool_path)))
+        _forget_entries([provisional_id for provisional_id in expired if provisional_id not in spooled])
+        db.session.commit()
+    return inserted
+
+
+def spooled_status(provisional_id: str) -> Optional[dict]:
+    """
+    Return the state of a transaction accepted by any writer sharing this application's spools, e.g.
+    another worker of the pre-fork server. Requires an app context.
+
+    Args:
+        provisional_id (str): The ID returned when the transaction was accepted.
+
+    Returns:
+        Optional[dict]: {'status': 'pending'} or {'status': 'committed', 'id': ...}, or None if the
+        ID is unknown or its commit marker has expired.
+    """
+    def committed() -> Optional[dict]:
+        marker = db.session.get(SpooledWrite, provisional_id, populate_existing=True)
+        return {'status': 'committed', 'id': marker.transaction_id} if marker is not None else None
+
+    status = committed()
+    if status is None:
+        if any(provisional_id in _read_spooled_ids(path)
+               for path in _spool_paths(current_app.extensions['write_behind_spool'])):
+            return {'status': 'pending'}
+        status = committed()  # Committed, and its spool emptied, while the spools were read
+    return status
+
+
+def ensure_commit_times(engine: Engine) -> None:
+    """
+    Add the `committed_at` column to the `spooled_writes` table of earlier versions.
+
+    Existing markers get the time 0, so they expire at once unless a spool still holds their entries.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    if 'committed_at' in {column['name'] for column in inspect(engine).get_columns('spooled_writes')}:
+        return
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ALTER TABLE spooled_writes ADD COLUMN committed_at FLOAT NOT NULL DEFAULT 0')
+
+
+def init_write_behind(app: Flask) -> None:
+    """
+    Replay the write-behind spool and, if enabled, start the background writer; requires an app context.
+
+    Configurations:
+        - WRITE_BEHIND: Accept JSON `POST /transactions` with 202 and write them in the background.
+        - WRITE_BEHIND_SPOOL: The spool file; 'write_behind.spool' in the instance folder by default.
+          Each worker of the pre-fork server, named by WORKER_ID, spools to `<WRITE_BEHIND_SPOOL>.<WORKER_ID>`.
+        - WRITE_BEHIND_BATCH_SIZE: The maximum number of transactions per commit.
+        - WRITE_BEHIND_MAX_DELAY: The maximum number of seconds a transaction waits for its batch.
+        - WRITE_BEHIND_FSYNC: Whether each spool append is synced to disk before the 202 is sent.
+        - WRITE_BEHIND_STATUS_RETENTION: Seconds the status of a committed transaction can still be
+          looked up by every worker, after its spool is emptied.
+
+    Args:
+        app (Flask): The application.
+    """
+    spool_path = app.config.get('WRITE_BEHIND_SPOOL') or os.path.join(app.instance_path, 'write_behind.spool')
+    status_retention = app.config.get('WRITE_BEHIND_STATUS_RETENTION', DEFAULT_STATUS_RETENTION)
+    app.extensions['write_behind_spool'] = spool_path
+    recover_spools(spool_path, status_retention)
+    if not app.config.get('WRITE_BEHIND'):
+        return
+    if app.config.get('WORKER_ID') is not None:
+        spool_path = '%s.%d' % (spool_path, app.config['WORKER_ID'])
+    os.makedirs(os.path.dirname(os.path.abspath(spool_path)), exist_ok=True)
+    writer = WriteBehindQueue(
+        app, spool_path,
+        batch_size=app.config.get('WRITE_BEHIND_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        max_delay=app.config.get('WRITE_BEHIND_MAX_DELAY', DEFAULT_MAX_DELAY),
+        fsync=app.config.get('WRITE_BEHIND_FSYNC', True),
+        status_retention=status_retention
+    )
+    app.extensions['write_behind'] = writer
+    atexit.register(writer.close)
+
+
+def get_write_behind() -> Optional[WriteBehindQueue]:
+    """Return the write-behind queue of the current application, or None if write-behind is disabled."""
+    return current_app.extensions.get('write_behind')
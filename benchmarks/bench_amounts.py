@@ -0,0 +1,90 @@
+# benchmarks/bench_amounts.py
+"""
+Compare amounts stored as integer cents with the previous floating point storage: table size,
+the aggregation behind summaries and rollup rebuilds (SUM grouped by category and month over every
+transaction), and the drift of the float totals.
+
+The float copy of the ledger is the same table with `amount / 100.0` in a REAL column, as earlier
+versions stored it. Both tables are scanned without indexes, so only the storage differs.
+
+Usage:
+    python -m benchmarks.bench_amounts [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from app import create_app, db
+from app.money import from_minor_units, to_decimal
+from benchmarks.bench_pagination import median_ms
+from benchmarks.generator import generate_ledger
+
+AGGREGATES = (
+    ('SUM by category, ms', 'SELECT category_id, SUM(amount), COUNT(*) FROM {table} NOT INDEXED GROUP BY category_id'),
+    ('SUM by category and month, ms', "SELECT category_id, strftime('%Y-%m', date), SUM(amount), COUNT(*) "
+                                      "FROM {table} NOT INDEXED GROUP BY category_id, strftime('%Y-%m', date)"),
+)
+
+
+def table_bytes(connection: sqlite3.Connection, table: str) -> int:
+    return connection.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (table,)).fetchone()[0]
+
+
+def aggregate_ms(connection: sqlite3.Connection, query: str, table: str, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = connection.execute(query.format(table=table)).fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='ledger size')
+    parser.add_argument('--repeat', type=int, default=5, help='queries per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'RESPONSE_CACHE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+        with app.app_context():
+            generate_ledger(args.rows)
+            summary_ms = median_ms(app.test_client(), '/summary?period=month', args.repeat)
+            db.engine.dispose()
+
+        connection = sqlite3.connect(path)
+        # The same rows with the columns the float schema had
+        connection.executescript('''
+            CREATE TABLE transactions_float (id INTEGER PRIMARY KEY, date DATE, amount FLOAT NOT NULL,
+                category_id INTEGER NOT NULL, notes VARCHAR(200));
+            INSERT INTO transactions_float SELECT id, date, amount / 100.0, category_id, notes FROM transactions;
+            VACUUM;
+        ''')
+
+        print('%-32s %14s %14s' % ('', 'float', 'integer cents'))
+        print('%-32s %14.1f %14.1f' % ('table bytes per row', table_bytes(connection, 'transactions_float') / args.rows,
+                                        table_bytes(connection, 'transactions') / args.rows))
+        for label, query in AGGREGATES:
+            float_ms, float_rows = aggregate_ms(connection, query, 'transactions_float', args.repeat)
+            cents_ms, cents_rows = aggregate_ms(connection, query, 'transactions', args.repeat)
+            print('%-32s %14.1f %14.1f' % (label, float_ms, cents_ms))
+
+        # Monthly float totals that do not print as the exact total
+        exact = {row[:2]: from_minor_units(row[2]) for row in cents_rows}
+        drifted = [row for row in float_rows if to_decimal(row[2]) != exact[row[:2]]]
+        float_total = connection.execute('SELECT SUM(amount) FROM transactions_float').fetchone()[0]
+        cents_total = connection.execute('SELECT SUM(amount) FROM transactions').fetchone()[0]
+        print('%-32s %14d %14d' % ('inexact monthly totals', len(drifted), 0))
+        print('%-32s %14r %14s' % ('grand total', float_total, from_minor_units(cents_total)))
+        print('GET /summary?period=month (rollups, integer cents): %.2f ms' % summary_ms)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_budgets.py
+"""
+Show that budget evaluation does not grow with the ledger: time transaction writes with and
+without a budget on their category, and `GET /budgets/status`, over ledgers of increasing size.
+For comparison, the status is also computed by summing the current periods from the transactions
+table, as a non-incremental implementation would on every write.
+
+Every category gets a budget for each period, so each budgeted write checks four budgets.
+
+Usage:
+    python -m benchmarks.bench_budgets [--sizes N,N,...] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.models import Budget, Category, Transaction
+from app.rollups import PERIODS, period_start
+from benchmarks.bench_pagination import median_ms
+from benchmarks.generator import generate_ledger
+
+START = date(2015, 1, 1)
+DAYS = 3650
+
+
+def post_ms(client, category_id: int, day: date, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.post('/transactions', json={'date': day.isoformat(), 'amount': 1.5,
+                                                      'category_id': category_id})
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 201, response.json
+    return statistics.median(timings) * 1000
+
+
+def scan_ms(day: date, repeat: int) -> float:
+    """Time summing every category's spending in the current period of each granularity from the ledger."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for period in PERIODS:
+            db.session.execute(
+                select(Transaction.category_id, func.sum(Transaction.amount))
+                .where(Transaction.date >= period_start(day, period), Transaction.date <= day)
+                .group_by(Transaction.category_id)
+            ).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated ledger sizes')
+    parser.add_argument('--repeat', type=int, default=50, help='requests per measurement')
+    args = parser.parse_args()
+    day = START + timedelta(days=DAYS - 1)
+
+    print('%10s %14s %14s %12s %12s' % ('rows', 'unbudgeted ms', 'budgeted ms', 'status ms', 'scan ms'))
+    for rows in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+                              'RESPONSE_CACHE': None})
+            logging.getLogger().setLevel(logging.ERROR)  # Routes configure INFO logging; alerts log warnings
+            client = app.test_client()
+            with app.app_context():
+                generate_ledger(rows, start=START, days=DAYS)
+                category_ids = db.session.execute(select(Category.id)).scalars().all()
+                db.session.add_all(Budget(category_id=category_id, period=period, limit=1000)
+                                   for category_id in category_ids for period in PERIODS)
+                unbudgeted = Category(name='Unbudgeted')
+                db.session.add(unbudgeted)
+                db.session.commit()
+
+                unbudgeted_ms = post_ms(client, unbudgeted.id, day, args.repeat)
+                budgeted_ms = post_ms(client, category_ids[0], day, args.repeat)
+                status_ms = median_ms(client, '/budgets/status?date=%s' % day.isoformat(), args.repeat)
+                print('%10d %14.2f %14.2f %12.2f %12.2f' % (rows, unbudgeted_ms, budgeted_ms, status_ms,
+                                                          scan_ms(day, args.repeat)))
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_bulk_ingest.py
+"""
+Compare the single-row `POST /transactions` path with `POST /transactions/bulk`.
+
+Usage:
+    python -m benchmarks.bench_bulk_ingest [--rows N] [--single-rows N]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import create_app, db
+
+
+def make_rows(count: int, category_ids: list) -> list:
+    start = date(2020, 1, 1)
+    return [
+        {
+            'date': (start + timedelta(days=random.randrange(1500))).isoformat(),
+            'amount': round(random.uniform(1, 500), 2),
+            'category_id': random.choice(category_ids),
+            'notes': 'benchmark row %d' % i
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='rows sent through the bulk endpoint')
+    parser.add_argument('--single-rows', type=int, default=2_000, help='rows sent one request at a time')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        client = app.test_client()
+        category_ids = [
+            client.post('/categories', json={'name': 'Category %d' % i}).json['category']['id']
+            for i in range(20)
+        ]
+
+        rows = make_rows(args.single_rows, category_ids)
+        started = time.perf_counter()
+        for row in rows:
+            client.post('/transactions', json=row)
+        single_elapsed = time.perf_counter() - started
+
+        rows = make_rows(args.rows, category_ids)
+        started = time.perf_counter()
+        response = client.post('/transactions/bulk', json=rows)
+        bulk_elapsed = time.perf_counter() - started
+        assert response.json['accepted'] == args.rows, response.json.get('error')
+
+        with app.app_context():
+            db.engine.dispose()
+
+    print('single-row: %8d rows in %7.2fs  %10.0f rows/s' % (args.single_rows, single_elapsed,
+                                                            args.single_rows / single_elapsed))
+    print('bulk:       %8d rows in %7.2fs  %10.0f rows/s' % (args.rows, bulk_elapsed, args.rows / bulk_elapsed))
+
+
+if __name__ == '__main__':
+    main()
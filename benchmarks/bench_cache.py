@@ -0,0 +1,58 @@
+# benchmarks/bench_cache.py
+"""
+Compare the latency of the cached read endpoints with the response cache disabled and enabled.
+
+Usage:
+    python -m benchmarks.bench_cache [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+from app import create_app, db
+from benchmarks.bench_export import seed
+from benchmarks.bench_pagination import median_ms
+
+URLS = (
+    '/categories',
+    '/categories-page',
+    '/summary',
+    '/summary?period=week',
+    '/averages?period=month',
+    '/transactions-page',
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20_000, help='ledger size')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        uncached = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'RESPONSE_CACHE': None})
+        with uncached.app_context():
+            seed(args.rows)
+            db.engine.dispose()
+        cached = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+
+        print('%-28s %12s %12s' % ('endpoint', 'uncached ms', 'cached ms'))
+        for url in URLS:
+            with uncached.app_context():
+                uncached_ms = median_ms(uncached.test_client(), url, args.repeat)
+            with cached.app_context():
+                cached_ms = median_ms(cached.test_client(), url, args.repeat)
+            print('%-28s %12.2f %12.2f' % (url, uncached_ms, cached_ms))
+
+        with cached.app_context():
+            print(cached.extensions['response_cache'].stats())
+            db.engine.dispose()
+        with uncached.app_context():
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
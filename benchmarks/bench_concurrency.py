@@ -0,0 +1,97 @@
+# benchmarks/bench_concurrency.py
+"""
+Measure read and write throughput under concurrent load with SQLite's default settings and with
+the tuned settings of `app.config.Config` (WAL, synchronous=NORMAL, larger cache, mmap).
+
+Usage:
+    python -m benchmarks.bench_concurrency [--rows N] [--readers N] [--writers N] [--seconds N]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from app.registry import get_category_registry
+from benchmarks.bench_export import seed
+
+# SQLite's own defaults: rollback journal, fsync on every commit, 2 MB cache, no mmap
+DEFAULT_SQLITE = {
+    'SQLITE_JOURNAL_MODE': None,
+    'SQLITE_SYNCHRONOUS': None,
+    'SQLITE_CACHE_SIZE': None,
+    'SQLITE_MMAP_SIZE': None,
+}
+
+READ_URLS = (
+    '/transactions?limit=50&category_id=%d',
+    '/summary?period=month',
+    '/averages?period=week',
+)
+
+
+def run(app, readers: int, writers: int, seconds: float) -> dict:
+    with app.app_context():
+        category_ids = [category.id for category in get_category_registry().categories()]
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(kind: str) -> None:
+        client = app.test_client()
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            if kind == 'writes':
+                response = client.post('/transactions', json={
+                    'date': '2024-%02d-%02d' % (random.randint(1, 12), random.randint(1, 28)),
+                    'amount': round(random.uniform(1, 500), 2),
+                    'category_id': random.choice(category_ids)
+                })
+            else:
+                url = random.choice(READ_URLS)
+                response = client.get(url % random.choice(category_ids) if '%d' in url else url)
+            if response.status_code < 300:
+                done += 1
+            else:
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=work, args=('reads',)) for _ in range(readers)]
+    threads += [threading.Thread(target=work, args=('writes',)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {kind: count / seconds if kind != 'errors' else count for kind, count in counts.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='ledger size')
+    parser.add_argument('--readers', type=int, default=8, help='reading threads')
+    parser.add_argument('--writers', type=int, default=2, help='writing threads')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, settings in (('sqlite defaults', DEFAULT_SQLITE), ('tuned', {})):
+            config = dict(settings, RESPONSE_CACHE=None,
+                          SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(tmp, label.replace(' ', '_') + '.db'))
+            app = create_app(config)
+            logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+            with app.app_context():
+                seed(args.rows)
+            result = run(app, args.readers, args.writers, args.seconds)
+            print('%-16s %8.1f reads/s %8.1f writes/s %6d errors' % (
+                label, result['reads'], result['writes'], result['errors']))
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_csv_import.py
+"""
+Import synthetic CSV files of increasing size and report throughput and peak memory.
+
+Each import runs in a fresh process so its peak resident set size can be compared across
+file sizes; with the streaming pipeline the peak should stay flat as the file grows.
+
+Usage:
+    python -m benchmarks.bench_csv_import [--rows N [N ...]] [--batch-size N]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+from datetime import date, timedelta
+
+CATEGORIES = ['Rent', 'Food', 'Clothes', 'Transport', 'Subscriptions', 'Games', 'Gifts & Donations']
+
+
+def write_csv(path: str, rows: int) -> None:
+    start = date(2015, 1, 1)
+    with open(path, 'w', newline='') as csv_file:
+        csv_file.write('date,amount,category,notes\n')
+        for i in range(rows):
+            day = start + timedelta(days=random.randrange(3650))
+            csv_file.write('%s,%.2f,%s,synthetic bank export row %d\n' % (
+                day.isoformat(), random.uniform(1, 500), random.choice(CATEGORIES), i))
+
+
+def run_import(csv_path: str, db_path: str, batch_size: int, results) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    from app import create_app
+    from app.ingest import import_csv
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path})
+    with app.app_context(), open(csv_path, newline='') as csv_file:
+        report = import_csv(csv_file, create_categories=True, batch_size=batch_size)
+    report['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put(report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000],
+                        help='file sizes to import, in rows')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows inserted per batch')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            csv_path = os.path.join(tmp, 'ledger-%d.csv' % rows)
+            db_path = os.path.join(tmp, 'bench-%d.db' % rows)
+            write_csv(csv_path, rows)
+            results = context.Queue()
+            worker = context.Process(target=run_import, args=(csv_path, db_path, args.batch_size, results))
+            worker.start()
+            report = results.get()
+            worker.join()
+            print('%9d rows  %7.1f MB file  %7.2fs  %8d rows/s  %6d rejected  peak RSS %6.1f MB' % (
+                rows, os.path.getsize(csv_path) / 2 ** 20, report['elapsed_seconds'],
+                report['rows_per_second'], report['rejected'], report['max_rss_mb']))
+            os.remove(csv_path)
+            os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_export.py
+"""
+Measure time to first byte, total time and peak Python memory of `GET /transactions/export`.
+
+Usage:
+    python -m benchmarks.bench_export [--rows N [N ...]] [--format csv|ndjson]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.ingest import insert_transactions
+from app.models import Category
+
+
+def seed(rows: int) -> None:
+    categories = [Category(name='Category %d' % i) for i in range(20)]
+    db.session.add_all(categories)
+    db.session.flush()
+    category_ids = [category.id for category in categories]
+    start = date(2015, 1, 1)
+    insert_transactions(
+        {
+            'date': start + timedelta(days=random.randrange(3650)),
+            'amount': round(random.uniform(1, 500), 2),
+            'category_id': random.choice(category_ids),
+            'notes': 'synthetic row %d' % i
+        }
+        for i in range(rows)
+    )
+    db.session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000], help='ledger sizes')
+    parser.add_argument('--format', default='csv', choices=('csv', 'ndjson'))
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+            with app.app_context():
+                seed(rows)
+            client = app.test_client()
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get('/transactions/export?format=%s' % args.format, buffered=False)
+            chunks = iter(response.response)
+            size = len(next(chunks))
+            first_byte = time.perf_counter() - started
+            for chunk in chunks:
+                size += len(chunk)
+            elapsed = time.perf_counter() - started
+            response.close()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            with app.app_context():
+                db.engine.dispose()
+        print('%9d rows  first byte %7.1f ms  total %6.2fs  %7.1f MB out  peak traced %6.1f MB' % (
+            rows, first_byte * 1000, elapsed, size / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_metrics.py
+"""
+Measure the per-request overhead of the request metrics and of the slow request profiler, on a
+request served by the response cache (the cheapest there is) and on one that runs SQL.
+
+Usage:
+    python -m benchmarks.bench_metrics [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+
+from app import create_app
+from benchmarks.bench_export import seed
+from benchmarks.bench_pagination import median_ms
+
+URLS = ('/categories?limit=10', '/transactions?limit=20')
+SETUPS = (
+    ('metrics off', {'METRICS': False}),
+    ('metrics on', {'METRICS': True}),
+    ('metrics + profiler', {'METRICS': True, 'PROFILE_SLOW_REQUESTS': 10_000}),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000, help='ledger size')
+    parser.add_argument('--repeat', type=int, default=2000, help='requests per measurement')
+    parser.add_argument('--rounds', type=int, default=10, help='interleaved rounds over the setups')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        clients = {}
+        for label, config in SETUPS:
+            for url in URLS:
+                # Only the first URL goes through the response cache
+                app = create_app(dict(config, SQLALCHEMY_DATABASE_URI=uri, PROFILE_DIR=os.path.join(tmp, 'profiles'),
+                                      RESPONSE_CACHE='lru' if url == URLS[0] else None))
+                logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+                if not clients:
+                    with app.app_context():
+                        seed(args.rows)
+                clients[label, url] = app.test_client()
+
+        # Setups take turns, so that drift in the machine's speed affects them alike
+        timings = {key: [] for key in clients}
+        for _ in range(args.rounds):
+            for (label, url), client in clients.items():
+                timings[label, url].append(median_ms(client, url, args.repeat // args.rounds))
+
+        print('%-22s %22s %22s' % (('',) + URLS))
+        for label, _ in SETUPS:
+            print('%-22s %22.3f %22.3f' % ((label,) + tuple(statistics.median(timings[label, url]) for url in URLS)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_pagination.py
+"""
+Compare page latency of offset and cursor pagination of `GET /transactions` at increasing depth.
+
+Usage:
+    python -m benchmarks.bench_pagination [--rows N] [--limit N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from app import create_app, db
+from app.models import Transaction
+from app.pagination import encode_cursor
+from benchmarks.bench_export import seed
+
+
+def median_ms(client, url: str, repeat: int, headers: dict = None) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.json
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='ledger size')
+    parser.add_argument('--limit', type=int, default=50, help='page size')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        client = app.test_client()
+        with app.app_context():
+            seed(args.rows)
+
+            print('%10s  %12s  %12s' % ('depth', 'offset ms', 'cursor ms'))
+            for fraction in (0, 0.25, 0.5, 0.75, 0.999):
+                depth = int(args.rows * fraction)
+                url = '/transactions?limit=%d' % args.limit
+                cursor_url = url
+                if depth:
+                    # The cursor of the page that starts at `depth` is the sort key of the row before it
+                    key = db.session.execute(
+                        select(Transaction.date, Transaction.id)
+                        .order_by(Transaction.date, Transaction.id).offset(depth - 1).limit(1)
+                    ).one()
+                    cursor_url += '&after=' + encode_cursor(key)
+                offset_ms = median_ms(client, url + '&offset=%d' % depth, args.repeat)
+                cursor_ms = median_ms(client, cursor_url, args.repeat)
+                print('%10d  %12.2f  %12.2f' % (depth, offset_ms, cursor_ms))
+
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_replica.py
+"""
+Measure the latency of `POST /transactions` while heavy analytics requests (full exports and daily
+trends) run concurrently, with analytics served by the primary database and by a periodically
+refreshed snapshot (ANALYTICS_REPLICA='snapshot'), against a baseline without analytics load.
+
+Long read transactions on the primary keep WAL checkpoints from resetting the log, so the size
+of the WAL file at the end of each run is reported too.
+
+Usage:
+    python -m benchmarks.bench_replica [--rows N] [--readers N] [--writers N] [--seconds N] [--refresh N]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from app.registry import get_category_registry
+from benchmarks.bench_write_behind import percentile
+from benchmarks.generator import generate_ledger
+
+# An analytics worker: a process of its own, as in a multi-worker deployment, so that the writers
+# share the database with it but neither the interpreter lock nor, thanks to its low priority, the CPU
+READER = """
+import json, logging, os, random, sys, time
+from app import create_app
+from app.replica import get_analytics_replica
+os.nice(19)  # Yield the CPU to the writers, which may share fewer cores than there are workers
+path, snapshot, refresh, seconds = sys.argv[1], sys.argv[2], float(sys.argv[3]), float(sys.argv[4])
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'RESPONSE_CACHE': None,
+                  'ANALYTICS_REPLICA': 'snapshot' if snapshot else None, 'ANALYTICS_SNAPSHOT_PATH': snapshot or None,
+                  'ANALYTICS_REFRESH_INTERVAL': refresh})
+logging.getLogger().setLevel(logging.WARNING)
+with app.app_context():
+    while snapshot and get_analytics_replica().captured is None:  # The first snapshot is taken in the background
+        time.sleep(0.05)
+client = app.test_client()
+urls = ('/transactions/export?format=ndjson', '/trends?granularity=day&max_points=20000', '/summary?period=day')
+requests, sources = 0, set()
+print('ready', flush=True)
+deadline = time.perf_counter() + seconds
+while time.perf_counter() < deadline:
+    response = client.get(random.choice(urls))
+    response.get_data()  # Exports are streamed
+    requests += 1
+    sources.add(response.headers.get('X-Data-Source', 'primary'))
+print(json.dumps({'requests': requests, 'sources': sorted(sources)}))
+"""
+
+
+def start_readers(count: int, path: str, snapshot: str, refresh: float, seconds: float) -> list:
+    """Start `count` analytics workers and wait until each has started up."""
+    readers = [subprocess.Popen([sys.executable, '-c', READER, path, snapshot, str(refresh), str(seconds)],
+                                stdout=subprocess.PIPE, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+               for _ in range(count)]
+    for reader in readers:
+        assert reader.stdout.readline().strip() == 'ready'
+    return readers
+
+
+def post_transactions(app, writers: int, seconds: float) -> dict:
+    with app.app_context():
+        category_ids = [category.id for category in get_category_registry().categories()]
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def write() -> None:
+        client = app.test_client()
+        timings = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/transactions', json={
+                'date': '2024-%02d-%02d' % (random.randint(1, 12), random.randint(1, 28)),
+                'amount': round(random.uniform(1, 500), 2), 'category_id': random.choice(category_ids)
+            })
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 201, response.json
+        with lock:
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'p50': statistics.median(latencies) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'writes_per_second': len(latencies) / seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000, help='ledger size')
+    parser.add_argument('--readers', type=int, default=4, help='analytics worker processes')
+    parser.add_argument('--writers', type=int, default=2, help='threads posting transactions')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each run')
+    parser.add_argument('--refresh', type=float, default=2, help='seconds between snapshots')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = os.path.join(tmp, 'ledger.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + ledger, 'RESPONSE_CACHE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging
+        with app.app_context():
+            generate_ledger(args.rows)
+            db.session.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+            db.session.remove()
+            db.engine.dispose()
+
+        print('%-12s %8s %10s %10s %10s %10s %10s' % ('analytics', 'p50 ms', 'p99 ms', 'writes/s', 'requests',
+                                                      'WAL KB', 'served by'))
+        for label, readers, snapshot in (('none', 0, False), ('primary', args.readers, False),
+                                         ('snapshot', args.readers, True)):
+            path = os.path.join(tmp, label + '.db')
+            shutil.copy(ledger, path)
+            snapshot = os.path.join(tmp, label + '.snapshot.db') if snapshot else ''
+            workers = start_readers(readers, path, snapshot, args.refresh, args.seconds)
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'RESPONSE_CACHE': None})
+            logging.getLogger().setLevel(logging.WARNING)
+            result = post_transactions(app, args.writers, args.seconds)
+            requests, sources = 0, set()
+            for worker in workers:
+                output = json.loads(worker.communicate()[0].splitlines()[-1])
+                requests += output['requests']
+                sources.update(output['sources'])
+            wal = path + '-wal'
+            print('%-12s %8.2f %10.2f %10.0f %10d %10.0f %10s' % (
+                label, result['p50'], result['p99'], result['writes_per_second'], requests,
+                os.path.getsize(wal) / 1024 if os.path.exists(wal) else 0, '/'.join(sorted(sources)) or '-'))
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_serialization.py
+"""
+Compare the time to build a JSON response of N transaction rows with the previous
+dict-per-row + `jsonify` path and with `serialization.rows_response`.
+
+Usage:
+    python -m benchmarks.bench_serialization [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import statistics
+import time
+from datetime import date, timedelta
+
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.queries import TRANSACTION_ROW_COLUMNS
+from app.serialization import rows_response
+
+
+def make_rows(count: int) -> list:
+    start = date(2020, 1, 1)
+    return [(i, start + timedelta(days=i % 1000), 10.0 + i % 500, 'Category %d' % (i % 20), 'synthetic row %d' % i)
+            for i in range(count)]
+
+
+def median_ms(build, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = build()
+        response.get_data()  # Consume streamed bodies too
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000, help='rows per response')
+    parser.add_argument('--repeat', type=int, default=20, help='responses per measurement')
+    args = parser.parse_args()
+    rows = make_rows(args.rows)
+
+    def previous():
+        return jsonify({'transactions': [
+            {'id': row[0], 'date': row[1].isoformat(), 'amount': row[2], 'category': row[3], 'notes': row[4]}
+            for row in rows
+        ], 'next_cursor': None})
+
+    def current():
+        return rows_response('transactions', rows, TRANSACTION_ROW_COLUMNS, next_cursor=None)
+
+    for label, config in (('orjson', {'JSON_ENCODER': 'auto'}), ('stdlib', {'JSON_ENCODER': 'stdlib'})):
+        app = create_app(dict(config, SQLALCHEMY_DATABASE_URI='sqlite:///:memory:'))
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+        with app.test_request_context():
+            fast = app.json
+            app.json = DefaultJSONProvider(app)
+            print('%-28s %8.2f ms' % ('jsonify (previous)', median_ms(previous, args.repeat)))
+            app.json = fast
+            app.config['JSON_STREAM_MIN_ROWS'] = args.rows + 1
+            print('%-28s %8.2f ms' % ('rows_response %s' % label, median_ms(current, args.repeat)))
+            app.config['JSON_STREAM_MIN_ROWS'] = 0
+            print('%-28s %8.2f ms' % ('rows_response %s streamed' % label, median_ms(current, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
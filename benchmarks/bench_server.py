@@ -0,0 +1,108 @@
+# benchmarks/bench_server.py
+"""
+Load-test the pre-fork server (`python -m app.server`) with 1, 2, 4... workers and report the
+throughput of `GET /transactions` and `GET /summary`, to check that it scales with the cores.
+
+The load comes from client processes, each making one request at a time. The response cache is
+disabled unless --cache is given, so that every request reaches the database. Throughput cannot
+grow beyond the number of cores, which the clients share with the workers.
+
+Usage:
+    python -m benchmarks.bench_server [--rows N] [--workers N,N,...] [--threads N] [--clients N] [--seconds N]
+"""
+import argparse
+import http.client
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from benchmarks.generator import generate_ledger
+
+URLS = (
+    ('transactions', '/transactions?limit=20&order=desc'),
+    ('summary', '/summary?period=month'),
+)
+
+
+def load(port: int, url: str, seconds: float) -> int:
+    """Request `url` one request at a time for `seconds` and return the number of responses."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        connection.request('GET', url)
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+        count += 1
+    connection.close()
+    return count
+
+
+def start_server(database: str, workers: int, threads: int, cache: bool) -> tuple:
+    """Start the server on a free port and wait until every worker has started."""
+    env = dict(os.environ, FLASK_SQLALCHEMY_DATABASE_URI='sqlite:///' + database)
+    if not cache:
+        env['FLASK_RESPONSE_CACHE'] = 'null'
+    server = subprocess.Popen([sys.executable, '-m', 'app.server', '--bind', '127.0.0.1:0', '--workers', str(workers),
+                               '--threads', str(threads)], stderr=subprocess.PIPE, text=True, env=env,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    port, started = None, 0
+    while started < workers:
+        line = server.stderr.readline()
+        if not line:
+            raise RuntimeError('The server failed to start')
+        match = re.search(r'Listening on http://[^:]+:(\d+)', line)
+        port = int(match.group(1)) if match else port
+        started += 'started' in line
+    threading.Thread(target=server.stderr.read, daemon=True).start()  # Keep the log pipe from filling up
+    return server, port
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='ledger size')
+    parser.add_argument('--workers', default=','.join(str(count) for count in (1, 2, 4, 8)
+                                                      if count <= max(os.cpu_count() or 1, 2)),
+                        help='comma-separated worker counts to compare')
+    parser.add_argument('--threads', type=int, default=4, help='request threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client connections')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each measurement')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database, 'RESPONSE_CACHE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging
+        with app.app_context():
+            generate_ledger(args.rows)
+            db.engine.dispose()
+
+        print('%d cores, %d clients' % (os.cpu_count() or 1, args.clients))
+        print('%-8s %-14s %12s %10s' % ('workers', 'endpoint', 'requests/s', 'speedup'))
+        baseline = {}
+        with multiprocessing.Pool(args.clients) as clients:
+            for workers in (int(count) for count in args.workers.split(',')):
+                server, port = start_server(database, workers, args.threads, args.cache)
+                try:
+                    for label, url in URLS:
+                        counts = clients.starmap(load, [(port, url, args.seconds)] * args.clients)
+                        throughput = sum(counts) / args.seconds
+                        baseline.setdefault(label, throughput)
+                        print('%-8d %-14s %12.0f %9.2fx' % (workers, label, throughput, throughput / baseline[label]))
+                finally:
+                    server.send_signal(signal.SIGTERM)
+                    server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
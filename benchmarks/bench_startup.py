@@ -0,0 +1,94 @@
+# benchmarks/bench_startup.py
+"""
+Time the startup of cold workers: each measurement is a new Python process that imports the
+application, runs `create_app` and serves its first request.
+
+Three databases are compared: a new one, one holding a ledger at the current schema version, and
+the same ledger without a stored schema version, which makes startup run every schema check as
+it did before schemas were versioned.
+
+Usage:
+    python -m benchmarks.bench_startup [--rows N] [--repeat N]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from app import create_app, db
+from app.migrations import SCHEMA_VERSION_NAME
+from benchmarks.generator import generate_ledger
+
+# Run in a new process per measurement, so that nothing is imported or cached beforehand
+WORKER = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + sys.argv[1], 'RESPONSE_CACHE': None})
+created = time.perf_counter()
+response = app.test_client().get('/transactions?limit=20')
+served = time.perf_counter()
+assert response.status_code == 200, response.json
+print(json.dumps({'import': imported - started, 'create_app': created - imported, 'first_request': served - created}))
+"""
+
+
+def cold_start(path: str) -> dict:
+    """Start a worker on the database at `path` and return its timings in seconds."""
+    output = subprocess.run([sys.executable, '-c', WORKER, path], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def forget_schema_version(path: str) -> None:
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('DELETE FROM registry_versions WHERE name = ?', (SCHEMA_VERSION_NAME,))
+    connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000, help='ledger size of the existing databases')
+    parser.add_argument('--repeat', type=int, default=10, help='cold starts per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = os.path.join(tmp, 'ledger.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + ledger, 'RESPONSE_CACHE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging
+        with app.app_context():
+            generate_ledger(args.rows)
+            db.engine.dispose()
+
+        def new_database(run):
+            return os.path.join(tmp, 'new-%d.db' % run)
+
+        def current_database(run):
+            return ledger
+
+        def unversioned_database(run):
+            path = os.path.join(tmp, 'unversioned.db')
+            shutil.copy(ledger, path)
+            forget_schema_version(path)
+            return path
+
+        print('%-14s %10s %14s %16s %10s' % ('database', 'import ms', 'create_app ms', 'first request ms',
+                                             'total ms'))
+        for name, prepare in (('new', new_database), ('current', current_database),
+                              ('unversioned', unversioned_database)):
+            timings = [cold_start(prepare(run)) for run in range(args.repeat)]
+            medians = {key: statistics.median(timing[key] for timing in timings) * 1000 for key in timings[0]}
+            print('%-14s %10.1f %14.1f %16.1f %10.1f' % (name, medians['import'], medians['create_app'],
+                                                         medians['first_request'], sum(medians.values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_summary.py
+"""
+Time the rollup-backed summary endpoints against a full scan of the transactions table.
+
+Usage:
+    python -m benchmarks.bench_summary [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app import create_app, db
+from app.models import Category, Transaction
+from benchmarks.bench_export import seed
+from benchmarks.bench_pagination import median_ms
+
+URLS = (
+    '/summary',
+    '/summary?period=year',
+    '/summary?period=month',
+    '/summary?period=week',
+    '/averages?period=week',
+    '/averages?period=month',
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='ledger size')
+    parser.add_argument('--repeat', type=int, default=10, help='requests per measurement')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        client = app.test_client()
+        with app.app_context():
+            seed(args.rows)
+
+            timings = []
+            for _ in range(max(1, args.repeat // 5)):
+                started = time.perf_counter()
+                db.session.query(Category.name, db.func.sum(Transaction.amount)) \
+                    .join(Transaction).group_by(Category.name).all()
+                timings.append(time.perf_counter() - started)
+            print('%-28s %10.2f ms' % ('full scan GROUP BY', statistics.median(timings) * 1000))
+
+            for url in URLS:
+                print('%-28s %10.2f ms' % (url, median_ms(client, url, args.repeat)))
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
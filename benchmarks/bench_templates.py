@@ -0,0 +1,79 @@
+# benchmarks/bench_templates.py
+"""
+Measure render time and bytes on the wire of the HTML pages with thousands of categories, with the
+category fragments re-rendered on every request and no compression (as before), and with fragment
+caching and gzip. The response cache is disabled, so every request renders its page.
+Also measure the first render of every template in a new process, with and without the bytecode cache.
+
+Usage:
+    python -m benchmarks.bench_templates [--categories N] [--rows N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app import create_app, db
+from app.models import Category
+from app.templating import FragmentCache
+from benchmarks.bench_export import seed
+
+PAGES = ('/categories-page', '/transactions-page')
+
+
+def measure(app, client, url: str, repeat: int, cached_fragments: bool, headers: dict) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        if not cached_fragments:
+            app.extensions['template_fragments'] = FragmentCache()
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return statistics.median(timings) * 1000, len(response.data)
+
+
+def compile_ms(uri: str, cache_dir: str) -> float:
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'TEMPLATE_BYTECODE_CACHE': cache_dir is not None,
+                      'TEMPLATE_BYTECODE_CACHE_DIR': cache_dir})
+    app.jinja_env.cache.clear()  # A new process starts with an empty in-memory template cache
+    started = time.perf_counter()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--categories', type=int, default=5_000, help='number of categories')
+    parser.add_argument('--rows', type=int, default=10_000, help='ledger size')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'RESPONSE_CACHE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+        client = app.test_client()
+        with app.app_context():
+            seed(args.rows)
+            db.session.add_all(Category(name='Extra category %d' % i) for i in range(args.categories))
+            db.session.commit()
+
+        print('%-20s %26s %26s' % ('page', 'before ms / bytes', 'after ms / bytes'))
+        for url in PAGES:
+            before = measure(app, client, url, args.repeat, False, {})
+            after = measure(app, client, url, args.repeat, True, {'Accept-Encoding': 'gzip'})
+            print('%-20s %14.1f / %9d %14.1f / %9d' % ((url,) + before + after))
+
+        cache_dir = os.path.join(tmp, 'bytecode')
+        os.mkdir(cache_dir)
+        compile_ms(uri, cache_dir)  # Fill the bytecode cache
+        print('first render of all templates: %.1f ms compiling, %.1f ms from the bytecode cache'
+              % (compile_ms(uri, None), compile_ms(uri, cache_dir)))
+
+
+if __name__ == '__main__':
+    main()
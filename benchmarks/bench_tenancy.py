@@ -0,0 +1,97 @@
+# benchmarks/bench_tenancy.py
+"""
+Show that a user's requests do not slow down as other users' data grows: every user gets the
+same small ledger, and the requests of one user are timed over databases holding an increasing
+number of users.
+
+All indexes lead with the user, and rollups are read through the user's categories, so each
+request only touches the rows of the user it is made for.
+
+Usage:
+    python -m benchmarks.bench_tenancy [--tenants N,N,...] [--rows N] [--categories N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.ingest import insert_transactions
+from app.models import Category, User
+from app.tenancy import USER_HEADER
+from benchmarks.bench_pagination import median_ms
+from benchmarks.generator import AMOUNT_DISTRIBUTIONS, NOTE_WORDS, deferred_indexes
+
+START = date(2023, 1, 1)
+DAYS = 730
+
+# Requests timed, by column label
+URLS = (
+    ('list ms', '/transactions?limit=50'),
+    ('amount ms', '/transactions?min_amount=100&limit=50'),
+    ('summary ms', '/summary?period=month'),
+    ('averages ms', '/averages?period=month'),
+)
+
+
+def add_tenants(tenants: int, rows: int, categories: int, seed: int = 0) -> None:
+    """Add `tenants` users, each with `categories` categories and `rows` transactions."""
+    rng = random.Random(seed)
+    amount = AMOUNT_DISTRIBUTIONS['lognormal']
+    dates = [START + timedelta(days=offset) for offset in range(DAYS)]
+    first_user = (db.session.execute(select(db.func.max(User.id))).scalar() or 0) + 1
+    user_ids = list(range(first_user, first_user + tenants))
+    db.session.execute(insert(User), [{'id': user_id, 'name': 'Tenant %d' % user_id} for user_id in user_ids])
+    db.session.execute(insert(Category), [{'user_id': user_id, 'name': 'Category %d' % i}
+                                          for user_id in user_ids for i in range(categories)])
+    owned = db.session.execute(select(Category.user_id, Category.id).where(Category.user_id >= first_user)).all()
+    by_user = {}
+    for user_id, category_id in owned:
+        by_user.setdefault(user_id, []).append(category_id)
+    db.session.commit()
+
+    with deferred_indexes():
+        for user_id in user_ids:
+            insert_transactions(
+                {
+                    'date': rng.choice(dates),
+                    'amount': round(amount(rng), 2),
+                    'category_id': rng.choice(by_user[user_id]),
+                    'notes': rng.choice(NOTE_WORDS),
+                    'user_id': user_id
+                }
+                for _ in range(rows)
+            )
+            db.session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', default='10,100,1000,5000', help='comma-separated user counts')
+    parser.add_argument('--rows', type=int, default=200, help='transactions per user')
+    parser.add_argument('--categories', type=int, default=5, help='categories per user')
+    parser.add_argument('--repeat', type=int, default=50, help='requests per measurement')
+    args = parser.parse_args()
+
+    print('%8s %10s' % ('users', 'rows') + ''.join(' %12s' % label for label, url in URLS))
+    for tenants in (int(count) for count in args.tenants.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+                              'RESPONSE_CACHE': None})
+            logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging
+            client = app.test_client()
+            with app.app_context():
+                add_tenants(tenants, args.rows, args.categories)
+                # A user from the middle of the table, so neither end of the indexes is favoured
+                headers = {USER_HEADER: str(2 + tenants // 2)}
+                timings = [median_ms(client, url, args.repeat, headers) for label, url in URLS]
+                print('%8d %10d' % (tenants, tenants * args.rows) + ''.join(' %12.2f' % ms for ms in timings))
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
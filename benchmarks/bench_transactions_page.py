@@ -0,0 +1,70 @@
+# benchmarks/bench_transactions_page.py
+"""
+Measure the latency and peak Python memory of the transactions page at several ledger sizes,
+against rendering every transaction as the page used to.
+
+Usage:
+    python -m benchmarks.bench_transactions_page [--sizes N N ...] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from flask import render_template
+
+from app import create_app, db
+from app.queries import transaction_rows_query
+from app.registry import get_category_registry
+from benchmarks.bench_export import seed
+
+
+def measure(render, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings) * 1000, peak / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='ledger sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='renders per measurement')
+    args = parser.parse_args()
+
+    print('%10s %22s %22s' % ('rows', 'paged ms / peak MB', 'render all ms / peak MB'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, '%d.db' % size),
+                              'RESPONSE_CACHE': None})
+            logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+            client = app.test_client()
+            with app.app_context():
+                seed(size)
+
+                def paged():
+                    assert client.get('/transactions-page?order=desc').status_code == 200
+
+                def render_all():
+                    with app.test_request_context():
+                        render_template('transactions.html', categories=get_category_registry().categories(),
+                                        transactions=transaction_rows_query().all(), next_cursor=None,
+                                        filters={}, order='asc', page_size=0)
+
+                paged_ms, paged_mb = measure(paged, args.repeat)
+                all_ms, all_mb = measure(render_all, max(1, args.repeat // 5))
+                print('%10d %12.1f / %7.1f %12.1f / %7.1f' % (size, paged_ms, paged_mb, all_ms, all_mb))
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
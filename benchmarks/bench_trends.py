@@ -0,0 +1,60 @@
+# benchmarks/bench_trends.py
+"""
+Time `GET /trends` over a ten-year ledger, and compare the response size of downsampled daily
+series with that of the full series and of the raw transactions a chart client would otherwise
+have to page through.
+
+Usage:
+    python -m benchmarks.bench_trends [--rows N] [--categories N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+from app import create_app, db
+from app.models import Transaction
+from benchmarks.bench_pagination import median_ms
+from benchmarks.generator import generate_ledger
+
+# Requests timed, by label; the series cover the ten years of the generated ledger
+URLS = (
+    ('month', '/trends?granularity=month'),
+    ('week', '/trends?granularity=week'),
+    ('day, 500 points', '/trends?granularity=day&max_points=500'),
+    ('day, 100 points', '/trends?granularity=day&max_points=100'),
+    ('day, every point', '/trends?granularity=day&max_points=20000'),
+)
+
+# Approximate JSON size of one transaction object in a /transactions page
+TRANSACTION_JSON_BYTES = 120
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='ledger size')
+    parser.add_argument('--categories', type=int, default=20, help='number of categories')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+                          'RESPONSE_CACHE': None, 'COMPRESS_MIN_SIZE': None})
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging
+        client = app.test_client()
+        with app.app_context():
+            generate_ledger(args.rows, categories=args.categories)
+            rows = db.session.query(Transaction).count()
+
+            print('%-18s %10s %12s %12s' % ('series', 'ms', 'points', 'KB'))
+            for label, url in URLS:
+                response = client.get(url)
+                points = sum(len(series['totals']) for series in response.json['series'])
+                print('%-18s %10.2f %12d %12.1f' % (label, median_ms(client, url, args.repeat), points,
+                                                   len(response.data) / 1024))
+            print('%-18s %10s %12d %12.1f' % ('raw transactions', '-', rows, rows * TRANSACTION_JSON_BYTES / 1024))
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
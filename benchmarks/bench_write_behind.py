@@ -0,0 +1,96 @@
+# benchmarks/bench_write_behind.py
+"""
+Compare request latency and database commits of synchronous `POST /transactions` with the
+write-behind queue under a burst of concurrent clients.
+
+Usage:
+    python -m benchmarks.bench_write_behind [--clients N] [--requests N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.writebehind import get_write_behind
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(app, clients: int, requests: int) -> dict:
+    with app.app_context():
+        category_id = app.test_client().post('/categories', json={'name': 'Burst'}).json['category']['id']
+        engine = db.engine
+    commits = []
+    event.listen(engine, 'commit', lambda connection: commits.append(1))
+    latencies = []
+    lock = threading.Lock()
+
+    def work(index: int) -> None:
+        client = app.test_client()
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            response = client.post('/transactions', json={
+                'date': '2024-01-%02d' % (i % 28 + 1), 'amount': 1.0 + i, 'category_id': category_id,
+                'notes': 'client %d' % index
+            })
+            timings.append(time.perf_counter() - started)
+            assert response.status_code in (201, 202), response.json
+        with lock:
+            latencies.extend(timings)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        writer = get_write_behind()
+        if writer is not None:
+            writer.flush()
+    elapsed = time.perf_counter() - started
+    return {
+        'p50': statistics.median(latencies) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'rows_per_second': len(latencies) / elapsed,
+        'commits': len(commits),
+        'commits_per_second': len(commits) / elapsed
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, write_behind in (('synchronous', False), ('write-behind', True)):
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, label + '.db'),
+                'WRITE_BEHIND': write_behind,
+                'WRITE_BEHIND_SPOOL': os.path.join(tmp, label + '.spool'),
+            })
+            logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+            result = run(app, args.clients, args.requests)
+            print('%-13s p50 %7.2f ms  p99 %7.2f ms  %7.0f rows/s  %5d commits (%6.1f/s)' % (
+                label, result['p50'], result['p99'], result['rows_per_second'],
+                result['commits'], result['commits_per_second']))
+            with app.app_context():
+                if write_behind:
+                    get_write_behind().close()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
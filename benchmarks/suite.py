@@ -0,0 +1,381 @@
+# benchmarks/suite.py
+"""
+Benchmark every endpoint of the API against a synthetic ledger, write the results as JSON, and
+compare results with a stored baseline, flagging regressions.
+
+Requests go through the Flask test client (in process, no network) or, with `--runner server`,
+to the application served by a threaded WSGI server in a child process, over keep-alive HTTP/1.1
+connections from `--concurrency` client threads. The ledger is generated by `benchmarks.generator`;
+give `--database` to generate it once and reuse it across runs (write scenarios add to it).
+
+Usage:
+    python -m benchmarks.suite run [--rows N] [--database PATH] [--runner client|server]
+        [--concurrency N] [--requests N] [--scenario NAME ...] [--skip-writes] [--config KEY=VALUE ...]
+        [--output PATH] [--baseline PATH] [--threshold FRACTION]
+    python -m benchmarks.suite compare BASELINE CURRENT [--metric p50_ms] [--threshold FRACTION]
+
+`compare`, and `run --baseline`, exit with status 1 if a scenario regressed.
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import count
+from typing import Callable, NamedTuple, Optional, Union
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.models import Transaction
+from benchmarks.generator import add_arguments, generate_ledger, ledger_options
+
+# Unique numbers for the bodies of write requests, e.g. new category names
+_sequence = count()
+RUN_ID = '%x' % int(time.time())
+
+
+class Scenario(NamedTuple):
+    """
+    A request repeated by the suite.
+
+    Attributes:
+        name (str): The name results are reported under.
+        method (str): The HTTP method.
+        path (Union[str, Callable]): The path with its query string, or a function of a unique number returning it.
+        body (Optional[Callable]): A function of a unique number returning the JSON body.
+        share (float): The fraction of `--requests` sent, for scenarios much slower than the others.
+        write (bool): Whether the request changes the ledger.
+    """
+    name: str
+    method: str
+    path: Union[str, Callable[[int], str]]
+    body: Optional[Callable[[int], object]] = None
+    share: float = 1.0
+    write: bool = False
+
+    def build(self, n: int) -> tuple:
+        path = self.path(n) if callable(self.path) else self.path
+        return path, self.body(n) if self.body else None
+
+
+def _new_transaction(n: int) -> dict:
+    return {'date': '2024-%02d-%02d' % (n % 12 + 1, n % 28 + 1), 'amount': 10 + n % 90, 'category_id': n % 5 + 1,
+            'notes': 'benchmark %d' % n}
+
+
+# Dates assume the generator's default span, 2015-01-01 to 2024-12-28
+SCENARIOS = (
+    Scenario('home', 'GET', '/'),
+    Scenario('categories', 'GET', '/categories?limit=100'),
+    Scenario('transactions', 'GET', '/transactions?limit=50'),
+    Scenario('transactions newest', 'GET', '/transactions?order=desc&limit=50'),
+    Scenario('transactions filtered', 'GET',
+             '/transactions?category_id=2&min_amount=100&start_date=2019-01-01&end_date=2019-12-31&limit=50'),
+    Scenario('transactions search', 'GET', '/transactions?q=grocery&limit=50'),
+    Scenario('export month', 'GET', '/transactions/export?start_date=2020-01-01&end_date=2020-01-31', share=0.1),
+    Scenario('summary', 'GET', '/summary'),
+    Scenario('summary by month', 'GET', '/summary?period=month'),
+    Scenario('averages by week', 'GET', '/averages?period=week'),
+    Scenario('categories page', 'GET', '/categories-page'),
+    Scenario('transactions page', 'GET', '/transactions-page'),
+    Scenario('metrics', 'GET', '/metrics'),
+    Scenario('create transaction', 'POST', '/transactions', _new_transaction, write=True),
+    Scenario('update transaction', 'PUT', lambda n: '/transactions/%d' % (n % 1000 + 1),
+             lambda n: {'amount': 10 + n % 90}, write=True),
+    Scenario('bulk insert 100', 'POST', '/transactions/bulk',
+             lambda n: [_new_transaction(n * 100 + i) for i in range(100)], share=0.1, write=True),
+    Scenario('create category', 'POST', '/categories',
+             lambda n: {'name': 'Benchmark category %s %d' % (RUN_ID, n)}, write=True),
+)
+
+# Result fields where a larger value is better
+HIGHER_IS_BETTER = ('rps',)
+
+
+class ClientRunner:
+    """Send requests through the Flask test client of an application in this process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method: str, path: str, body) -> tuple:
+        response = self.client.open(path, method=method, json=body, headers={'Accept-Encoding': 'gzip'})
+        return response.status_code, len(response.data)
+
+    def close(self) -> None:
+        pass
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args) -> None:
+        pass  # One log line per request would dominate the measurements
+
+
+def _serve(config: dict, ports) -> None:
+    """Child process entry point: serve the application on a free port and report the port."""
+    app = create_app(config)
+    logging.getLogger().setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveRequestHandler)
+    ports.put(server.port)
+    server.serve_forever()
+
+
+class ServerRunner:
+    """Send requests over HTTP to the application served by a WSGI server in a child process."""
+
+    def __init__(self, config: dict):
+        context = multiprocessing.get_context('spawn')
+        ports = context.Queue()
+        self.process = context.Process(target=_serve, args=(config, ports), daemon=True)
+        self.process.start()
+        self.port = ports.get(timeout=60)
+        self._local = threading.local()
+
+    def send(self, method: str, path: str, body) -> tuple:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, len(response.read())
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(runner, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    """
+    Send a scenario's requests from `concurrency` threads and summarize the latencies.
+
+    Args:
+        runner: The ClientRunner or ServerRunner sending the requests.
+        scenario (Scenario): The request to send.
+        requests (int): The number of requests, before applying the scenario's share.
+        concurrency (int): The number of threads sending requests.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, requests per second, mean response size and status counts.
+    """
+    total = max(concurrency, int(requests * scenario.share))
+    for _ in range(min(10, total)):  # Warm up caches and connections
+        runner.send(scenario.method, *scenario.build(next(_sequence)))
+
+    latencies, statuses, sizes = [], Counter(), []
+
+    def worker(share: int) -> None:
+        own_latencies, own_statuses, size = [], Counter(), 0
+        for _ in range(share):
+            path, body = scenario.build(next(_sequence))
+            started = time.perf_counter()
+            status, length = runner.send(scenario.method, path, body)
+            own_latencies.append(time.perf_counter() - started)
+            own_statuses[status] += 1
+            size += length
+        latencies.extend(own_latencies)
+        statuses.update(own_statuses)
+        sizes.append(size)
+
+    threads = [threading.Thread(target=worker, args=(total // concurrency + (i < total % concurrency),))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latency * 1000 for latency in latencies)
+    return {
+        'requests': len(ordered),
+        'p50_ms': _percentile(ordered, 0.5),
+        'p95_ms': _percentile(ordered, 0.95),
+        'p99_ms': _percentile(ordered, 0.99),
+        'max_ms': ordered[-1],
+        'mean_ms': sum(ordered) / len(ordered),
+        'rps': len(ordered) / elapsed,
+        'mean_bytes': sum(sizes) / len(ordered),
+        'statuses': {str(status): number for status, number in sorted(statuses.items())},
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'commit': commit}
+
+
+def _config_value(text: str):
+    """Parse a --config value as JSON (numbers, booleans, null), or keep it as a string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Run the selected scenarios against a ledger of the requested shape and return the results."""
+    overrides = {}
+    for item in args.config:
+        key, _, value = item.partition('=')
+        overrides[key] = _config_value(value)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.abspath(args.database or os.path.join(tmp, 'ledger.db'))
+        config = dict(overrides, SQLALCHEMY_DATABASE_URI='sqlite:///' + database)
+        app = create_app(config)
+        logging.getLogger().setLevel(logging.WARNING)  # Routes configure INFO logging on import
+        with app.app_context():
+            rows = db.session.query(Transaction.id).count()
+            if rows == 0:
+                rate = generate_ledger(**ledger_options(args))
+                print('generated %d transactions, %.0f rows/s' % (args.rows, rate))
+                rows = args.rows
+
+        runner = ServerRunner(config) if args.runner == 'server' else ClientRunner(app)
+        scenarios = [scenario for scenario in SCENARIOS
+                     if (not args.scenario or scenario.name in args.scenario)
+                     and not (args.skip_writes and scenario.write)]
+        results = {}
+        try:
+            print('%-24s %10s %10s %10s %10s %12s' % ('scenario', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'bytes'))
+            for scenario in scenarios:
+                result = results[scenario.name] = measure(runner, scenario, args.requests, args.concurrency)
+                print('%-24s %10.2f %10.2f %10.2f %10.0f %12.0f%s' % (
+                    scenario.name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['rps'],
+                    result['mean_bytes'], '' if set(result['statuses']) <= {'200', '201', '202'}
+                    else '  statuses %s' % result['statuses']))
+        finally:
+            runner.close()
+            with app.app_context():
+                db.engine.dispose()
+
+    return {
+        'meta': dict(_environment(), created=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                     rows=rows, ledger=dict(ledger_options(args), start=args.start.isoformat()),
+                     runner=args.runner, concurrency=args.concurrency, requests=args.requests,
+                     config=overrides),
+        'scenarios': results,
+    }
+
+
+def compare(baseline: dict, current: dict, metric: str = 'p50_ms', threshold: float = 0.2,
+            min_delta_ms: float = 0.1) -> list:
+    """
+    Compare two result sets scenario by scenario and print the changes.
+
+    Args:
+        baseline (dict): The stored results.
+        current (dict): The new results.
+        metric (str): The result field compared, e.g. 'p50_ms', 'p99_ms' or 'rps'.
+        threshold (float): The relative change beyond which a scenario is flagged.
+        min_delta_ms (float): Latency changes smaller than this are noise and never flagged.
+
+    Returns:
+        list: The names of the scenarios that regressed.
+    """
+    for key in ('rows', 'runner', 'concurrency'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print('warning: %s differs (baseline %s, current %s), results may not be comparable'
+                  % (key, baseline['meta'].get(key), current['meta'].get(key)))
+
+    higher_is_better = metric in HIGHER_IS_BETTER
+    regressions = []
+    print('%-24s %12s %12s %9s' % ('scenario', 'baseline', 'current', 'change'))
+    for name, result in current['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            print('%-24s %12s %12.2f %9s' % (name, '-', result[metric], 'new'))
+            continue
+        before, after = previous[metric], result[metric]
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > threshold and (higher_is_better or after - before > min_delta_ms):
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif worse < -threshold and (higher_is_better or before - after > min_delta_ms):
+            flag = 'improved'
+        if result['statuses'] != previous['statuses']:
+            flag += ' statuses %s -> %s' % (previous['statuses'], result['statuses'])
+        print('%-24s %12.2f %12.2f %+8.1f%% %s' % (name, before, after, change * 100, flag))
+    for name in baseline['scenarios'].keys() - current['scenarios'].keys():
+        print('%-24s %12.2f %12s %9s' % (name, baseline['scenarios'][name][metric], '-', 'missing'))
+    return regressions
+
+
+def _add_compare_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--metric', default='p50_ms',
+                        choices=('p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'mean_ms', 'rps'))
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative change flagged, 0.2 = 20%%')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    add_arguments(run_parser)
+    run_parser.add_argument('--database', help='SQLite file holding the ledger; generated if empty')
+    run_parser.add_argument('--runner', default='client', choices=('client', 'server'))
+    run_parser.add_argument('--concurrency', type=int, default=1, help='client threads sending requests')
+    run_parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    run_parser.add_argument('--scenario', action='append', choices=[s.name for s in SCENARIOS],
+                            help='run only this scenario; repeatable')
+    run_parser.add_argument('--skip-writes', action='store_true', help='leave the ledger unchanged')
+    run_parser.add_argument('--config', action='append', default=[], metavar='KEY=VALUE',
+                            help='application setting, e.g. RESPONSE_CACHE=null; repeatable')
+    run_parser.add_argument('--output', help='file the JSON results are written to')
+    run_parser.add_argument('--baseline', help='results to compare with')
+    _add_compare_arguments(run_parser)
+
+    compare_parser = commands.add_parser('compare', help='compare stored results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    _add_compare_arguments(compare_parser)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(current, output, indent=2)
+        if not args.baseline:
+            return
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    else:
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            baseline, current = json.load(baseline_file), json.load(current_file)
+
+    if compare(baseline, current, args.metric, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
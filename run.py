@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server; in production run the pre-fork multi-worker server: `python -m app.server --workers N`
     app.run(debug=True)
@@ -0,0 +1,101 @@
+# tests/test_budgets.py
+from datetime import date
+
+from app import db
+from app.budgets import get_budget_registry
+from app.instrumentation import QueryCounter
+
+
+def _alerts(client, category_id):
+    return [alert for alert in client.get('/budgets/alerts').json['alerts'] if alert['category_id'] == category_id]
+
+
+def test_budget_validation(client):
+    category = client.post('/categories', json={'name': 'Budget Validation'}).json['category']['id']
+    assert client.post('/budgets', json={'category_id': category, 'period': 'month'}).status_code == 400
+    assert client.post('/budgets', json={'category_id': category, 'period': 'decade', 'limit': 5}).status_code == 400
+    assert client.post('/budgets', json={'category_id': 99999, 'period': 'month', 'limit': 5}).status_code == 404
+    assert client.post('/budgets', json={'category_id': category, 'period': 'month', 'limit': -5}).status_code == 400
+
+    created = client.post('/budgets', json={'category_id': category, 'period': 'month', 'limit': '250.50'})
+    assert created.status_code == 201 and created.json['budget']['limit'] == 250.5
+    duplicate = client.post('/budgets', json={'category_id': category, 'period': 'month', 'limit': 10})
+    assert duplicate.status_code == 400 and duplicate.json['error'] == 'Budget already exists'
+    assert client.put('/budgets/99999', json={'limit': 10}).status_code == 404
+    assert client.get('/budgets/status?date=2024-13-01').status_code == 400
+
+
+def test_alert_is_raised_once_when_the_limit_is_crossed(client):
+    category = client.post('/categories', json={'name': 'Budget Dining'}).json['category']['id']
+    budget = client.post('/budgets', json={'category_id': category, 'period': 'month', 'limit': 100}).json['budget']
+
+    client.post('/transactions', json={'date': '2024-05-02', 'amount': 60, 'category_id': category})
+    assert _alerts(client, category) == []
+    # Bulk writes are evaluated too, on the running total rather than row by row
+    client.post('/transactions/bulk', json=[{'date': '2024-05-%02d' % day, 'amount': 25, 'category_id': category}
+                                            for day in (3, 4)])
+    alerts = _alerts(client, category)
+    assert [(alert['period_start'], alert['total'], alert['limit']) for alert in alerts] == [('2024-05-01', 110, 100)]
+
+    # Further spending in the same period does not raise another alert; another period does
+    client.post('/transactions', json={'date': '2024-05-20', 'amount': 10, 'category_id': category})
+    txn = client.post('/transactions', json={'date': '2024-06-01', 'amount': 99, 'category_id': category})
+    assert len(_alerts(client, category)) == 1
+    client.put('/transactions/%d' % txn.json['transaction']['id'], json={'amount': 100.01})
+    assert [alert['period_start'] for alert in _alerts(client, category)] == ['2024-05-01', '2024-06-01']
+
+    status = client.get('/budgets/status?date=2024-05-15').json['status']
+    entry = next(item for item in status if item['budget_id'] == budget['id'])
+    assert (entry['spent'], entry['count'], entry['remaining'], entry['exceeded']) == (120, 4, -20, True)
+    assert (entry['period_start'], entry['period_end']) == ('2024-05-01', '2024-05-31')
+
+    # Lowering the limit below the current spending alerts right away
+    client.post('/transactions', json={'date': date.today().isoformat(), 'amount': 30, 'category_id': category})
+    week = client.post('/budgets', json={'category_id': category, 'period': 'week', 'limit': 500})
+    assert week.json['exceeded'] is False
+    assert client.put('/budgets/%d' % week.json['budget']['id'], json={'limit': 5}).json['exceeded'] is True
+    assert _alerts(client, category)[-1]['budget_id'] == week.json['budget']['id']
+    assert client.delete('/budgets/%d' % week.json['budget']['id']).status_code == 200
+    assert len(_alerts(client, category)) == 2
+
+
+def test_status_lists_budgets_without_spending(client):
+    category = client.post('/categories', json={'name': 'Budget Idle'}).json['category']['id']
+    budget = client.post('/budgets', json={'category_id': category, 'period': 'year', 'limit': 40}).json['budget']
+    status = client.get('/budgets/status?period=year&date=2024-07-04').json['status']
+    entry = next(item for item in status if item['budget_id'] == budget['id'])
+    assert (entry['spent'], entry['count'], entry['used'], entry['exceeded']) == (0, 0, 0, False)
+    assert {item['period'] for item in status} == {'year'}
+
+
+def test_evaluation_cost_does_not_depend_on_the_ledger(client):
+    budgeted = client.post('/categories', json={'name': 'Budget Hot Path'}).json['category']['id']
+    other = client.post('/categories', json={'name': 'Budget Free'}).json['category']['id']
+    client.post('/budgets', json={'category_id': budgeted, 'period': 'day', 'limit': 1000})
+    get_budget_registry().refresh(db.session.connection())
+    db.session.commit()
+
+    def write(category_id):
+        with QueryCounter(db.engine) as counter:
+            client.post('/transactions', json={'date': '2024-08-01', 'amount': 1, 'category_id': category_id})
+        return [statement for statement in counter.statements
+                if 'budget' in statement or 'FROM spending_rollups' in statement]
+
+    # Unbudgeted categories cost no query; budgeted ones one rollup lookup by key, never a transactions scan
+    assert write(other) == []
+    statements = write(budgeted)
+    assert len(statements) == 1 and 'FROM spending_rollups' in statements[0]
+    client.post('/transactions/bulk', json=[{'date': '2024-08-02', 'amount': 1, 'category_id': budgeted}] * 200)
+    assert write(budgeted) == statements
+
+    with QueryCounter(db.engine) as counter:
+        assert client.get('/budgets/status').status_code == 200
+    assert counter.count == 1
+
+
+def test_deleting_a_category_deletes_its_budgets(client):
+    category = client.post('/categories', json={'name': 'Budget Gone'}).json['category']['id']
+    budget = client.post('/budgets', json={'category_id': category, 'period': 'month', 'limit': 1}).json['budget']
+    assert client.delete('/categories/%d' % category).status_code == 200
+    assert budget['id'] not in [item['id'] for item in client.get('/budgets').json['budgets']]
+    assert (category, 'month') not in get_budget_registry().refresh(db.session.connection())
@@ -0,0 +1,78 @@
+# tests/test_bulk.py
+import json
+
+from app.ingest import validate_transaction_row
+
+
+def test_bulk_create_transactions_json(client):
+    response = client.post('/categories', json={'name': 'Bulk Groceries'})
+    category_id = response.json['category']['id']
+
+    response = client.post('/transactions/bulk', json=[
+        {'date': '2024-01-01', 'amount': 12.5, 'category_id': category_id, 'notes': 'Bread'},
+        {'date': '01-01-2024', 'amount': 3.0, 'category_id': category_id},
+        {'date': '2024-01-02', 'amount': -1, 'category_id': category_id},
+        {'date': '2024-01-03', 'amount': 7.25, 'category_id': 999999},
+        {'date': '2024-01-04', 'amount': '40', 'category_id': str(category_id)},
+    ])
+    assert response.status_code == 201
+    assert response.json['accepted'] == 2
+    assert response.json['rejected'] == 3
+    assert [r['status'] for r in response.json['results']] == [
+        'accepted', 'rejected', 'rejected', 'rejected', 'accepted'
+    ]
+    assert response.json['results'][1]['error'] == 'Invalid date format. Use YYYY-MM-DD.'
+    assert response.json['results'][2]['error'] == 'Invalid amount. Must be a positive number'
+    assert response.json['results'][3]['error'] == 'Category not found'
+
+    response = client.get('/summary')
+    totals = {item['category']: item['total_spent'] for item in response.json['summary']}
+    assert totals['Bulk Groceries'] == 52.5
+
+
+def test_bulk_create_transactions_ndjson(client):
+    response = client.post('/categories', json={'name': 'Bulk Transport'})
+    category_id = response.json['category']['id']
+
+    body = '\n'.join([
+        json.dumps({'date': '2024-02-01', 'amount': 2.5, 'category_id': category_id}),
+        'not json',
+        '',
+        json.dumps({'date': '2024-02-02', 'amount': 4.0, 'category_id': category_id}),
+    ])
+    response = client.post('/transactions/bulk', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert response.json['accepted'] == 2
+    assert response.json['results'][1] == {'row': 1, 'status': 'rejected', 'error': 'Invalid JSON'}
+
+
+def test_bulk_create_transactions_rejects_non_array(client):
+    response = client.post('/transactions/bulk', json={'date': '2024-01-01'})
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+    response = client.post('/transactions/bulk', json=[{'amount': 5}])
+    assert response.status_code == 400
+    assert response.json['accepted'] == 0
+    assert response.json['rejected'] == 1
+
+
+def test_validate_transaction_row_needs_integer_category_ids():
+    row = {'date': '2024-01-01', 'amount': 5}
+    for category_id in (1, '1'):
+        values, error = validate_transaction_row(dict(row, category_id=category_id), {1})
+        assert error is None and values['category_id'] == 1
+    for category_id in (True, 1.7, 1.0, '1.7', '-1', ' 1', [1]):
+        assert validate_transaction_row(dict(row, category_id=category_id), {1}) == (None, 'Category not found')
+
+
+def test_bulk_and_single_row_reject_non_integer_category_ids(client):
+    category_id = client.post('/categories', json={'name': 'Bulk Strict'}).json['category']['id']
+
+    response = client.post('/transactions/bulk', json=[
+        {'date': '2024-03-01', 'amount': 1, 'category_id': category_id + 0.7},
+        {'date': '2024-03-01', 'amount': 1, 'category_id': True},
+    ])
+    assert [result['error'] for result in response.json['results']] == ['Category not found'] * 2
+    response = client.post('/transactions', json={'date': '2024-03-01', 'amount': 1, 'category_id': category_id + 0.7})
+    assert response.status_code == 404 and response.json['error'] == 'Category not found'
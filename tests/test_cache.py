@@ -0,0 +1,94 @@
+# tests/test_cache.py
+from app import create_app, db
+from app.cache import ForkSharedTags, LRUCache, LocalStore, SharedCache
+
+
+def test_lru_cache_bounds_and_ttl():
+    cache = LRUCache(max_entries=2, max_bytes=10)
+    cache.set('a', {'body': b'1234'})
+    cache.set('b', {'body': b'1234'})
+    assert cache.get('a') is not None  # 'b' is now the least recently used
+    cache.set('c', {'body': b'1234'})
+    assert cache.get('b') is None and cache.get('a') and cache.get('c')
+    cache.set('d', {'body': b'12345678'})  # Over max_bytes together with 'c'
+    assert cache.get('c') is None and cache.get('d')
+    assert cache.stats()['evictions'] == 3 and cache.stats()['bytes'] == 8
+    cache.set('big', {'body': b'x' * 11})
+    assert cache.get('big') is None
+
+    expiring = LRUCache(ttl=0)
+    expiring.set('a', {'body': b''})
+    assert expiring.get('a') is None and expiring.stats()['expirations'] == 1
+
+
+def test_shared_cache_versions_are_shared():
+    store = LocalStore()
+    first, second = SharedCache(store), SharedCache(store)
+    first.set('key', {'body': b'{"a": 1}\n', 'content_type': 'application/json', 'etag': 'x'})
+    assert second.get('key') == {'body': b'{"a": 1}\n', 'content_type': 'application/json', 'etag': 'x'}
+
+    (version, _), = second.tag_versions(['categories'])
+    first.bump(['categories'], 2000000000.0)
+    assert second.tag_versions(['categories']) == [(version + 1, 2000000000.0)]
+
+
+def test_cached_responses_are_invalidated_by_writes(client):
+    first = client.get('/categories?limit=1000')
+    stats = client.get('/cache/stats').json
+    again = client.get('/categories?limit=1000')
+    assert again.data == first.data
+    assert client.get('/cache/stats').json['hits'] == stats['hits'] + 1
+
+    created = client.post('/categories', json={'name': 'Cached Category'}).json['category']
+    names = [category['name'] for category in client.get('/categories?limit=1000').json['categories']]
+    assert 'Cached Category' in names
+
+    client.put('/categories/%d' % created['id'], json={'name': 'Renamed Cached Category'})
+    page = client.get('/categories-page')
+    assert b'Renamed Cached Category' in page.data
+
+    summary = client.get('/summary').json['summary']
+    client.post('/transactions', json={'date': '2024-05-01', 'amount': 12.5, 'category_id': created['id']})
+    assert client.get('/summary').json['summary'] != summary
+    assert b'Renamed Cached Category' in client.get('/transactions-page').data
+
+
+def test_conditional_requests_get_304(client):
+    response = client.get('/summary?period=month')
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    not_modified = client.get('/summary?period=month', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.data == b''
+    assert client.get('/cache/stats').json['not_modified'] >= 1
+
+    category = client.post('/categories', json={'name': 'Conditional'}).json['category']
+    client.post('/transactions', json={'date': '2024-06-01', 'amount': 5.0, 'category_id': category['id']})
+    assert client.get('/summary?period=month', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_views_reading_no_table_are_cached(client):
+    first = client.get('/')
+    assert first.status_code == 200 and 'Last-Modified' not in first.headers
+    assert client.get('/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+def test_fork_shared_tags_keep_workers_consistent(tmp_path):
+    # Two workers of the pre-fork server: one database, private caches and registries, shared tag versions
+    config = {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % (tmp_path / 'shared.db'),
+              'RESPONSE_CACHE_TAGS': ForkSharedTags(), 'WRITE_BEHIND_SPOOL': str(tmp_path / 'spool')}
+    first, second = create_app(config), create_app(config)
+    first_client, second_client = first.test_client(), second.test_client()
+    for url in ('/categories-page', '/categories'):
+        assert b'Shared Tags' not in second_client.get(url).data  # Loads the registry and caches the page
+
+    first_client.post('/categories', json={'name': 'Shared Tags'})
+    # Within the registry's check interval: the miss must not render the second worker's older categories
+    for _ in range(2):
+        assert b'Shared Tags' in second_client.get('/categories-page').data
+        assert b'Shared Tags' in second_client.get('/categories').data
+    assert second.extensions['response_cache'].hits >= 2
+
+    for app in (first, second):
+        with app.app_context():
+            db.engine.dispose()
@@ -0,0 +1,36 @@
+# tests/test_config.py
+from app import create_app, db
+from app.config import Config, engine_options
+
+
+def _config(**overrides):
+    config = {key: value for key, value in vars(Config).items() if key.isupper()}
+    config.update(overrides)
+    return config
+
+
+def test_engine_options_per_database():
+    assert engine_options(_config(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')) == {}
+
+    server = engine_options(_config(SQLALCHEMY_DATABASE_URI='postgresql://user@db/budget', DB_POOL_SIZE=5))
+    assert server['pool_size'] == 5 and server['pool_pre_ping'] is True
+    assert server['pool_recycle'] == Config.DB_POOL_RECYCLE
+
+    explicit = engine_options(_config(SQLALCHEMY_DATABASE_URI='postgresql://user@db/budget',
+                                      SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 2}))
+    assert explicit['pool_size'] == 2
+
+
+def test_sqlite_file_connections_are_tuned(tmp_path, monkeypatch):
+    monkeypatch.setenv('FLASK_DB_POOL_SIZE', '3')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'tuned.db')})
+    with app.app_context():
+        assert db.engine.pool.size() == 3
+        with db.engine.connect() as connection:
+            def pragma(name):
+                return connection.exec_driver_sql('PRAGMA %s' % name).scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1  # NORMAL
+            assert pragma('busy_timeout') == Config.SQLITE_BUSY_TIMEOUT
+            assert pragma('cache_size') == Config.SQLITE_CACHE_SIZE
+        db.engine.dispose()
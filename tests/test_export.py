@@ -0,0 +1,44 @@
+# tests/test_export.py
+import csv
+import io
+import json
+
+
+def _seed(client):
+    category_id = client.post('/categories', json={'name': 'Export Food'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-01-05', 'amount': 10.0, 'category_id': category_id, 'notes': 'Lunch, with team'},
+        {'date': '2024-02-05', 'amount': 20.0, 'category_id': category_id},
+        {'date': '2024-03-05', 'amount': 30.0, 'category_id': category_id},
+    ])
+    return category_id
+
+
+def test_export_csv(client):
+    category_id = _seed(client)
+    response = client.get('/transactions/export?category_id=%d' % category_id)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['id', 'date', 'amount', 'category', 'notes']
+    assert [row[1:] for row in rows[1:]] == [
+        ['2024-01-05', '10.00', 'Export Food', 'Lunch, with team'],
+        ['2024-02-05', '20.00', 'Export Food', ''],
+        ['2024-03-05', '30.00', 'Export Food', ''],
+    ]
+
+
+def test_export_ndjson_honors_filters(client):
+    category_id = client.get('/categories?limit=100').json['categories'][0]['id']
+    response = client.get('/transactions/export?format=ndjson&category_id=%d'
+                          '&start_date=2024-02-01&max_amount=25' % category_id)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['date'], row['amount'], row['category']) for row in rows] == [('2024-02-05', 20.0, 'Export Food')]
+
+
+def test_export_rejects_invalid_arguments(client):
+    assert client.get('/transactions/export?format=xml').status_code == 400
+    assert client.get('/transactions/export?start_date=05-01-2024').status_code == 400
@@ -0,0 +1,59 @@
+# tests/test_import.py
+import io
+
+from app import db
+from app.commands import import_csv_command
+from app.models import Category
+
+
+def test_import_csv_maps_category_names(client):
+    client.post('/categories', json={'name': 'Import Rent'})
+    body = (
+        'date,amount,category,notes\n'
+        '2024-03-01,"1,200.00",Import Rent,March rent\n'
+        '2024-03-02,abc,Import Rent,\n'
+        '03/03/2024,5,Import Rent,\n'
+        '2024-03-04,15,Unknown Category,\n'
+    )
+    response = client.post('/import/csv', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.json['imported'] == 1
+    assert response.json['rejected'] == 3
+    assert response.json['errors'] == [
+        {'line': 3, 'error': 'Invalid amount. Must be a positive number'},
+        {'line': 4, 'error': 'Invalid date format. Use YYYY-MM-DD.'},
+        {'line': 5, 'error': 'Category not found'},
+    ]
+    assert 'rows_per_second' in response.json
+
+
+def test_import_csv_upload_creates_categories(client):
+    body = b'date,amount,category\n2024-04-01,9.99,Import Streaming\n2024-05-01,9.99,Import Streaming\n'
+    response = client.post('/import/csv?create_categories=true',
+                           data={'file': (io.BytesIO(body), 'export.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.json['imported'] == 2
+    assert response.json['categories_created'] == 1
+    assert db.session.query(Category).filter_by(name='Import Streaming').count() == 1
+
+
+def test_import_csv_rejected_rows_create_no_categories(client):
+    body = b'date,amount,category\n2024-04-01,-1,Import Rejected\n04/01/2024,5,Import Rejected\n'
+    response = client.post('/import/csv?create_categories=true', data=body, content_type='text/csv')
+    assert response.json['rejected'] == 2 and response.json['categories_created'] == 0
+    assert db.session.query(Category).filter_by(name='Import Rejected').count() == 0
+
+
+def test_import_csv_rejects_missing_columns(client):
+    response = client.post('/import/csv', data='when,how much\n2024-01-01,5\n', content_type='text/csv')
+    assert response.status_code == 400
+    assert response.json['error'] == 'CSV must have date, amount and category or category_id columns'
+
+
+def test_import_csv_command(app, tmp_path):
+    path = tmp_path / 'ledger.csv'
+    path.write_text('date,amount,category\n2024-06-01,20,Import CLI\n2024-06-02,-1,Import CLI\n')
+    result = app.test_cli_runner().invoke(import_csv_command, [str(path), '--create-categories'])
+    assert result.exit_code == 0
+    assert 'Imported 1 rows, rejected 1, created 1 categories' in result.output
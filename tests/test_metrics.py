@@ -0,0 +1,58 @@
+# tests/test_metrics.py
+import time
+
+from app import create_app
+from app.metrics import Histogram
+
+
+def _sample(text: str, prefix: str) -> float:
+    return next(float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    lines = []
+    histogram.render('x', 'a="b"', lines)
+    assert lines == ['x_bucket{a="b",le="1"} 2', 'x_bucket{a="b",le="5"} 3', 'x_bucket{a="b",le="+Inf"} 4',
+                     'x_sum{a="b"} 14.5', 'x_count{a="b"} 4']
+
+
+def test_metrics_endpoint_reports_requests_and_sql(client):
+    client.get('/categories?limit=7')
+    client.get('/categories?limit=7')  # Served by the response cache, without SQL
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    text = response.data.decode()
+
+    endpoint = 'endpoint="main.get_categories"'
+    assert _sample(text, 'budget_http_requests_total{%s,method="GET",status="200"}' % endpoint) >= 2
+    assert _sample(text, 'budget_db_statements_per_request_bucket{%s,le="0"}' % endpoint) >= 1
+    assert _sample(text, 'budget_db_statements_per_request_sum{%s}' % endpoint) >= 1
+    assert _sample(text, 'budget_http_response_size_bytes_count{%s}' % endpoint) >= 2
+    assert 'budget_response_cache_hits_total' in text
+
+
+def test_slow_requests_are_profiled(tmp_path):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                      'PROFILE_SLOW_REQUESTS': 20, 'PROFILE_INTERVAL': 0.001, 'PROFILE_DIR': str(tmp_path)})
+
+    def slow_view():
+        time.sleep(0.05)
+        return 'done'
+
+    app.add_url_rule('/slow', 'slow', slow_view)
+    client = app.test_client()
+    client.get('/metrics')
+    assert list(tmp_path.iterdir()) == []
+
+    client.get('/slow')
+    profile, = tmp_path.iterdir()
+    assert '-slow-' in profile.name and profile.name.endswith('ms.collapsed')
+    assert 'slow_view (test_metrics.py:' in profile.read_text()
+
+
+def test_metrics_can_be_disabled():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'METRICS': False})
+    assert app.test_client().get('/metrics').status_code == 404
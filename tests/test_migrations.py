@@ -0,0 +1,54 @@
+# tests/test_migrations.py
+from app import commands, create_app, db, migrations
+from app.migrations import SCHEMA_VERSION, Migration, schema_version
+
+
+def _app(tmp_path, **config):
+    return create_app(dict({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % (tmp_path / 'schema.db')},
+                           **config))
+
+
+def test_current_databases_skip_the_schema_checks(tmp_path, monkeypatch):
+    app = _app(tmp_path)
+    with app.app_context():
+        assert schema_version(db.engine) == SCHEMA_VERSION
+        db.engine.dispose()
+
+    def fail(engine):
+        raise AssertionError('upgrade() must not run for a current database')
+
+    monkeypatch.setattr(migrations, 'upgrade', fail)
+    app = _app(tmp_path)
+    assert app.test_client().get('/categories').status_code == 200
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_new_migrations_are_applied_by_the_cli(tmp_path, monkeypatch):
+    with _app(tmp_path).app_context():
+        db.engine.dispose()
+
+    def add_archive(engine):
+        with engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE archive (id INTEGER PRIMARY KEY)')
+
+    pending = migrations.MIGRATIONS + [Migration(SCHEMA_VERSION + 1, 'Add the archive table', add_archive)]
+    for module in (migrations, commands):
+        monkeypatch.setattr(module, 'MIGRATIONS', pending)
+        monkeypatch.setattr(module, 'SCHEMA_VERSION', SCHEMA_VERSION + 1)
+
+    app = _app(tmp_path, SCHEMA_AUTO_UPGRADE=False)
+    assert app.test_client().get('/categories').status_code == 503
+    runner = app.test_cli_runner()
+    assert 'Pending migration %d: Add the archive table' % (SCHEMA_VERSION + 1) in runner.invoke(
+        commands.version_command).output
+    result = runner.invoke(commands.upgrade_command)
+    assert result.exit_code == 0 and 'Applied migration %d' % (SCHEMA_VERSION + 1) in result.output
+    assert 'Applied' not in runner.invoke(commands.upgrade_command).output
+    with app.app_context():
+        db.engine.dispose()
+
+    app = _app(tmp_path, SCHEMA_AUTO_UPGRADE=False)
+    assert app.test_client().get('/categories').status_code == 200
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,61 @@
+# tests/test_money.py
+import sqlite3
+from decimal import Decimal
+
+import pytest
+
+from app import create_app, db
+from app.money import parse_amount
+from app.rollups import check_rollups
+
+
+def test_parse_amount():
+    assert parse_amount(0.1) == Decimal('0.10') and str(parse_amount(12)) == '12.00'
+    assert parse_amount('19.99') == Decimal('19.99')
+    with pytest.raises(ValueError, match='at most 2 decimal places'):
+        parse_amount(12.345)
+    for invalid in (0, -5, 'abc', True, float('inf'), 1e30):
+        with pytest.raises(ValueError, match='Must be a positive number'):
+            parse_amount(invalid)
+
+
+def test_amounts_are_exact(client):
+    category = client.post('/categories', json={'name': 'Exact Cents'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-04-%02d' % day, 'amount': 0.1, 'category_id': category} for day in range(1, 11)])
+    created = client.post('/transactions', json={'date': '2024-04-11', 'amount': '0.2', 'category_id': category})
+    assert created.json['transaction']['amount'] == 0.2
+
+    summary = {item['category']: item['total_spent'] for item in client.get('/summary').json['summary']}
+    assert summary['Exact Cents'] == 1.2  # Float addition of the same amounts gives 1.2000000000000002
+
+    listed = client.get('/transactions?category_id=%d&min_amount=0.2' % category).json['transactions']
+    assert [row['amount'] for row in listed] == [0.2]
+    assert client.put('/transactions/%d' % created.json['transaction']['id'],
+                      json={'amount': 0.123}).status_code == 400
+
+
+def test_float_amounts_are_migrated(tmp_path):
+    path = tmp_path / 'float.db'
+    connection = sqlite3.connect(str(path))
+    connection.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE);
+        CREATE TABLE transactions (id INTEGER PRIMARY KEY, date DATE, amount FLOAT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES categories (id), notes VARCHAR(200));
+        INSERT INTO categories VALUES (1, 'Legacy');
+        INSERT INTO transactions VALUES (1, '2023-05-01', 0.1, 1, 'legacy coffee'), (2, '2023-05-02', 0.2, 1, ''),
+            (3, '2023-06-01', 1234.56, 1, 'legacy rent');
+    """)
+    connection.close()
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % path})
+    with app.app_context():
+        stored = db.session.execute(db.text('SELECT typeof(amount), amount FROM transactions ORDER BY id')).all()
+        assert stored == [('integer', 10), ('integer', 20), ('integer', 123456)]
+        assert check_rollups() == []
+        db.engine.dispose()
+
+    client = app.test_client()
+    summary = client.get('/summary?period=month').json['summary'][0]
+    assert summary['totals'] == [0.3, 1234.56]
+    assert [row['id'] for row in client.get('/transactions?q=legacy').json['transactions']] == [1, 3]
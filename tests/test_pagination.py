@@ -0,0 +1,83 @@
+# tests/test_pagination.py
+from datetime import date
+
+from app.models import Transaction
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_categories_cursor_pagination(client):
+    for name in ('Pager C', 'Pager A', 'Pager D', 'Pager B', 'Pager E'):
+        client.post('/categories', json={'name': name})
+
+    names, after = [], ''
+    while True:
+        response = client.get('/categories?limit=2&after=%s' % after)
+        assert response.status_code == 200
+        assert len(response.json['categories']) <= 2
+        names += [category['name'] for category in response.json['categories']]
+        after = response.json['next_cursor']
+        if after is None:
+            break
+    assert names == ['Pager A', 'Pager B', 'Pager C', 'Pager D', 'Pager E']
+
+
+def test_transactions_cursor_pagination(client):
+    category_id = client.get('/categories?limit=1').json['categories'][0]['id']
+    dates = ['2024-01-03', '2024-01-01', '2024-01-02', '2024-01-01', '2024-01-05']
+    client.post('/transactions/bulk', json=[
+        {'date': day, 'amount': 1.0, 'category_id': category_id} for day in dates
+    ])
+
+    seen, after = [], ''
+    while True:
+        response = client.get('/transactions?limit=2&after=%s' % after)
+        assert response.status_code == 200
+        seen += [(txn['date'], txn['id']) for txn in response.json['transactions']]
+        after = response.json['next_cursor']
+        if after is None:
+            break
+    assert seen == sorted(seen)
+    assert [day for day, _ in seen] == sorted(dates)
+
+
+def test_invalid_cursor(client):
+    assert client.get('/transactions?after=not-a-cursor').status_code == 400
+    assert client.get('/categories?after=%s' % encode_cursor([1, 2])).status_code == 400
+
+
+def test_cursor_round_trip():
+    columns = (Transaction.date, Transaction.id)
+    cursor = encode_cursor([date(2024, 2, 29), 7])
+    assert decode_cursor(cursor, columns) == (date(2024, 2, 29), 7)
+
+
+def test_transactions_descending_cursor_pagination(client):
+    seen, after = [], ''
+    while True:
+        response = client.get('/transactions?limit=2&order=desc&after=%s' % after)
+        assert response.status_code == 200
+        seen += [(txn['date'], txn['id']) for txn in response.json['transactions']]
+        after = response.json['next_cursor']
+        if after is None:
+            break
+    assert seen == sorted(seen, reverse=True) and len(seen) >= 5
+    assert client.get('/transactions?order=sideways').status_code == 400
+
+
+def test_transactions_page_renders_first_screen_only(client):
+    category_id = client.post('/categories', json={'name': 'Paged Page'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2023-02-%02d' % (i % 28 + 1), 'amount': 1.0, 'category_id': category_id, 'notes': 'paged %d' % i}
+        for i in range(60)
+    ])
+
+    page = client.get('/transactions-page?category_id=%d&order=desc' % category_id)
+    assert page.status_code == 200
+    assert page.data.count(b'<td>paged ') == 50
+    assert b'data-next-cursor=""' not in page.data
+    assert b'2023-02-28' in page.data and b'2023-02-01' not in page.data
+
+    filtered = client.get('/transactions-page?category_id=%d&q=paged+7' % category_id)
+    assert filtered.data.count(b'<td>paged ') == 1
+    assert b'data-next-cursor=""' in filtered.data
+    assert client.get('/transactions-page?start_date=yesterday').status_code == 400
@@ -0,0 +1,31 @@
+# tests/test_query_count.py
+from app import db
+from app.instrumentation import QueryCounter
+
+
+def _add_transactions(client, category_id, count):
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-01-%02d' % (i % 28 + 1), 'amount': 1.0 + i, 'category_id': category_id}
+        for i in range(count)
+    ])
+
+
+def _count(client, url):
+    with QueryCounter(db.engine) as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+def test_transaction_listings_issue_constant_queries(client):
+    categories = [client.post('/categories', json={'name': 'Counted %d' % i}).json['category']['id']
+                  for i in range(5)]
+    _add_transactions(client, categories[0], 3)
+    few = {url: _count(client, url) for url in ('/transactions?limit=100', '/transactions-page')}
+
+    for category_id in categories:
+        _add_transactions(client, category_id, 40)
+    many = {url: _count(client, url) for url in ('/transactions?limit=100', '/transactions-page')}
+
+    assert many == few
+    assert many['/transactions?limit=100'] == 1
@@ -0,0 +1,56 @@
+# tests/test_registry.py
+from sqlalchemy import text
+
+from app import db
+from app.instrumentation import QueryCounter
+from app.registry import get_category_registry
+
+
+def _write_from_other_process(*statements):
+    """Write through a separate connection, bumping the version row like another process would."""
+    with db.engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+        connection.execute(text("UPDATE registry_versions SET version = version + 1 WHERE name = 'categories'"))
+
+
+def test_category_writes_refresh_the_registry(client):
+    registry = get_category_registry()
+    version = registry.version
+    category = client.post('/categories', json={'name': 'Registry Food'}).json['category']
+    assert registry.find('Registry Food') == category['id']
+    assert registry.version == version + 1
+
+    client.put('/categories/%d' % category['id'], json={'name': 'Registry Groceries'})
+    assert registry.find('Registry Food') is None
+    assert registry.by_id[category['id']] == 'Registry Groceries'
+
+    client.delete('/categories/%d' % category['id'])
+    assert not registry.exists(category['id'])
+    assert client.post('/categories', json={'name': 'Registry Groceries'}).status_code == 201
+
+
+def test_transaction_validation_uses_no_category_query(client):
+    category_id = client.post('/categories', json={'name': 'Registry Hot Path'}).json['category']['id']
+    get_category_registry().refresh(force=True)
+    with QueryCounter(db.engine) as counter:
+        response = client.post('/transactions', json={'date': '2024-01-01', 'amount': 3.0,
+                                                      'category_id': category_id})
+    assert response.status_code == 201
+    assert not any('FROM categories' in statement for statement in counter.statements)
+
+
+def test_writes_by_other_processes_are_noticed(client):
+    registry = get_category_registry()
+    _write_from_other_process("INSERT INTO categories (id, name, user_id) VALUES (9001, 'Elsewhere', 1)")
+    # A miss checks the version row right away
+    assert registry.exists(9001) and registry.exists('9001')
+    assert client.post('/categories', json={'name': 'Elsewhere'}).status_code == 400
+
+    _write_from_other_process("DELETE FROM categories WHERE id = 9001")
+    interval, registry.check_interval = registry.check_interval, 0
+    try:
+        assert client.post('/transactions', json={'date': '2024-01-01', 'amount': 3.0,
+                                                  'category_id': 9001}).status_code == 404
+    finally:
+        registry.check_interval = interval
@@ -0,0 +1,71 @@
+# tests/test_replica.py
+import pytest
+
+from app import create_app, db
+from app.replica import SOURCE_HEADER, STALENESS_HEADER, get_analytics_replica
+
+
+def _app(tmp_path, **config):
+    return create_app(dict({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % (tmp_path / 'primary.db'),
+                            'ANALYTICS_REPLICA': 'snapshot', 'ANALYTICS_SNAPSHOT_PATH': str(tmp_path / 'snapshot.db'),
+                            'ANALYTICS_REFRESH_INTERVAL': None, 'WRITE_BEHIND_SPOOL': str(tmp_path / 'spool')},
+                           **config))
+
+
+def _total(response) -> float:
+    return sum(float(item['total_spent']) for item in response.json['summary'])
+
+
+def test_analytics_read_the_snapshot(tmp_path):
+    app = _app(tmp_path)
+    client = app.test_client()
+    category_id = client.post('/categories', json={'name': 'Replica Rent'}).json['category']['id']
+    client.post('/transactions', json={'date': '2024-01-05', 'amount': 500, 'category_id': category_id})
+
+    # Before the first snapshot, analytics read the primary
+    response = client.get('/summary')
+    assert response.headers[SOURCE_HEADER] == 'primary' and response.headers[STALENESS_HEADER] == '0.0'
+    assert _total(response) == 500
+
+    with app.app_context():
+        replica = get_analytics_replica()
+        assert replica.refresh()
+    client.post('/transactions', json={'date': '2024-01-06', 'amount': 20, 'category_id': category_id})
+
+    # The write is not in the snapshot, nor in the cached responses computed from it
+    for _ in range(2):
+        response = client.get('/summary')
+        assert response.headers[SOURCE_HEADER] == 'snapshot' and float(response.headers[STALENESS_HEADER]) >= 0
+        assert _total(response) == 500
+    export = client.get('/transactions/export')
+    assert export.headers[SOURCE_HEADER] == 'snapshot' and export.data.count(b'\n') == 2
+    assert client.get('/transactions?limit=10').json['transactions'][-1]['amount'] == 20  # Not an analytics endpoint
+
+    # Categories created since the snapshot are validated and named from the primary
+    new_id = client.post('/categories', json={'name': 'Replica New'}).json['category']['id']
+    trends = client.get('/trends?category_id=%d,%d' % (category_id, new_id))
+    assert trends.status_code == 200 and trends.headers[SOURCE_HEADER] == 'snapshot'
+    assert [series['category'] for series in trends.json['series']] == ['Replica New', 'Replica Rent']
+    assert trends.json['series'][1]['total_spent'] == 500
+
+    with app.app_context():
+        replica.refresh()
+    assert _total(client.get('/summary')) == 520
+    other = client.post('/users', json={'name': 'Replica Other'}).json['user']['id']
+    assert client.get('/summary', headers={'X-User-Id': str(other)}).json['summary'] == []
+
+    # Data older than the staleness bound is not served: analytics fall back to the primary
+    client.post('/transactions', json={'date': '2024-01-07', 'amount': 3, 'category_id': category_id})
+    replica.max_staleness = -1
+    response = client.get('/summary')
+    assert response.headers[SOURCE_HEADER] == 'primary' and _total(response) == 523
+    assert replica.refreshes == 2
+
+    replica.close()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_snapshots_need_a_sqlite_file(tmp_path):
+    with pytest.raises(ValueError):
+        _app(tmp_path, SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
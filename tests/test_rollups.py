@@ -0,0 +1,57 @@
+# tests/test_rollups.py
+from datetime import date
+
+from app import db
+from app.commands import rollups_group
+from app.models import SpendingRollup
+from app.rollups import check_rollups, rebuild_rollups
+
+
+def _total(period, start, category_id):
+    rollup = db.session.get(SpendingRollup, (period, start, category_id))
+    return (rollup.total, rollup.count) if rollup else None
+
+
+def test_rollups_follow_every_write_path(client):
+    food = client.post('/categories', json={'name': 'Rollup Food'}).json['category']['id']
+    rent = client.post('/categories', json={'name': 'Rollup Rent'}).json['category']['id']
+
+    txn_id = client.post('/transactions', json={
+        'date': '2024-01-31', 'amount': 10.0, 'category_id': food}).json['transaction']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-01-30', 'amount': 5.0, 'category_id': food},
+        {'date': '2024-02-01', 'amount': 800.0, 'category_id': rent},
+    ])
+    client.post('/import/csv', data='date,amount,category\n2024-02-02,2.5,Rollup Food\n', content_type='text/csv')
+
+    assert _total('month', date(2024, 1, 1), food) == (15.0, 2)
+    assert _total('week', date(2024, 1, 29), food) == (17.5, 3)
+    assert _total('year', date(2024, 1, 1), food) == (17.5, 3)
+
+    client.put('/transactions/%d' % txn_id, json={'date': '2024-03-01', 'amount': 20.0, 'category_id': rent})
+    assert _total('month', date(2024, 1, 1), food) == (5.0, 1)
+    assert _total('month', date(2024, 3, 1), rent) == (20.0, 1)
+
+    client.delete('/transactions/%d' % txn_id)
+    assert _total('month', date(2024, 3, 1), rent) == (0.0, 0)
+    assert check_rollups() == []
+
+    summary = {item['category']: item['total_spent'] for item in client.get('/summary').json['summary']}
+    assert summary == {'Rollup Food': 7.5, 'Rollup Rent': 800.0}
+
+
+def test_check_detects_drift_and_rebuild_repairs_it(app):
+    rollup = db.session.execute(db.select(SpendingRollup).filter_by(period='year')).scalars().first()
+    rollup.total += 1
+    db.session.commit()
+    assert check_rollups()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(rollups_group, ['check'])
+    assert result.exit_code != 0
+
+    rebuild_rollups()
+    assert check_rollups() == []
+    result = runner.invoke(rollups_group, ['check'])
+    assert result.exit_code == 0
+    assert 'Rollups are consistent' in result.output
@@ -0,0 +1,89 @@
+# tests/test_search.py
+import itertools
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.queries import explain_query_plan, parse_transaction_search, plan_transaction_search
+from app.queries import transaction_rows_query
+from app.tenancy import DEFAULT_USER_ID, user_scope
+
+FILTERS = {
+    'category_id': '1',
+    'start_date': '2024-01-01',
+    'end_date': '2024-06-30',
+    'min_amount': '5',
+    'max_amount': '500',
+    'q': 'coffee',
+}
+
+
+@pytest.fixture(scope='module')
+def ledger(app):
+    client = app.test_client()
+    food = client.post('/categories', json={'name': 'Search Food'}).json['category']['id']
+    rent = client.post('/categories', json={'name': 'Search Rent'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-01-10', 'amount': 4.5, 'category_id': food, 'notes': 'Morning coffee'},
+        {'date': '2024-02-10', 'amount': 60.0, 'category_id': food, 'notes': 'Groceries and coffee beans'},
+        {'date': '2024-03-01', 'amount': 900.0, 'category_id': rent, 'notes': 'March rent'},
+        {'date': '2024-07-01', 'amount': 12.0, 'category_id': food, 'notes': 'Lunch'},
+    ])
+    return {'food': food, 'rent': rent}
+
+
+def _notes(client, query):
+    response = client.get('/transactions?limit=100&' + query)
+    assert response.status_code == 200
+    return [txn['notes'] for txn in response.json['transactions']]
+
+
+def test_filters(client, ledger):
+    assert _notes(client, 'category_id=%d' % ledger['rent']) == ['March rent']
+    assert _notes(client, 'category_id=%d&end_date=2024-06-30' % ledger['food']) == [
+        'Morning coffee', 'Groceries and coffee beans']
+    assert _notes(client, 'start_date=2024-02-01&end_date=2024-03-31') == [
+        'Groceries and coffee beans', 'March rent']
+    assert _notes(client, 'min_amount=10&max_amount=100') == ['Groceries and coffee beans', 'Lunch']
+    assert _notes(client, 'q=coffee&min_amount=10') == ['Groceries and coffee beans']
+    assert _notes(client, 'q=COFFEE+beans') == ['Groceries and coffee beans']
+    assert client.get('/transactions?start_date=2024/01/01').status_code == 400
+
+
+def test_amount_filters_beyond_the_stored_range(client, ledger):
+    assert _notes(client, 'min_amount=1e30') == []
+    assert _notes(client, 'max_amount=1e30&min_amount=-1e30&category_id=%d' % ledger['rent']) == ['March rent']
+    assert client.get('/transactions-page?min_amount=1e30').status_code == 200
+
+
+def test_search_index_follows_writes(client, ledger):
+    response = client.post('/transactions', json={
+        'date': '2024-08-01', 'amount': 3.0, 'category_id': ledger['food'], 'notes': 'Espresso'})
+    txn_id = response.json['transaction']['id']
+    assert _notes(client, 'q=espresso') == ['Espresso']
+
+    client.put('/transactions/%d' % txn_id, json={'notes': 'Cappuccino'})
+    assert _notes(client, 'q=espresso') == []
+    assert _notes(client, 'q=cappuccino') == ['Cappuccino']
+
+    client.delete('/transactions/%d' % txn_id)
+    assert _notes(client, 'q=cappuccino') == []
+
+
+@pytest.mark.parametrize('names', [
+    combination
+    for size in range(len(FILTERS) + 1)
+    for combination in itertools.combinations(FILTERS, size)
+])
+def test_every_filter_combination_uses_an_index(app, ledger, names):
+    criteria = parse_transaction_search(MultiDict({name: FILTERS[name] for name in names}))
+    index, filters, ordering = plan_transaction_search(criteria, db.engine.dialect.name)
+    query = transaction_rows_query().filter(*filters).order_by(*ordering).limit(10)
+
+    with user_scope(DEFAULT_USER_ID):  # As requests run
+        plan = explain_query_plan(query)
+    transaction_steps = [step for step in plan if ' transactions ' in step + ' ' and 'fts' not in step]
+    assert transaction_steps, plan
+    assert all('USING' in step for step in transaction_steps), plan
+    assert any(index in step for step in plan), (index, plan)
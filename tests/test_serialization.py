@@ -0,0 +1,59 @@
+# tests/test_serialization.py
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import create_app
+from app.money import MAX_MINOR_UNITS, from_minor_units
+from app.serialization import orjson
+
+
+@pytest.mark.parametrize('encoder', ['auto', 'stdlib'])
+def test_encoders_agree(encoder):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'JSON_ENCODER': encoder})
+    assert app.json.use_orjson == (encoder == 'auto' and orjson is not None)
+    with app.app_context():
+        response = app.json.response({'date': date(2024, 2, 29), 'amount': Decimal('1.5'), 'name': 'Café'})
+    assert response.get_data() == b'{"date":"2024-02-29","amount":1.5,"name":"Caf\xc3\xa9"}\n'
+    assert app.json.loads('{"a": [1, 2.5]}') == {'a': [1, 2.5]}
+
+
+def test_large_row_arrays_are_streamed(app, client):
+    category_id = client.post('/categories', json={'name': 'Streamed'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-04-%02d' % (i % 28 + 1), 'amount': 1.0 + i, 'category_id': category_id, 'notes': 'n%d' % i}
+        for i in range(30)
+    ])
+    url = '/transactions?limit=25&category_id=%d' % category_id
+    whole = client.get(url)
+    assert 'Content-Length' in whole.headers
+
+    app.config['JSON_STREAM_MIN_ROWS'] = 10
+    try:
+        streamed = client.get(url)
+    finally:
+        app.config['JSON_STREAM_MIN_ROWS'] = 500
+    assert 'Content-Length' not in streamed.headers
+    assert streamed.json == whole.json
+    assert len(streamed.json['transactions']) == 25 and streamed.json['next_cursor']
+    assert streamed.json['transactions'][0]['date'] == '2024-04-01'
+
+
+@pytest.mark.parametrize('encoder', ['auto', 'stdlib'])
+def test_amounts_round_trip_exactly_up_to_the_limit(encoder):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'JSON_ENCODER': encoder,
+                      'RESPONSE_CACHE': None})
+    client = app.test_client()
+    category_id = client.post('/categories', json={'name': 'Exact'}).json['category']['id']
+    largest = str(from_minor_units(MAX_MINOR_UNITS))
+    # Amounts of more than 15 digits are sent and returned as strings, which keep every digit
+    for amount, kind in (('1234567890123.45', float), ('12345678901234567.89', str), (largest, str)):
+        response = client.post('/transactions', json={'date': '2024-01-01', 'amount': amount,
+                                                      'category_id': category_id})
+        assert response.status_code == 201, response.json
+        returned = response.json['transaction']['amount']
+        assert Decimal(str(returned)) == Decimal(amount)
+        assert isinstance(returned, kind)
+    amounts = [row['amount'] for row in client.get('/transactions?limit=5').json['transactions']]
+    assert sorted(amounts, key=str) == sorted([1234567890123.45, '12345678901234567.89', largest], key=str)
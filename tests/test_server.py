@@ -0,0 +1,101 @@
+# tests/test_server.py
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+from flask import Flask
+
+from app.server import PooledWSGIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='the pre-fork server needs os.fork')
+
+
+def _wait_for(log: list, pattern: str, timeout: float = 30) -> re.Match:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for line in list(log):
+            match = re.search(pattern, line)
+            if match:
+                return match
+        time.sleep(0.05)
+    raise AssertionError('%r not logged:\n%s' % (pattern, ''.join(log)))
+
+
+def _request(port: int, path: str, body: dict = None) -> dict:
+    request = urllib.request.Request('http://127.0.0.1:%d%s' % (port, path),
+                                     data=json.dumps(body).encode() if body is not None else None,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def test_prefork_server_shares_invalidations_and_replaces_workers(tmp_path):
+    env = dict(os.environ, FLASK_SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'server.db'),
+               FLASK_WRITE_BEHIND_SPOOL=str(tmp_path / 'writes.spool'))
+    process = subprocess.Popen([sys.executable, '-m', 'app.server', '--bind', '127.0.0.1:0', '--workers', '2',
+                                '--threads', '2', '--graceful-timeout', '5'],
+                               cwd=ROOT, env=env, stderr=subprocess.PIPE, text=True)
+    log = []
+    threading.Thread(target=lambda: log.extend(process.stderr), daemon=True).start()
+    try:
+        port = int(_wait_for(log, r'Listening on http://127.0.0.1:(\d+)').group(1))
+        pids = [int(_wait_for(log, r'Worker %d \(pid (\d+)\) started' % index).group(1)) for index in range(2)]
+
+        # Both workers cached the categories while warming up; the write must invalidate both copies
+        _request(port, '/categories', {'name': 'Prefork'})
+        for _ in range(6):
+            assert [category['name'] for category in _request(port, '/categories')['categories']] == ['Prefork']
+
+        os.kill(pids[1], signal.SIGKILL)
+        _wait_for(log, r'Worker 1 \(pid %d\) exited.*replacing it' % pids[1])
+        _wait_for(log, r'Worker 1 \(pid (?!%d)\d+\) started' % pids[1])
+
+        process.send_signal(signal.SIGHUP)
+        _wait_for(log, 'Reload finished')
+        assert _request(port, '/summary') == {'summary': []}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    assert 'Server stopped' in ''.join(log)
+
+
+def test_busy_worker_leaves_connections_to_other_workers():
+    app = Flask(__name__)
+    release = threading.Event()
+    app.add_url_rule('/slow', 'slow', lambda: 'done' if release.wait(30) else 'timeout')
+    listener = socket.create_server(('127.0.0.1', 0))
+    listener.setblocking(False)
+    port = listener.getsockname()[1]
+    server = PooledWSGIServer(app, listener, threads=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        slow = threading.Thread(target=lambda: urllib.request.urlopen('http://127.0.0.1:%d/slow' % port, timeout=30))
+        slow.start()
+        time.sleep(0.5)
+
+        # The only request thread is busy: the next connection stays on the socket for another worker
+        waiting = socket.create_connection(('127.0.0.1', port))
+        time.sleep(0.5)
+        accepted, _ = listener.accept()
+        accepted.close()
+        waiting.close()
+
+        release.set()
+        slow.join(30)
+        with urllib.request.urlopen('http://127.0.0.1:%d/slow' % port, timeout=30) as response:
+            assert response.read() == b'done'
+    finally:
+        release.set()
+        server.shutdown()
+        server.server_close()
+        listener.close()
@@ -0,0 +1,47 @@
+# tests/test_summaries.py
+from datetime import date
+
+from app.summaries import next_period_start, period_starts
+
+
+def test_period_starts_are_gap_filled():
+    assert period_starts(date(2023, 11, 15), date(2024, 2, 3), 'month') == [
+        date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)]
+    assert period_starts(date(2024, 1, 3), date(2024, 1, 16), 'week') == [
+        date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)]
+    assert next_period_start(date(2024, 12, 1), 'month') == date(2025, 1, 1)
+
+
+def test_period_summary_and_averages(client):
+    food = client.post('/categories', json={'name': 'Period Food'}).json['category']['id']
+    fun = client.post('/categories', json={'name': 'Period Fun'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2024-01-05', 'amount': 10.0, 'category_id': food},
+        {'date': '2024-01-20', 'amount': 30.0, 'category_id': food},
+        {'date': '2024-03-02', 'amount': 20.0, 'category_id': food},
+        {'date': '2024-02-14', 'amount': 60.0, 'category_id': fun},
+    ])
+
+    response = client.get('/summary?period=month')
+    assert response.status_code == 200
+    assert response.json['periods'] == ['2024-01-01', '2024-02-01', '2024-03-01']
+    summary = {entry['category']: entry for entry in response.json['summary']}
+    assert summary['Period Food']['totals'] == [40.0, 0.0, 20.0]
+    assert summary['Period Food']['counts'] == [2, 0, 1]
+    assert summary['Period Fun']['totals'] == [0.0, 60.0, 0.0]
+
+    response = client.get('/summary?period=month&start=2024-02-10&end=2024-03-31')
+    assert response.json['periods'] == ['2024-02-01', '2024-03-01']
+    assert [entry['total_spent'] for entry in response.json['summary']] == [20.0, 60.0]
+
+    response = client.get('/averages?period=month')
+    assert response.status_code == 200
+    assert response.json['periods'] == 3
+    averages = {entry['category']: entry for entry in response.json['averages']}
+    assert averages['Period Food']['average'] == 20.0
+    assert averages['Period Food']['active_average'] == 30.0
+    assert averages['Period Fun']['average'] == 20.0
+
+    assert client.get('/summary?period=decade').status_code == 400
+    assert client.get('/averages?period=week&start=2024/01/01').status_code == 400
+    assert client.get('/summary?period=day&start=1000-01-01&end=2024-01-01').status_code == 400
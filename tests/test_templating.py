@@ -0,0 +1,41 @@
+# tests/test_templating.py
+import gzip
+
+from flask import render_template_string
+
+
+def test_category_fragments_follow_category_changes(app, client):
+    fragments = app.extensions['template_fragments']
+    created = client.post('/categories', json={'name': 'Fragment Category'}).json['category']
+
+    def render(selected=''):
+        return render_template_string(
+            "{{ category_fragment('_category_options.html', selected=selected) }}", selected=selected)
+
+    first = render()
+    assert 'Fragment Category' in first
+    misses = fragments.misses
+    assert render() == first and fragments.misses == misses
+    assert 'value="%d" selected' % created['id'] in render(str(created['id']))
+
+    client.put('/categories/%d' % created['id'], json={'name': 'Renamed Fragment Category'})
+    assert 'Renamed Fragment Category' in render()
+    assert b'Renamed Fragment Category' in client.get('/categories-page').data
+
+
+def test_large_responses_are_gzipped(client):
+    client.post('/categories', json={'name': 'Gzip Category'})
+    plain = client.get('/categories-page')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get('/categories-page', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] == 'W/' + plain.headers['ETag']
+
+    revalidated = client.get('/categories-page', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    small = client.get('/cache/stats', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
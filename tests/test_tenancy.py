@@ -0,0 +1,118 @@
+# tests/test_tenancy.py
+import sqlite3
+
+import pytest
+
+from app import create_app, db
+from app.cache import get_response_cache
+from app.commands import import_csv_command
+from app.models import Category
+from app.rollups import check_rollups
+
+
+@pytest.fixture(scope='module')
+def users(app):
+    client = app.test_client()
+    alice = client.post('/users', json={'name': 'Tenancy Alice'}).json['user']['id']
+    bob = client.post('/users', json={'name': 'Tenancy Bob'}).json['user']['id']
+    return {'alice': {'X-User-Id': str(alice)}, 'bob': {'X-User-Id': str(bob)}}
+
+
+def _ledger(client, headers, amount):
+    category = client.post('/categories', json={'name': 'Tenancy Food'}, headers=headers).json['category']['id']
+    txn = client.post('/transactions', json={'date': '2024-03-01', 'amount': amount, 'category_id': category,
+                                             'notes': 'shared word'}, headers=headers).json['transaction']['id']
+    return category, txn
+
+
+def test_users_only_see_their_own_rows(client, users):
+    assert client.post('/users', json={'name': 'Tenancy Alice'}).status_code == 400
+    alice_category, alice_txn = _ledger(client, users['alice'], 10)
+    bob_category, bob_txn = _ledger(client, users['bob'], 25)  # Category names are unique per user only
+
+    listed = client.get('/transactions?q=shared', headers=users['alice']).json['transactions']
+    assert [txn['id'] for txn in listed] == [alice_txn]
+    export = client.get('/transactions/export?format=ndjson', headers=users['bob']).get_data(as_text=True)
+    assert export.count('\n') == 1 and '25' in export
+    assert [item['total_spent'] for item in client.get('/summary', headers=users['bob']).json['summary']] == [25]
+    assert client.get('/summary?period=month', headers=users['alice']).json['summary'][0]['totals'] == [10]
+    assert [item['id'] for item in client.get('/categories', headers=users['alice']).json['categories']] == [
+        alice_category]
+
+    # Other users' rows cannot be used, changed or deleted
+    assert client.post('/transactions', json={'date': '2024-03-02', 'amount': 1, 'category_id': bob_category},
+                       headers=users['alice']).status_code == 404
+    assert client.put('/transactions/%d' % bob_txn, json={'amount': 1}, headers=users['alice']).status_code == 404
+    assert client.delete('/transactions/%d' % bob_txn, headers=users['alice']).status_code == 404
+    assert client.delete('/categories/%d' % bob_category, headers=users['alice']).status_code == 404
+    assert client.post('/budgets', json={'category_id': bob_category, 'period': 'month', 'limit': 5},
+                       headers=users['alice']).status_code == 404
+    assert check_rollups() == []
+
+
+def test_budgets_and_alerts_are_per_user(client, users):
+    category = client.post('/categories', json={'name': 'Tenancy Travel'}, headers=users['alice']).json
+    client.post('/budgets', json={'category_id': category['category']['id'], 'period': 'year', 'limit': 5},
+                headers=users['alice'])
+    client.post('/transactions', json={'date': '2024-04-01', 'amount': 6, 'category_id': category['category']['id']},
+                headers=users['alice'])
+    assert len(client.get('/budgets/alerts', headers=users['alice']).json['alerts']) == 1
+    assert client.get('/budgets/alerts', headers=users['bob']).json['alerts'] == []
+    assert client.get('/budgets', headers=users['bob']).json['budgets'] == []
+
+
+def test_writes_only_invalidate_the_writers_cache(client, users):
+    cache = get_response_cache()
+    client.get('/summary', headers=users['bob'])
+    category = client.post('/categories', json={'name': 'Tenancy Cache'}, headers=users['alice']).json['category']
+    client.post('/transactions', json={'date': '2024-05-01', 'amount': 3, 'category_id': category['id']},
+                headers=users['alice'])
+    hits = cache.hits
+    client.get('/summary', headers=users['bob'])
+    assert cache.hits == hits + 1
+
+
+def test_unknown_users_are_rejected(client):
+    assert client.get('/categories', headers={'X-User-Id': '424242'}).status_code == 404
+    assert client.get('/categories', headers={'X-User-Id': 'alice'}).status_code == 400
+
+
+def test_import_csv_command_imports_for_a_user(app, client, users, tmp_path):
+    path = tmp_path / 'ledger.csv'
+    path.write_text('date,amount,category\n2024-07-01,12,Tenancy Import\n')
+    runner = app.test_cli_runner()
+    assert runner.invoke(import_csv_command, [str(path), '--create-categories', '--user', '424242']).exit_code == 1
+    result = runner.invoke(import_csv_command, [str(path), '--create-categories', '--user', users['bob']['X-User-Id']])
+    assert 'Imported 1 rows' in result.output
+    names = [item['name'] for item in client.get('/categories', headers=users['bob']).json['categories']]
+    assert 'Tenancy Import' in names
+    assert 'Tenancy Import' not in [item['name'] for item in client.get('/categories').json['categories']]
+
+
+def test_single_user_databases_are_migrated(tmp_path):
+    path = tmp_path / 'single.db'
+    connection = sqlite3.connect(str(path))
+    connection.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE);
+        CREATE TABLE transactions (id INTEGER PRIMARY KEY, date DATE, amount BIGINT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES categories (id), notes VARCHAR(200));
+        CREATE INDEX ix_transactions_date_id ON transactions (date, id);
+        INSERT INTO categories VALUES (1, 'Legacy');
+        INSERT INTO transactions VALUES (1, '2023-05-01', 1050, 1, 'legacy coffee');
+    """)
+    connection.close()
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % path})
+    with app.app_context():
+        assert db.session.get(Category, 1).user_id == 1
+        indexes = db.session.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+        assert 'ix_transactions_date_id' not in indexes and 'ix_transactions_user_id_date_id' in indexes
+        references = db.session.execute(db.text(
+            "SELECT sql FROM sqlite_master WHERE name = 'transactions'")).scalar()
+        assert 'REFERENCES categories ' in references
+        db.engine.dispose()
+
+    client = app.test_client()
+    assert client.get('/transactions?q=legacy').json['transactions'][0]['amount'] == 10.5
+    user = client.post('/users', json={'name': 'Newcomer'}).json['user']['id']
+    assert client.post('/categories', json={'name': 'Legacy'}, headers={'X-User-Id': str(user)}).status_code == 201
@@ -0,0 +1,56 @@
+# tests/test_trends.py
+from app.downsampling import largest_triangle_three_buckets
+
+
+def test_downsampling_keeps_the_ends_and_the_peaks():
+    values = [1.0] * 1000
+    values[417] = 50.0
+    values[800] = -20.0
+    kept = largest_triangle_three_buckets(values, 20)
+    assert len(kept) == 20 and kept == sorted(kept)
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 417 in kept and 800 in kept
+    assert largest_triangle_three_buckets([3.0, 1.0, 2.0], 10) == [0, 1, 2]
+
+
+def test_trends_are_gap_filled_and_columnar(client):
+    coffee = client.post('/categories', json={'name': 'Trend Coffee'}).json['category']['id']
+    rent = client.post('/categories', json={'name': 'Trend Rent'}).json['category']['id']
+    idle = client.post('/categories', json={'name': 'Trend Idle'}).json['category']['id']
+    client.post('/transactions/bulk', json=[
+        {'date': '2022-01-03', 'amount': 4, 'category_id': coffee},
+        {'date': '2022-01-05', 'amount': 6, 'category_id': coffee},
+        {'date': '2022-01-05', 'amount': 500, 'category_id': rent},
+    ])
+
+    response = client.get('/trends?granularity=day&start=2022-01-01&end=2022-01-06&category_id=%d,%d'
+                          % (coffee, rent) + '&category_id=%d' % idle)
+    assert response.status_code == 200
+    trends = response.json
+    assert (trends['start'], trends['end'], trends['periods'], trends['downsampled']) == (
+        '2022-01-01', '2022-01-06', 6, False)
+    series = {entry['category']: entry for entry in trends['series']}
+    assert list(series) == ['Trend Coffee', 'Trend Idle', 'Trend Rent']
+    assert series['Trend Coffee']['periods'] == ['2022-01-0%d' % day for day in range(1, 7)]
+    assert series['Trend Coffee']['totals'] == [0, 0, 4, 0, 6, 0]
+    assert series['Trend Idle']['totals'] == [0] * 6 and series['Trend Rent']['total_spent'] == 500
+
+    # A year of days shrinks to the requested points, keeping the rent spike
+    response = client.get('/trends?granularity=day&start=2021-07-01&end=2022-06-30&max_points=50&category_id=%d'
+                          % rent)
+    trend = response.json['series'][0]
+    assert response.json['periods'] == 365 and response.json['downsampled'] is True
+    assert len(trend['periods']) == len(trend['totals']) == 50
+    assert trend['periods'][0] == '2021-07-01' and trend['periods'][-1] == '2022-06-30'
+    assert trend['totals'][trend['periods'].index('2022-01-05')] == 500
+
+    other = client.post('/users', json={'name': 'Trend Other'}).json['user']['id']
+    assert client.get('/trends', headers={'X-User-Id': str(other)}).json['series'] == []
+
+
+def test_trends_validation(client):
+    assert client.get('/trends?granularity=decade').status_code == 400
+    assert client.get('/trends?category_id=abc').status_code == 400
+    assert client.get('/trends?category_id=99999').status_code == 404
+    assert client.get('/trends?start=2024/01/01').status_code == 400
+    assert client.get('/trends?granularity=day&start=1900-01-01&end=2024-01-01').status_code == 400
@@ -0,0 +1,168 @@
+# tests/test_write_behind.py
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import create_app, db
+from app.models import SpendingRollup, SpooledWrite, Transaction
+from app.writebehind import fcntl, get_write_behind, write_entries
+
+
+def _make_app(tmp_path, **config):
+    return create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'budget.db'),
+        'WRITE_BEHIND_SPOOL': str(tmp_path / 'writes.spool'),
+        'WRITE_BEHIND_FSYNC': False,
+    }, **config))
+
+
+def test_write_behind_group_commits_accepted_transactions(tmp_path):
+    app = _make_app(tmp_path, WRITE_BEHIND=True, WRITE_BEHIND_MAX_DELAY=0.2)
+    client = app.test_client()
+    category_id = client.post('/categories', json={'name': 'Queued'}).json['category']['id']
+
+    responses = [client.post('/transactions', json={'date': '2024-03-%02d' % day, 'amount': 2.5,
+                                                     'category_id': category_id}) for day in range(1, 11)]
+    assert {response.status_code for response in responses} == {202}
+    assert client.post('/transactions', json={'date': '2024-03-01', 'amount': -1,
+                                              'category_id': category_id}).status_code == 400
+
+    with app.app_context():
+        writer = get_write_behind()
+        writer.flush()
+        assert writer.commits < 10  # Submitted within max_delay, so grouped into fewer commits
+        assert db.session.query(Transaction).count() == 10
+        assert db.session.get(SpendingRollup, ('month', date(2024, 3, 1), category_id)).total == 25.0
+
+    status = client.get(responses[0].json['status_url'])
+    assert status.json['status'] == 'committed' and isinstance(status.json['id'], int)
+    assert client.get('/transactions/pending/unknown').status_code == 404
+    assert (tmp_path / 'writes.spool').read_text() == ''
+
+    with app.app_context():
+        get_write_behind().close()
+        db.engine.dispose()
+
+
+def test_spooled_writes_are_replayed_once(tmp_path):
+    app = _make_app(tmp_path)
+    with app.app_context():
+        category_id = app.test_client().post('/categories', json={'name': 'Spooled'}).json['category']['id']
+        # The first entry was committed just before the crash, the second never was
+        db.session.add(Transaction(id=500, date=date(2024, 1, 1), amount=1.0,
+                                   category_id=category_id))
+        db.session.add(SpooledWrite(provisional_id='a' * 32, transaction_id=500))
+        db.session.commit()
+        db.engine.dispose()
+
+    entries = [{'id': 'a' * 32, 'date': '2024-01-01', 'amount': 1.0, 'category_id': category_id, 'notes': ''},
+               {'id': 'b' * 32, 'date': '2024-01-02', 'amount': 4.0, 'category_id': category_id, 'notes': 'x'}]
+    spool = tmp_path / 'writes.spool'
+    spool.write_text(''.join(json.dumps(entry) + '\n' for entry in entries) + '{"id": "trunc')
+
+    app = _make_app(tmp_path)
+    with app.app_context():
+        assert db.session.query(Transaction).count() == 2
+        assert db.session.query(Transaction).filter_by(notes='x').one().amount == 4.0
+        # The expired marker is deleted, the replayed entry's is kept for status lookups
+        assert [marker.provisional_id for marker in db.session.query(SpooledWrite)] == ['b' * 32]
+        db.engine.dispose()
+    assert spool.read_text() == ''
+
+
+@pytest.mark.skipif(fcntl is None, reason='spools are only claimed with file locks')
+def test_worker_spools_are_replayed_unless_held(tmp_path):
+    app = _make_app(tmp_path)
+    with app.app_context():
+        category_id = app.test_client().post('/categories', json={'name': 'Orphans'}).json['category']['id']
+        db.engine.dispose()
+
+    def entry(provisional_id, amount):
+        return json.dumps({'id': provisional_id, 'date': '2024-02-01', 'amount': amount,
+                           'category_id': category_id, 'notes': ''}) + '\n'
+
+    # Worker 3 crashed with an entry left in its spool; worker 4 is still running and holds its spool
+    orphan, held = tmp_path / 'writes.spool.3', tmp_path / 'writes.spool.4'
+    orphan.write_text(entry('c' * 32, 7.0))
+    held.write_text(entry('d' * 32, 9.0))
+    with open(held, 'a') as spool:
+        fcntl.flock(spool, fcntl.LOCK_EX)
+        app = _make_app(tmp_path, WRITE_BEHIND=True, WORKER_ID=0)
+        with app.app_context():
+            assert [amount for amount, in db.session.query(Transaction.amount)] == [7.0]
+            assert get_write_behind().spool_path == str(tmp_path / 'writes.spool.0')
+            get_write_behind().close()
+            db.engine.dispose()
+    assert orphan.read_text() == '' and held.read_text() == entry('d' * 32, 9.0)
+
+
+@pytest.mark.skipif(fcntl is None, reason='spools are claimed with file locks')
+def test_workers_only_forget_their_own_commit_markers(tmp_path):
+    app = _make_app(tmp_path)
+    with app.app_context():
+        category_id = app.test_client().post('/categories', json={'name': 'Markers'}).json['category']['id']
+        db.engine.dispose()
+
+    # Worker 1 committed an entry but has not emptied its spool yet
+    entry = {'id': 'e' * 32, 'date': '2024-02-01', 'amount': '5.00', 'category_id': category_id, 'notes': ''}
+    spool = tmp_path / 'writes.spool.1'
+    spool.write_text(json.dumps(entry) + '\n')
+    (tmp_path / 'writes.spool').write_text('')  # A spool left by a single-process run
+    with open(spool, 'a') as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        with app.app_context():
+            write_entries([dict(entry, date=date(2024, 2, 1), amount=Decimal('5.00'))])
+            db.session.commit()
+            db.engine.dispose()
+
+        # Worker 0 starts, replaying the base spool, and empties its own spool after a write
+        other = _make_app(tmp_path, WRITE_BEHIND=True, WORKER_ID=0)
+        client = other.test_client()
+        client.post('/transactions', json={'date': '2024-02-02', 'amount': 1, 'category_id': category_id})
+        with other.app_context():
+            get_write_behind().flush()
+            get_write_behind().close()
+            db.engine.dispose()
+
+    # Worker 1 crashed; its replacement replays the spool without inserting the entry a second time
+    replacement = _make_app(tmp_path, WRITE_BEHIND=True, WORKER_ID=1)
+    with replacement.app_context():
+        assert sorted(amount for amount, in db.session.query(Transaction.amount)) == [1, 5]
+        assert db.session.get(SpendingRollup, ('month', date(2024, 2, 1), category_id)).total == 6
+        get_write_behind().close()
+        db.engine.dispose()
+    assert spool.read_text() == ''
+
+
+def test_any_worker_answers_pending_transaction_status(tmp_path):
+    app = _make_app(tmp_path)
+    with app.app_context():
+        category_id = app.test_client().post('/categories', json={'name': 'Status'}).json['category']['id']
+        db.engine.dispose()
+
+    first = _make_app(tmp_path, WRITE_BEHIND=True, WORKER_ID=0, WRITE_BEHIND_MAX_DELAY=60)
+    second = _make_app(tmp_path, WRITE_BEHIND=True, WORKER_ID=1)
+    response = first.test_client().post('/transactions', json={'date': '2024-04-01', 'amount': 3,
+                                                               'category_id': category_id})
+    assert response.status_code == 202
+    assert second.test_client().get(response.json['status_url']).json == {'status': 'pending'}
+
+    with first.app_context():
+        get_write_behind().flush()
+    status = second.test_client().get(response.json['status_url'])
+    assert status.status_code == 200 and status.json['status'] == 'committed'
+    with second.app_context():
+        assert db.session.get(Transaction, status.json['id']).amount == 3
+
+    for worker in (first, second):
+        with worker.app_context():
+            get_write_behind().close()
+            db.engine.dispose()
+
+    # Once the retention has passed, the markers of entries no spool holds are deleted at startup
+    expired = _make_app(tmp_path, WRITE_BEHIND_STATUS_RETENTION=0)
+    assert expired.test_client().get(response.json['status_url']).status_code == 404
+    with expired.app_context():
+        db.engine.dispose()